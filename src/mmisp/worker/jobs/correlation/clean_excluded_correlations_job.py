@@ -3,7 +3,9 @@ from streaq import WrappedContext
 from mmisp.db.database import sessionmanager
 from mmisp.lib.logger import get_jobs_logger
 from mmisp.worker.api.requests_schemas import UserData
-from mmisp.worker.jobs.correlation.job_data import DatabaseChangedResponse
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.exclusion_index import ExclusionMatcher, bump_exclusion_version
+from mmisp.worker.jobs.correlation.job_data import CleanExcludedCorrelationsResponse
 from mmisp.worker.misp_database import misp_sql
 
 from .queue import queue
@@ -12,20 +14,34 @@ db_logger = get_jobs_logger(__name__)
 
 
 @queue.task()
-async def clean_excluded_correlations_job(ctx: WrappedContext[None], user: UserData) -> DatabaseChangedResponse:
+async def clean_excluded_correlations_job(
+    ctx: WrappedContext[None], user: UserData
+) -> CleanExcludedCorrelationsResponse:
     """
     Task to clean the excluded correlations from the correlations of the MISP database.
-    For every excluded value the correlations are removed.
+    The correlation values are matched against the exclusions like in the correlation jobs, including wildcard, CIDR
+    and pattern exclusions. The correlations and correlation values of all excluded values are removed in one
+    transaction and the exclusion indexes of all workers are marked as outdated.
     :param user: the user who requested the job
     :type user: UserData
-    :return: if the job was successful and if the database was changed
-    :rtype: DatabaseChangedResponse
+    :return: if the job was successful, if the database was changed and the number of deleted correlations
+    :rtype: CleanExcludedCorrelationsResponse
     """
     assert sessionmanager is not None
+    await bump_exclusion_version(ctx.redis)
+    batch_size: int = correlation_config_data.rebuild_batch_size
     async with sessionmanager.session() as session:
-        changed = False
-        excluded = await misp_sql.get_excluded_correlations(session)
-        for value in excluded:
-            if await misp_sql.delete_correlations(session, value):
-                changed = True
-        return DatabaseChangedResponse(success=True, database_changed=changed)
+        matcher: ExclusionMatcher = ExclusionMatcher(await misp_sql.get_excluded_correlations(session))
+        excluded_value_ids: list[int] = [
+            value_id
+            async for value_id, value in misp_sql.stream_correlation_values(session, batch_size)
+            if matcher.is_excluded(value)
+        ]
+        deleted_values, deleted_correlations = await misp_sql.delete_correlation_values(
+            session, excluded_value_ids, batch_size
+        )
+        return CleanExcludedCorrelationsResponse(
+            success=True,
+            database_changed=deleted_values > 0 or deleted_correlations > 0,
+            deleted_correlations=deleted_correlations,
+        )
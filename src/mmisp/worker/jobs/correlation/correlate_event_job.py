@@ -0,0 +1,64 @@
+from uuid import UUID
+
+from streaq import WrappedContext
+
+from mmisp.db.database import sessionmanager
+from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.exclusion_index import ExclusionMatcher, exclusion_index
+from mmisp.worker.jobs.correlation.job_data import CorrelateEventData, CorrelateEventResponse, CorrelationResponse
+from mmisp.worker.jobs.correlation.utility import correlate_values
+from mmisp.worker.misp_database import misp_sql
+
+from .queue import queue
+
+db_logger = get_jobs_logger(__name__)
+
+
+@queue.task()
+@add_ajob_db_log
+async def correlate_event_job(
+    ctx: WrappedContext[None], user: UserData, data: CorrelateEventData
+) -> CorrelateEventResponse:
+    """
+    Method to correlate all attributes of an event by their exact value.
+    The values of the event are loaded with one query and correlated together with a few more, instead of running a
+    correlation job for every attribute.
+    :param user: the user who requested the job
+    :type user: UserData
+    :param data: specifies the event to correlate
+    :type data: CorrelateEventData
+    :return: a response with the number of correlated values and the correlated events
+    :rtype: CorrelateEventResponse
+    """
+    correlation_threshold: int = await get_correlation_threshold(ctx.redis)
+
+    assert sessionmanager is not None
+    async with sessionmanager.session() as session:
+        exclusions: ExclusionMatcher = await exclusion_index.refresh(session, ctx.redis)
+        event_values: set[str] = await misp_sql.get_event_correlation_values(session, data.event_id)
+        values: set[str] = {value for value in event_values if not exclusions.is_excluded(value)}
+
+        results: dict[str, CorrelationResponse] = await correlate_values(
+            session, values, correlation_threshold, ctx.redis
+        )
+
+        events: set[UUID] = set()
+        correlated_values: int = 0
+        over_correlating_values: int = 0
+        for result in results.values():
+            if result.is_over_correlating_value:
+                over_correlating_values += 1
+            elif result.found_correlations:
+                correlated_values += 1
+                events.update(result.events or set())
+
+        return CorrelateEventResponse(
+            success=True,
+            found_correlations=correlated_values > 0,
+            correlated_values=correlated_values,
+            excluded_values=len(event_values) - len(values),
+            over_correlating_values=over_correlating_values,
+            events=events or None,
+        )
@@ -2,12 +2,39 @@ import logging
 import os
 from typing import Type
 
-from pydantic import Field, field_validator
+from pydantic import Field, NonNegativeFloat, NonNegativeInt, PositiveInt, field_validator
 from pydantic_settings import BaseSettings
 
 ENV_CORRELATION_PLUGIN_DIRECTORY = "CORRELATION_PLUGIN_DIRECTORY"
 """The name of the environment variable that configures the directory where correlation plugins are loaded from."""
 
+ENV_CORRELATION_REGENERATION_SHARDS = "CORRELATION_REGENERATION_SHARDS"
+"""The name of the environment variable that configures into how many sub-jobs the regeneration is split."""
+
+ENV_CORRELATION_TOP_CORRELATIONS_CACHE_TTL = "CORRELATION_TOP_CORRELATIONS_CACHE_TTL"
+"""The name of the environment variable that configures how long the top correlations are cached in seconds."""
+
+ENV_CORRELATION_EXCLUSION_INDEX_REFRESH_INTERVAL = "CORRELATION_EXCLUSION_INDEX_REFRESH_INTERVAL"
+"""The name of the environment variable that configures after how many seconds the exclusion index is reloaded."""
+
+ENV_CORRELATION_COALESCE_WINDOW = "CORRELATION_COALESCE_WINDOW"
+"""The name of the environment variable that configures how long correlation jobs of a value are coalesced."""
+
+ENV_CORRELATION_VALUE_LOCK_TIMEOUT = "CORRELATION_VALUE_LOCK_TIMEOUT"
+"""The name of the environment variable that configures after how many seconds the lock of a value expires."""
+
+ENV_CORRELATION_OCCURRENCE_COUNTER_TTL = "CORRELATION_OCCURRENCE_COUNTER_TTL"
+"""The name of the environment variable that configures how long the occurrence counters of values are kept."""
+
+ENV_CORRELATION_THRESHOLD = "CORRELATION_THRESHOLD"
+"""The name of the environment variable that configures the correlation threshold used until one is set."""
+
+ENV_CORRELATION_THRESHOLD_REFRESH_INTERVAL = "CORRELATION_THRESHOLD_REFRESH_INTERVAL"
+"""The name of the environment variable that configures how often workers read the correlation threshold."""
+
+ENV_CORRELATION_REBUILD_BATCH_SIZE = "CORRELATION_REBUILD_BATCH_SIZE"
+"""The name of the environment variable that configures the batch size of the rebuild correlations job."""
+
 PLUGIN_DEFAULT_DIRECTORY: str = ""
 """The default package used for correlation plugins."""
 
@@ -21,6 +48,28 @@ class CorrelationConfigData(BaseSettings):
 
     plugin_directory: str = Field(PLUGIN_DEFAULT_DIRECTORY, validation_alias=ENV_CORRELATION_PLUGIN_DIRECTORY)
     """The directory where the plugins are stored."""
+    regeneration_shards: PositiveInt = Field(1, validation_alias=ENV_CORRELATION_REGENERATION_SHARDS)
+    """The number of shards the values are split into by the regenerate occurrences job."""
+    top_correlations_cache_ttl: NonNegativeInt = Field(60, validation_alias=ENV_CORRELATION_TOP_CORRELATIONS_CACHE_TTL)
+    """The time in seconds a result of the top correlations job is cached, 0 disables the cache."""
+    exclusion_index_refresh_interval: NonNegativeInt = Field(
+        60, validation_alias=ENV_CORRELATION_EXCLUSION_INDEX_REFRESH_INTERVAL
+    )
+    """The time in seconds after which a worker reloads its exclusion index even if the version stamp didn't change."""
+    coalesce_window: NonNegativeFloat = Field(1.0, validation_alias=ENV_CORRELATION_COALESCE_WINDOW)
+    """The time in seconds a correlation job waits for further jobs of the same value to coalesce with."""
+    value_lock_timeout: PositiveInt = Field(300, validation_alias=ENV_CORRELATION_VALUE_LOCK_TIMEOUT)
+    """The time in seconds after which the lock of a value expires if the worker holding it doesn't release it."""
+    occurrence_counter_ttl: PositiveInt = Field(3600, validation_alias=ENV_CORRELATION_OCCURRENCE_COUNTER_TTL)
+    """The time in seconds after which an occurrence counter is dropped and counted in the database again."""
+    default_threshold: PositiveInt = Field(20, validation_alias=ENV_CORRELATION_THRESHOLD)
+    """The maximum number of attributes of a value that are correlated, until a threshold is set via the API."""
+    threshold_refresh_interval: NonNegativeFloat = Field(
+        5.0, validation_alias=ENV_CORRELATION_THRESHOLD_REFRESH_INTERVAL
+    )
+    """The time in seconds a worker uses its cached correlation threshold before reading it again."""
+    rebuild_batch_size: PositiveInt = Field(10000, validation_alias=ENV_CORRELATION_REBUILD_BATCH_SIZE)
+    """The number of rows read and the number of correlations written at once by the rebuild correlations job."""
 
     @field_validator("plugin_directory")
     @classmethod
@@ -43,3 +92,6 @@ class CorrelationConfigData(BaseSettings):
                 _log.error(f"The given plugin directory '{plugin_module}' for correlation plugins does not exist.")
 
         return PLUGIN_DEFAULT_DIRECTORY
+
+
+correlation_config_data: CorrelationConfigData = CorrelationConfigData()
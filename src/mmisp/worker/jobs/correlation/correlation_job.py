@@ -1,3 +1,4 @@
+import asyncio
 from uuid import UUID
 
 from sqlalchemy import select
@@ -10,11 +11,19 @@ from mmisp.db.models.attribute import Attribute
 from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
 from mmisp.plugins import factory
 from mmisp.plugins.exceptions import PluginExecutionException, PluginNotFound
-from mmisp.plugins.types import PluginType
+from mmisp.plugins.protocols import CorrelationPlugin
+from mmisp.plugins.types import CorrelationPluginType, PluginType
 from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.exclusion_index import exclusion_index
 from mmisp.worker.jobs.correlation.job_data import CorrelationJobData, CorrelationResponse, InternPluginResult
+from mmisp.worker.jobs.correlation.occurrence_counters import count_new_attribute
+from mmisp.worker.jobs.correlation.plugins.protocols import BatchCorrelationPlugin
 from mmisp.worker.jobs.correlation.utility import save_correlations
+from mmisp.worker.jobs.correlation.value_lock import claim_value, release_claim, value_lock
 from mmisp.worker.misp_database import misp_sql
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
 
 from .queue import queue
 
@@ -29,6 +38,9 @@ async def correlation_job(ctx: WrappedContext[None], user: UserData, data: Corre
     Method to execute a correlation plugin job.
     It creates a plugin based on the given data and runs it.
     Finally, it processes the result and returns a response.
+    For plugins correlating all attributes of a value at once, jobs of the same plugin for the same value started
+    within the coalesce window are coalesced into one. A lock per plugin and value makes sure that only one worker
+    correlates a value with a plugin at a time.
 
     :param user: the user who requested the job
     :type user: UserData
@@ -37,61 +49,142 @@ async def correlation_job(ctx: WrappedContext[None], user: UserData, data: Corre
     :return: a response with the result of the correlation by the plugin
     :rtype: CorrelationResponse
     """
+    plugin_name: str = data.correlation_plugin_name
+    plugin: CorrelationPlugin = __get_plugin(plugin_name)
+    correlation_threshold: int = await get_correlation_threshold(ctx.redis)
+
     assert sessionmanager is not None
     async with sessionmanager.session() as db:
-        query = select(Attribute).filter(Attribute.id == data.attribute_id)
-        attribute = (await db.execute(query)).scalars().one_or_none()
-
+        attribute: Attribute | None = await __get_attribute(db, data.attribute_id)
         if attribute is None:
+            return __attribute_not_found_response(plugin_name)
+
+        value: str = attribute.value
+        if await exclusion_index.is_excluded(db, value, ctx.redis):
             return CorrelationResponse(
-                success=False,
+                success=True,
                 found_correlations=False,
-                is_excluded_value=False,
+                is_excluded_value=True,
                 is_over_correlating_value=False,
-                plugin_name=data.correlation_plugin_name,
+                plugin_name=plugin_name,
             )
-        correlation_threshold: int = 20
+        if data.new_attribute:
+            await count_new_attribute(ctx.redis, attribute.id, value)
 
-        if await misp_sql.is_excluded_correlation(db, attribute.value):
+    claimed: bool = False
+    if plugin.CORRELATION_TYPE == CorrelationPluginType.ALL_CORRELATIONS:
+        if not await claim_value(ctx.redis, plugin_name, value):
             return CorrelationResponse(
                 success=True,
                 found_correlations=False,
-                is_excluded_value=True,
+                is_excluded_value=False,
                 is_over_correlating_value=False,
-                plugin_name=data.correlation_plugin_name,
+                plugin_name=plugin_name,
+                coalesced=True,
             )
-        try:
-            plugin = factory.get_plugin(PluginType.CORRELATION, data.correlation_plugin_name)
-        except PluginNotFound:
-            raise PluginNotFound(message=PLUGIN_NAME_STRING + data.correlation_plugin_name + " was not found.")
-        try:
-            result: CorrelationResponse | InternPluginResult | None = await plugin.run(
-                db, attribute, correlation_threshold
-            )
-        except PluginExecutionException:
-            raise PluginExecutionException(
-                message=PLUGIN_NAME_STRING
-                + data.correlation_plugin_name
-                + "and the value"
-                + attribute.value
-                + " was executed but an error occurred."
-            )
-        except Exception as exception:
-            raise PluginExecutionException(
-                message=PLUGIN_NAME_STRING
-                + data.correlation_plugin_name
-                + " and the value "
-                + attribute.value
-                + " was executed but the following error occurred: "
-                + str(exception)
-            )
-        if isinstance(result, CorrelationResponse):
-            return result
+        claimed = True
+    try:
+        if claimed:
+            # no session is open while waiting, so waiting jobs don't hold database connections
+            await asyncio.sleep(correlation_config_data.coalesce_window)
+        async with value_lock(ctx.redis, plugin_name, value):
+            if claimed:
+                # jobs started from now on may have attributes this job doesn't see, so they have to run again
+                await release_claim(ctx.redis, plugin_name, value)
+                claimed = False
+            async with sessionmanager.session() as db:
+                attribute = await __get_attribute(db, data.attribute_id)
+                if attribute is None:
+                    return __attribute_not_found_response(plugin_name)
+                responses: list[CorrelationResponse] = await correlate_attributes(
+                    db, plugin_name, [attribute], correlation_threshold
+                )
+                return responses[0]
+    finally:
+        if claimed:
+            await release_claim(ctx.redis, plugin_name, value)
 
-        response: CorrelationResponse = await __process_result(
-            db, data.correlation_plugin_name, attribute.value, result
+
+async def __get_attribute(db: AsyncSession, attribute_id: int) -> Attribute | None:
+    query = select(Attribute).filter(Attribute.id == attribute_id)
+    return (await db.execute(query)).scalars().one_or_none()
+
+
+def __attribute_not_found_response(plugin_name: str) -> CorrelationResponse:
+    return CorrelationResponse(
+        success=False,
+        found_correlations=False,
+        is_excluded_value=False,
+        is_over_correlating_value=False,
+        plugin_name=plugin_name,
+    )
+
+
+def __get_plugin(plugin_name: str) -> CorrelationPlugin:
+    """
+    Returns the registered correlation plugin with the name.
+    :param plugin_name: the name of the correlation plugin
+    :type plugin_name: str
+    :return: the plugin
+    :rtype: CorrelationPlugin
+    :raises PluginNotFound: If no correlation plugin with the name is registered.
+    """
+    try:
+        return factory.get_plugin(PluginType.CORRELATION, plugin_name)
+    except PluginNotFound:
+        raise PluginNotFound(message=PLUGIN_NAME_STRING + plugin_name + " was not found.")
+
+
+async def correlate_attributes(
+    db: AsyncSession, plugin_name: str, attributes: list[Attribute], correlation_threshold: int
+) -> list[CorrelationResponse]:
+    """
+    Correlates the given attributes with the plugin and processes the results.
+    If the plugin implements run_many all attributes are passed in one call, otherwise run is called for every
+    attribute.
+
+    :param plugin_name: the name of the correlation plugin to use
+    :type plugin_name: str
+    :param attributes: the attributes to correlate
+    :type attributes: list[Attribute]
+    :param correlation_threshold: the maximum number of attributes of a value that are correlated
+    :type correlation_threshold: int
+    :return: a response for every attribute in the same order
+    :rtype: list[CorrelationResponse]
+    """
+    if not attributes:
+        return []
+    plugin: CorrelationPlugin = __get_plugin(plugin_name)
+    values: str = ", ".join(attribute.value for attribute in attributes)
+    try:
+        results: list[CorrelationResponse | InternPluginResult | None]
+        if isinstance(plugin, BatchCorrelationPlugin):
+            results = await plugin.run_many(db, attributes, correlation_threshold)
+        else:
+            results = [await plugin.run(db, attribute, correlation_threshold) for attribute in attributes]
+    except PluginExecutionException:
+        raise PluginExecutionException(
+            message=PLUGIN_NAME_STRING + plugin_name + "and the value" + values + " was executed but an error occurred."
+        )
+    except Exception as exception:
+        raise PluginExecutionException(
+            message=PLUGIN_NAME_STRING
+            + plugin_name
+            + " and the value "
+            + values
+            + " was executed but the following error occurred: "
+            + str(exception)
         )
-        return response
+    if len(results) != len(attributes):
+        raise PluginExecutionException(message="The plugin didn't return a result for every attribute.")
+
+    responses: list[CorrelationResponse] = []
+    for attribute, result in zip(attributes, results):
+        if isinstance(result, CorrelationResponse):
+            responses.append(result)
+        else:
+            responses.append(await __process_result(db, plugin_name, attribute.value, result))
+    return responses
 
 
 async def __process_result(
@@ -116,7 +209,10 @@ async def __process_result(
         plugin_name=plugin_name,
     )
     if result.found_correlations and len(result.correlations) > 1:
-        uuid_events: set[UUID] = await save_correlations(session, result.correlations, value)
+        attributes: list[MispCorrelationAttribute] = await misp_sql.get_correlation_attributes(
+            session, [attribute.id for attribute in result.correlations]
+        )
+        uuid_events: set[UUID] = await save_correlations(session, attributes, value)
         response.events = uuid_events
     elif len(result.correlations) <= 1:
         response.found_correlations = False
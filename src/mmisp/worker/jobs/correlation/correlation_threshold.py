@@ -0,0 +1,64 @@
+import time
+from typing import Self
+
+from redis.asyncio import Redis
+
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+
+THRESHOLD_KEY: str = "mmisp:correlation:threshold"
+"""The redis key of the correlation threshold shared by all correlation workers."""
+
+
+class _ThresholdCache:
+    """
+    Holds the correlation threshold last read from redis by this process.
+    """
+
+    def __init__(self: Self) -> None:
+        self.threshold: int | None = None
+        self.read_at: float = 0.0
+
+    def is_fresh(self: Self) -> bool:
+        return (
+            self.threshold is not None
+            and time.monotonic() - self.read_at < correlation_config_data.threshold_refresh_interval
+        )
+
+    def update(self: Self, threshold: int) -> None:
+        self.threshold = threshold
+        self.read_at = time.monotonic()
+
+
+_cache: _ThresholdCache = _ThresholdCache()
+
+
+async def get_correlation_threshold(redis: Redis) -> int:
+    """
+    Returns the current correlation threshold, the maximum number of attributes of a value that are correlated.
+    The threshold is read from redis at most once per refresh interval, if it was never set the configured default
+    is used.
+    :param redis: the redis connection holding the threshold
+    :type redis: Redis
+    :return: the correlation threshold
+    :rtype: int
+    """
+    if _cache.is_fresh():
+        assert _cache.threshold is not None
+        return _cache.threshold
+
+    stored: bytes | None = await redis.get(THRESHOLD_KEY)
+    threshold: int = int(stored) if stored is not None else correlation_config_data.default_threshold
+    _cache.update(threshold)
+    return threshold
+
+
+async def set_correlation_threshold(redis: Redis, threshold: int) -> None:
+    """
+    Stores a new correlation threshold, all correlation workers use it after their refresh interval.
+    :param redis: the redis connection holding the threshold
+    :type redis: Redis
+    :param threshold: the new threshold
+    :type threshold: int
+    """
+    await redis.set(THRESHOLD_KEY, threshold)
+    _cache.update(threshold)
@@ -0,0 +1,251 @@
+import ipaddress
+import re
+import time
+from typing import Iterable, Self, TypeAlias
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.misp_database import misp_sql
+
+EXCLUSION_VERSION_KEY: str = "mmisp:correlation:exclusion_version"
+"""The redis key of the version stamp of the correlation exclusions, it is increased whenever they change."""
+
+WILDCARD: str = "%"
+"""The wildcard character used in correlation exclusions, like in MISP."""
+
+_TERMINAL: str = ""
+"""Marks a node of a trie where an entry ends, no character of a value is the empty string."""
+
+_TrieNode: TypeAlias = dict[str, "_TrieNode"]
+_RadixNode: TypeAlias = list["_RadixNode | None | bool"]
+
+
+class _Trie:
+    """
+    Character trie which tells if a value starts with one of the stored entries.
+    """
+
+    def __init__(self: Self) -> None:
+        self._root: _TrieNode = {}
+
+    def add(self: Self, entry: str) -> None:
+        """
+        Adds an entry to the trie.
+        :param entry: the entry to add
+        :type entry: str
+        """
+        node: _TrieNode = self._root
+        for character in entry:
+            node = node.setdefault(character, {})
+        node[_TERMINAL] = {}
+
+    def has_prefix_of(self: Self, value: str) -> bool:
+        """
+        Checks if one of the entries is a prefix of the value.
+        :param value: the value to check
+        :type value: str
+        :return: True if the value starts with an entry, False otherwise
+        :rtype: bool
+        """
+        node: _TrieNode | None = self._root
+        for character in value:
+            if _TERMINAL in node:
+                return True
+            node = node.get(character)
+            if node is None:
+                return False
+        return _TERMINAL in node
+
+
+class _NetworkRadixTree:
+    """
+    Binary radix tree over the bits of IP networks which tells if an address or network lies in a stored network.
+    A node is a list of the child for bit 0, the child for bit 1 and whether a stored network ends in the node.
+    """
+
+    def __init__(self: Self) -> None:
+        self._roots: dict[int, _RadixNode] = {4: [None, None, False], 6: [None, None, False]}
+
+    def add(self: Self, network: ipaddress.IPv4Network | ipaddress.IPv6Network) -> None:
+        """
+        Adds a network to the tree.
+        :param network: the network to add
+        :type network: ipaddress.IPv4Network | ipaddress.IPv6Network
+        """
+        node: _RadixNode = self._roots[network.version]
+        for bit in self._bits(network, network.prefixlen):
+            child = node[bit]
+            if child is None:
+                child = [None, None, False]
+                node[bit] = child
+            node = child  # type: ignore[assignment]
+        node[2] = True
+
+    def contains(self: Self, network: ipaddress.IPv4Network | ipaddress.IPv6Network) -> bool:
+        """
+        Checks if the network, or a single address as network, lies in one of the stored networks.
+        :param network: the network to check
+        :type network: ipaddress.IPv4Network | ipaddress.IPv6Network
+        :return: True if a stored network contains the network, False otherwise
+        :rtype: bool
+        """
+        node: _RadixNode | None = self._roots[network.version]
+        for bit in self._bits(network, network.prefixlen):
+            assert node is not None
+            if node[2]:
+                return True
+            node = node[bit]  # type: ignore[assignment]
+            if node is None:
+                return False
+        return bool(node is not None and node[2])
+
+    @staticmethod
+    def _bits(network: ipaddress.IPv4Network | ipaddress.IPv6Network, length: int) -> Iterable[int]:
+        address: int = int(network.network_address)
+        for position in range(network.max_prefixlen - 1, network.max_prefixlen - 1 - length, -1):
+            yield (address >> position) & 1
+
+
+class ExclusionMatcher:
+    """
+    In memory index of correlation exclusions.
+    Exact values are kept in a hash set, values with a trailing or leading wildcard in a prefix or suffix trie and
+    CIDR ranges in a radix tree. Values with a wildcard on both ends are matched as substrings, wildcards in other
+    places with regular expressions.
+    """
+
+    def __init__(self: Self, exclusions: Iterable[str]) -> None:
+        self._exact: set[str] = set()
+        self._prefixes: _Trie = _Trie()
+        self._suffixes: _Trie = _Trie()
+        self._networks: _NetworkRadixTree = _NetworkRadixTree()
+        self._infixes: list[str] = []
+        self._patterns: list[re.Pattern[str]] = []
+        self._has_networks: bool = False
+
+        for exclusion in exclusions:
+            self.add(exclusion)
+
+    def add(self: Self, exclusion: str) -> None:
+        """
+        Adds an exclusion to the index.
+        :param exclusion: the value of the correlation exclusion
+        :type exclusion: str
+        """
+        inner: str = exclusion.strip(WILDCARD)
+        if WILDCARD not in exclusion:
+            self._exact.add(exclusion)
+            if "/" in exclusion:
+                try:
+                    self._networks.add(ipaddress.ip_network(exclusion, strict=False))
+                    self._has_networks = True
+                except ValueError:
+                    pass
+        elif WILDCARD in inner:
+            self._patterns.append(
+                re.compile(".*".join(re.escape(part) for part in exclusion.split(WILDCARD)), re.DOTALL)
+            )
+        elif exclusion.startswith(WILDCARD) and exclusion.endswith(WILDCARD):
+            self._infixes.append(inner)
+        elif exclusion.endswith(WILDCARD):
+            self._prefixes.add(inner)
+        else:
+            self._suffixes.add(inner[::-1])
+
+    def is_excluded(self: Self, value: str) -> bool:
+        """
+        Checks if a value is excluded from correlation.
+        :param value: the value to check
+        :type value: str
+        :return: True if the value matches an exclusion, False otherwise
+        :rtype: bool
+        """
+        if value in self._exact:
+            return True
+        if self._prefixes.has_prefix_of(value) or self._suffixes.has_prefix_of(value[::-1]):
+            return True
+        if self._has_networks and self._is_excluded_network(value):
+            return True
+        if any(infix in value for infix in self._infixes):
+            return True
+        return any(pattern.fullmatch(value) for pattern in self._patterns)
+
+    def _is_excluded_network(self: Self, value: str) -> bool:
+        if not value or not (value[0].isdigit() or ":" in value):
+            return False
+        try:
+            network: ipaddress.IPv4Network | ipaddress.IPv6Network = ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            return False
+        return self._networks.contains(network)
+
+
+class CorrelationExclusionIndex:
+    """
+    Keeps the exclusion index of a worker process up to date.
+    The index is reloaded from the database when the version stamp in redis changes or it gets older than the
+    configured refresh interval, so exclusions added without increasing the stamp are picked up eventually.
+    """
+
+    def __init__(self: Self) -> None:
+        self._matcher: ExclusionMatcher | None = None
+        self._version: bytes | None = None
+        self._loaded_at: float = 0.0
+
+    async def is_excluded(self: Self, session: AsyncSession, value: str, redis: Redis | None = None) -> bool:
+        """
+        Checks if a value is excluded from correlation.
+        If redis is given the version stamp is checked before, otherwise the last known version is used.
+        :param session: the session used to reload the index
+        :type session: AsyncSession
+        :param value: the value to check
+        :type value: str
+        :param redis: the redis connection holding the version stamp
+        :type redis: Redis | None
+        :return: True if the value is excluded, False otherwise
+        :rtype: bool
+        """
+        matcher: ExclusionMatcher = await self.refresh(session, redis)
+        return matcher.is_excluded(value)
+
+    async def refresh(self: Self, session: AsyncSession, redis: Redis | None = None) -> ExclusionMatcher:
+        """
+        Reloads the index if it is outdated.
+        :param session: the session used to reload the index
+        :type session: AsyncSession
+        :param redis: the redis connection holding the version stamp
+        :type redis: Redis | None
+        :return: the current index
+        :rtype: ExclusionMatcher
+        """
+        version: bytes | None = self._version
+        if redis is not None:
+            version = await redis.get(EXCLUSION_VERSION_KEY)
+
+        expired: bool = time.monotonic() - self._loaded_at > correlation_config_data.exclusion_index_refresh_interval
+        if self._matcher is None or version != self._version or expired:
+            self._matcher = ExclusionMatcher(await misp_sql.get_excluded_correlations(session))
+            self._version = version
+            self._loaded_at = time.monotonic()
+        return self._matcher
+
+    def invalidate(self: Self) -> None:
+        """
+        Discards the index of this process, so it is reloaded on the next check.
+        """
+        self._matcher = None
+
+
+async def bump_exclusion_version(redis: Redis) -> None:
+    """
+    Increases the version stamp of the correlation exclusions, so every worker process reloads its index.
+    :param redis: the redis connection holding the version stamp
+    :type redis: Redis
+    """
+    exclusion_index.invalidate()
+    await redis.incr(EXCLUSION_VERSION_KEY)
+
+
+exclusion_index: CorrelationExclusionIndex = CorrelationExclusionIndex()
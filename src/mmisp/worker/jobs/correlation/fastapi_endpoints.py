@@ -9,18 +9,27 @@ from mmisp.worker.api.response_schemas import CreateJobResponse
 from mmisp.worker.api.worker_router import worker_router
 from mmisp.worker.controller import job_controller
 from mmisp.worker.jobs.correlation.clean_excluded_correlations_job import clean_excluded_correlations_job
+from mmisp.worker.jobs.correlation.correlate_event_job import correlate_event_job
 
 # from mmisp.worker.jobs.correlation.correlate_value_job import correlate_value_job
 from mmisp.worker.jobs.correlation.correlation_job import correlation_job
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold, set_correlation_threshold
 from mmisp.worker.jobs.correlation.job_data import (
+    AttributeChangeData,
     ChangeThresholdData,
     ChangeThresholdResponse,
+    CorrelateEventData,
     CorrelationJobData,
+    RebuildCorrelationsProgress,
+    TopCorrelationsData,
 )
 
 # from mmisp.worker.jobs.correlation.plugins.correlation_plugin_factory import correlation_plugin_factory
+from mmisp.worker.jobs.correlation.rebuild_correlations_job import get_rebuild_progress, rebuild_correlations_job
+from mmisp.worker.jobs.correlation.reconcile_over_correlating_job import reconcile_over_correlating_job
 from mmisp.worker.jobs.correlation.regenerate_occurrences_job import regenerate_occurrences_job
 from mmisp.worker.jobs.correlation.top_correlations_job import top_correlations_job
+from mmisp.worker.jobs.correlation.update_attribute_correlations_job import update_attribute_correlations_job
 
 from .queue import queue
 
@@ -40,17 +49,51 @@ async def create_correlation_job(user: UserData, data: CorrelationJobData) -> Cr
     return await job_controller.create_job(queue, correlation_job, user, data)
 
 
+@job_router.post("/correlateEvent", dependencies=[Depends(verified)])
+async def create_correlate_event_job(user: UserData, data: CorrelateEventData) -> CreateJobResponse:
+    """
+    Creates a correlate_event_job
+
+    :param user: user who called the method (not used)
+    :type user: UserData
+    :param data: contains the event to correlate
+    :type data: CorrelateEventData
+    :return: the response to indicate if the creation was successful
+    :rtype: CreateJobResponse
+    """
+    return await job_controller.create_job(queue, correlate_event_job, user, data)
+
+
+@job_router.post("/updateAttributeCorrelations", dependencies=[Depends(verified)])
+async def create_update_attribute_correlations_job(user: UserData, data: AttributeChangeData) -> CreateJobResponse:
+    """
+    Creates an update_attribute_correlations_job
+
+    :param user: user who called the method (not used)
+    :type user: UserData
+    :param data: contains the changed attribute and its old value
+    :type data: AttributeChangeData
+    :return: the response to indicate if the creation was successful
+    :rtype: CreateJobResponse
+    """
+    return await job_controller.create_job(queue, update_attribute_correlations_job, user, data)
+
+
 @job_router.post("/topCorrelations", dependencies=[Depends(verified)])
-async def create_top_correlations_job(user: Annotated[UserData, Body(embed=True)]) -> CreateJobResponse:
+async def create_top_correlations_job(
+    user: Annotated[UserData, Body(embed=True)], data: Annotated[TopCorrelationsData | None, Body(embed=True)] = None
+) -> CreateJobResponse:
     """
     Creates a top_correlations_job
 
     :param user: user who called the method (not used)
     :type user: UserData
+    :param data: optional limit and offset of the list
+    :type data: TopCorrelationsData
     :return: the response to indicate if the creation was successful
     :rtype: CreateJobResponse
     """
-    return await job_controller.create_job(queue, top_correlations_job, user)
+    return await job_controller.create_job(queue, top_correlations_job, user, data)
 
 
 @job_router.post("/cleanExcluded", dependencies=[Depends(verified)])
@@ -66,6 +109,19 @@ async def create_clean_excluded_job(user: Annotated[UserData, Body(embed=True)])
     return await job_controller.create_job(queue, clean_excluded_correlations_job, user)
 
 
+@job_router.post("/reconcileOverCorrelating", dependencies=[Depends(verified)])
+async def create_reconcile_over_correlating_job(user: Annotated[UserData, Body(embed=True)]) -> CreateJobResponse:
+    """
+    Creates a reconcile_over_correlating_job
+
+    :param user: user who called the method (not used)
+    :type user: UserData
+    :return: the response to indicate if the creation was successful
+    :rtype: CreateJobResponse
+    """
+    return await job_controller.create_job(queue, reconcile_over_correlating_job, user)
+
+
 @job_router.post("/regenerateOccurrences", dependencies=[Depends(verified)])
 async def create_regenerate_occurrences_job(user: Annotated[UserData, Body(embed=True)]) -> CreateJobResponse:
     """
@@ -79,6 +135,19 @@ async def create_regenerate_occurrences_job(user: Annotated[UserData, Body(embed
     return await job_controller.create_job(queue, regenerate_occurrences_job, user)
 
 
+@job_router.post("/rebuildCorrelations", dependencies=[Depends(verified)])
+async def create_rebuild_correlations_job(user: Annotated[UserData, Body(embed=True)]) -> CreateJobResponse:
+    """
+    Creates a rebuild_correlations_job
+
+    :param user: user who called the method (not used)
+    :type user: UserData
+    :return: the response to indicate if the creation was successful
+    :rtype: CreateJobResponse
+    """
+    return await job_controller.create_job(queue, rebuild_correlations_job, user)
+
+
 # @worker_router.get("/correlation/plugins", dependencies=[Depends(verified)])
 # def get_correlation_plugins() -> list[CorrelationPluginInfo]:
 #    """
@@ -90,7 +159,7 @@ async def create_regenerate_occurrences_job(user: Annotated[UserData, Body(embed
 
 
 @worker_router.put("/correlation/changeThreshold", dependencies=[Depends(verified)])
-def put_new_threshold(user: UserData, data: ChangeThresholdData) -> ChangeThresholdResponse:
+async def put_new_threshold(user: UserData, data: ChangeThresholdData) -> ChangeThresholdResponse:
     """
     Sets the threshold for the correlation jobs to a new value. Returns if the new threshold
     was saved successfully, if it was valid and the new threshold.
@@ -101,14 +170,30 @@ def put_new_threshold(user: UserData, data: ChangeThresholdData) -> ChangeThresh
     :return: if the new threshold was saved, if it was valid and the new threshold
     :rtype: ChangeThresholdResponse
     """
-    raise NotImplementedError("change threshold is currently not implemented")
+    if data.new_threshold < 1:
+        return ChangeThresholdResponse(saved=False, valid_threshold=False)
+    async with queue:
+        await set_correlation_threshold(queue.redis, data.new_threshold)
+    return ChangeThresholdResponse(saved=True, valid_threshold=True, new_threshold=data.new_threshold)
 
 
 @worker_router.get("/correlation/threshold", dependencies=[Depends(verified)])
-def get_threshold() -> int:
+async def get_threshold() -> int:
     """
     Returns the current threshold for the correlation jobs
     :return: the current threshold
     :rtype: int
     """
-    raise NotImplementedError("get threshold is currently not implemented")
+    async with queue:
+        return await get_correlation_threshold(queue.redis)
+
+
+@worker_router.get("/correlation/rebuildProgress", dependencies=[Depends(verified)])
+async def get_rebuild_correlations_progress() -> RebuildCorrelationsProgress | None:
+    """
+    Returns the progress of the running or last rebuild correlations job
+    :return: the progress or None if no rebuild was started
+    :rtype: RebuildCorrelationsProgress | None
+    """
+    async with queue:
+        return await get_rebuild_progress(queue.redis)
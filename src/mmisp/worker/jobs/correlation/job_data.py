@@ -17,6 +17,21 @@ class CorrelationResponse(BaseModel):
     is_over_correlating_value: bool
     plugin_name: Optional[str] = None
     events: Optional[set[UUID]] = None
+    coalesced: bool = False
+    """True if the value was correlated by another job started at the same time."""
+
+
+class CorrelateEventResponse(BaseModel):
+    """
+    Response for the correlation of all attributes of an event.
+    """
+
+    success: bool
+    found_correlations: bool
+    correlated_values: int
+    excluded_values: int
+    over_correlating_values: int
+    events: Optional[set[UUID]] = None
 
 
 class TopCorrelationsResponse(BaseModel):
@@ -37,6 +52,35 @@ class DatabaseChangedResponse(BaseModel):
     database_changed: bool
 
 
+class CleanExcludedCorrelationsResponse(DatabaseChangedResponse):
+    """
+    Response for the clean excluded correlations job.
+    """
+
+    deleted_correlations: int
+
+
+class RebuildCorrelationsProgress(BaseModel):
+    """
+    Progress of the rebuild correlations job.
+    """
+
+    finished: bool = False
+    processed_attributes: int = 0
+    processed_values: int = 0
+    correlated_values: int = 0
+    over_correlating_values: int = 0
+    added_correlations: int = 0
+
+
+class RebuildCorrelationsResponse(DatabaseChangedResponse):
+    """
+    Response for the rebuild correlations job.
+    """
+
+    progress: RebuildCorrelationsProgress
+
+
 class ChangeThresholdResponse(BaseModel):
     """
     Response for the change of the threshold.
@@ -54,6 +98,47 @@ class CorrelationJobData(BaseModel):
 
     attribute_id: int
     correlation_plugin_name: str = "ExactValueCorrelationPlugin"
+    new_attribute: bool = False
+    """True if the attribute was just created, only then the occurrence counter of its value is increased."""
+
+
+class CorrelateEventData(BaseModel):
+    """
+    Data for a job correlating all attributes of an event.
+    """
+
+    event_id: int
+
+
+class AttributeChangeData(BaseModel):
+    """
+    Data for a job updating the correlations of a changed attribute.
+    """
+
+    attribute_id: int
+    old_value: Optional[str] = None
+    """The value of the attribute before the change, the current value is used if it is not given."""
+
+
+class RegenerateOccurrencesShardData(BaseModel):
+    """
+    Data for a shard of the regenerate occurrences job.
+    """
+
+    shard: int
+    shard_count: int
+    correlation_threshold: int
+    run_id: str = ""
+    """The id of the regeneration the shard belongs to, shards of a regeneration are run only once."""
+
+
+class TopCorrelationsData(BaseModel):
+    """
+    Data for a top correlations job.
+    """
+
+    limit: Optional[int] = None
+    offset: int = 0
 
 
 class ChangeThresholdData(BaseModel):
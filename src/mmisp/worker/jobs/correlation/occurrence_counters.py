@@ -0,0 +1,167 @@
+from typing import Collection, Mapping
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.value_lock import value_digest
+from mmisp.worker.misp_database import misp_sql
+
+OCCURRENCE_KEY: str = "mmisp:correlation:occurrence"
+"""The prefix of the redis keys holding the number of correlatable attributes of a value."""
+
+COUNTED_KEY: str = "mmisp:correlation:counted"
+"""The prefix of the redis keys marking created attributes that were already added to the counter of their value."""
+
+DIRTY_OCCURRENCES_KEY: str = "mmisp:correlation:dirty_occurrences"
+"""The redis set of values whose counter changed since the over correlating values were last reconciled."""
+
+_INCREMENT_IF_EXISTS: str = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    local occurrence = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if occurrence < 0 then
+        redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+        return 0
+    end
+    return occurrence
+end
+return false
+"""
+
+
+def _occurrence_key(value: str) -> str:
+    return f"{OCCURRENCE_KEY}:{value_digest(value)}"
+
+
+async def get_occurrences(redis: Redis, values: Collection[str]) -> dict[str, int]:
+    """
+    Returns the counted occurrences of the values.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param values: the values to get the occurrences of
+    :type values: Collection[str]
+    :return: the occurrences of the values, values without a counter are missing
+    :rtype: dict[str, int]
+    """
+    if not values:
+        return {}
+    ordered: list[str] = list(values)
+    counters: list[bytes | None] = await redis.mget([_occurrence_key(value) for value in ordered])
+    return {value: int(counter) for value, counter in zip(ordered, counters) if counter is not None}
+
+
+async def set_occurrences(redis: Redis, occurrences: Mapping[str, int]) -> None:
+    """
+    Sets the counters of the values to the numbers counted in the database.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param occurrences: the number of correlatable attributes per value
+    :type occurrences: Mapping[str, int]
+    """
+    if not occurrences:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for value, occurrence in occurrences.items():
+            pipe.set(_occurrence_key(value), occurrence, ex=correlation_config_data.occurrence_counter_ttl)
+        await pipe.execute()
+
+
+async def increment_occurrence(redis: Redis, value: str, amount: int = 1) -> int | None:
+    """
+    Changes the counter of a value by the amount if the value has a counter and marks the value for reconciliation.
+    The counter never drops below zero.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param value: the value
+    :type value: str
+    :param amount: the amount to add to the counter
+    :type amount: int
+    :return: the new occurrence or None if the value has no counter
+    :rtype: int | None
+    """
+    occurrence: int | None = await redis.eval(_INCREMENT_IF_EXISTS, 1, _occurrence_key(value), amount)
+    if occurrence is not None:
+        await mark_dirty(redis, [value])
+    return occurrence
+
+
+async def count_new_attribute(redis: Redis, attribute_id: int, value: str) -> int | None:
+    """
+    Increases the counter of the value of a newly created attribute.
+    Every attribute is counted only once, so re-runs and retries of its jobs don't increase the counter again.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param attribute_id: the id of the created attribute
+    :type attribute_id: int
+    :param value: the value of the attribute
+    :type value: str
+    :return: the new occurrence or None if the value has no counter or the attribute was already counted
+    :rtype: int | None
+    """
+    if not await redis.set(
+        f"{COUNTED_KEY}:{attribute_id}", 1, nx=True, ex=correlation_config_data.occurrence_counter_ttl
+    ):
+        return None
+    return await increment_occurrence(redis, value)
+
+
+async def invalidate_occurrences(redis: Redis, values: Collection[str]) -> None:
+    """
+    Removes the counters of the values, they are counted in the database again on their next use.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param values: the values
+    :type values: Collection[str]
+    """
+    if values:
+        await redis.delete(*(_occurrence_key(value) for value in values))
+
+
+async def mark_dirty(redis: Redis, values: Collection[str]) -> None:
+    """
+    Marks values whose over correlating entry may not match their counter anymore.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param values: the values
+    :type values: Collection[str]
+    """
+    if values:
+        await redis.sadd(DIRTY_OCCURRENCES_KEY, *values)
+
+
+async def reconcile_over_correlating_values(
+    session: AsyncSession, redis: Redis, correlation_threshold: int, batch_size: int = 1000
+) -> int:
+    """
+    Writes the marked values whose counter is over the threshold to the over_correlating_values table in batches.
+    The counters only select the candidates, the attributes of every candidate are counted in the database again
+    and its counter is reset to that number, so a drifted counter never deletes correlations on its own. Candidates
+    that are really over the threshold lose their correlations and get their occurrence updated, values that fell
+    below the threshold are left to the regenerate occurrences job.
+    :param session: the database session
+    :type session: AsyncSession
+    :param redis: the redis connection
+    :type redis: Redis
+    :param correlation_threshold: the maximum number of attributes of a value that are correlated
+    :type correlation_threshold: int
+    :param batch_size: the number of values taken from redis at once
+    :type batch_size: int
+    :return: the number of updated over correlating values
+    :rtype: int
+    """
+    updated: int = 0
+    while True:
+        members: list[bytes] = await redis.spop(DIRTY_OCCURRENCES_KEY, batch_size)
+        if not members:
+            return updated
+        occurrences: dict[str, int] = await get_occurrences(redis, [member.decode() for member in members])
+        candidates: list[str] = [
+            value for value, occurrence in occurrences.items() if occurrence > correlation_threshold
+        ]
+        for value in candidates:
+            count: int = await misp_sql.get_number_of_attributes_with_same_value(session, value)
+            await set_occurrences(redis, {value: count})
+            if count > correlation_threshold:
+                await misp_sql.delete_correlations(session, value)
+                await misp_sql.add_over_correlating_value(session, value, count)
+                updated += 1
@@ -1,3 +1,3 @@
-from . import simple_value
+from . import fuzzy_hash, ip_range, simple_value
 
-__all__ = ["simple_value"]
+__all__ = ["fuzzy_hash", "ip_range", "simple_value"]
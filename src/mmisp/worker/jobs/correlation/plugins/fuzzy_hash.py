@@ -0,0 +1,448 @@
+import re
+import sys
+import time
+from typing import Iterable, NamedTuple, Self, TypeAlias
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mmisp.db.models.attribute import Attribute
+from mmisp.lib.logger import get_jobs_logger
+from mmisp.plugins import factory
+from mmisp.plugins.types import CorrelationPluginType, PluginType
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.exclusion_index import exclusion_index
+from mmisp.worker.jobs.correlation.job_data import CorrelationResponse
+from mmisp.worker.jobs.correlation.utility import save_pairwise_correlations
+from mmisp.worker.misp_database import misp_sql
+
+db_logger = get_jobs_logger(__name__)
+
+NAME: str = "FuzzyHashCorrelationPlugin"
+PLUGIN_TYPE: PluginType = PluginType.CORRELATION
+DESCRIPTION: str = "This plugin correlates ssdeep and TLSH hashes which are similar to each other."
+AUTHOR: str = "MMISP"
+VERSION: str = "0.1"
+CORRELATION_TYPE: CorrelationPluginType = CorrelationPluginType.OTHER
+
+SSDEEP: str = "ssdeep"
+TLSH: str = "tlsh"
+FUZZY_HASH_ATTRIBUTE_TYPES: dict[str, str] = {
+    "ssdeep": SSDEEP,
+    "filename|ssdeep": SSDEEP,
+    "tlsh": TLSH,
+    "filename|tlsh": TLSH,
+}
+"""The attribute types with a fuzzy hash and the kind of the hash."""
+
+SSDEEP_MIN_SCORE: int = 50
+"""The minimal ssdeep match score, from 0 to 100, of two correlated hashes."""
+
+TLSH_MAX_DISTANCE: int = 30
+"""The maximal TLSH distance of two correlated hashes."""
+
+REBUILD_INTERVAL: float = 3600.0
+"""The time in seconds after which the index is built again, to drop changed and deleted attributes."""
+
+_SSDEEP_NGRAM: int = 7
+"""The length of the common substring ssdeep requires for a score above zero, its rolling window size."""
+
+_SSDEEP_MIN_BLOCKSIZE: int = 3
+_SSDEEP_SPAMSUM_LENGTH: int = 64
+
+_TLSH_BANDS: int = 32
+"""
+The number of bands the body of a TLSH hash is split into, one byte each. Every differing quartile of the body adds
+at least one to the distance, so with more bands than the maximal distance similar hashes share at least one band.
+"""
+
+_TLSH_MAX_LENGTH_DIFFERENCE: int = 2
+"""The largest difference of the length values of two hashes within the maximal distance, a larger one costs 36."""
+
+_SSDEEP_PATTERN: re.Pattern[str] = re.compile(r"^([1-9]\d*):([0-9A-Za-z+/]{1,64}):([0-9A-Za-z+/]{1,64})(?:,.*)?$")
+_TLSH_PATTERN: re.Pattern[str] = re.compile(r"^(?:t1)?([0-9a-f]{70})$")
+_SEQUENCES: re.Pattern[str] = re.compile(r"(.)\1{3,}")
+
+
+class SsdeepHash(NamedTuple):
+    """
+    A parsed ssdeep hash, the runs of more than three equal characters in the chunks are already shortened.
+    """
+
+    block_size: int
+    chunk: str
+    double_chunk: str
+
+
+class TlshHash(NamedTuple):
+    """
+    A parsed TLSH hash.
+    """
+
+    checksum: int
+    l_value: int
+    q1_ratio: int
+    q2_ratio: int
+    body: bytes
+
+
+FuzzyHash: TypeAlias = SsdeepHash | TlshHash
+
+
+def parse_ssdeep(value: str) -> SsdeepHash | None:
+    """
+    Parses a ssdeep hash.
+    :param value: the hash
+    :type value: str
+    :return: the parsed hash or None if the value is no ssdeep hash
+    :rtype: SsdeepHash | None
+    """
+    match: re.Match[str] | None = _SSDEEP_PATTERN.match(value.strip())
+    if match is None or not _is_ssdeep_block_size(int(match[1]), match[2]):
+        return None
+    return SsdeepHash(int(match[1]), _SEQUENCES.sub(r"\1\1\1", match[2]), _SEQUENCES.sub(r"\1\1\1", match[3]))
+
+
+def _is_ssdeep_block_size(block_size: int, chunk: str) -> bool:
+    """
+    Checks if ssdeep can choose the block size for a hash with the chunk. Block sizes are the minimal block size
+    times a power of two, and ssdeep only keeps a larger block size if its chunk is at least half the spamsum length.
+    """
+    multiple, remainder = divmod(block_size, _SSDEEP_MIN_BLOCKSIZE)
+    if remainder != 0 or multiple & (multiple - 1) != 0:
+        return False
+    return block_size == _SSDEEP_MIN_BLOCKSIZE or len(chunk) >= _SSDEEP_SPAMSUM_LENGTH // 2
+
+
+def parse_tlsh(value: str) -> TlshHash | None:
+    """
+    Parses a TLSH hash, with or without the version prefix.
+    :param value: the hash
+    :type value: str
+    :return: the parsed hash or None if the value is no TLSH hash
+    :rtype: TlshHash | None
+    """
+    match: re.Match[str] | None = _TLSH_PATTERN.match(value.strip().lower())
+    if match is None:
+        return None
+    raw: bytes = bytes.fromhex(match[1])
+    # the nibbles of the header bytes are swapped in the hex representation
+    checksum, l_value, q_ratios = (((byte & 0x0F) << 4) | (byte >> 4) for byte in raw[:3])
+    return TlshHash(checksum, l_value, q_ratios & 0x0F, q_ratios >> 4, raw[3:])
+
+
+def parse_fuzzy_hash(attribute_type: str, value1: str, value2: str) -> FuzzyHash | None:
+    """
+    Parses the fuzzy hash of an attribute.
+    :param attribute_type: the type of the attribute
+    :type attribute_type: str
+    :param value1: the first value of the attribute
+    :type value1: str
+    :param value2: the second value of the attribute
+    :type value2: str
+    :return: the parsed hash or None if the attribute has no valid fuzzy hash
+    :rtype: FuzzyHash | None
+    """
+    kind: str | None = FUZZY_HASH_ATTRIBUTE_TYPES.get(attribute_type)
+    value: str = value2 if attribute_type.startswith("filename|") else value1
+    if kind == SSDEEP:
+        return parse_ssdeep(value)
+    if kind == TLSH:
+        return parse_tlsh(value)
+    return None
+
+
+async def get_fuzzy_hash_values(db: AsyncSession) -> set[str]:
+    """
+    Returns the hashes of all correlatable ssdeep and TLSH attributes. The correlations stored under these values
+    are maintained by this plugin and not by exact value correlation. The values are taken from the attributes by
+    their type, so values that only look like a fuzzy hash are not affected.
+    :return: the fuzzy hashes
+    :rtype: set[str]
+    """
+    return await misp_sql.get_distinct_attribute_values(
+        db,
+        [attribute_type for attribute_type in FUZZY_HASH_ATTRIBUTE_TYPES if not attribute_type.startswith("filename|")],
+        [attribute_type for attribute_type in FUZZY_HASH_ATTRIBUTE_TYPES if attribute_type.startswith("filename|")],
+    )
+
+
+def buckets(fuzzy_hash: FuzzyHash) -> Iterable[tuple]:
+    """
+    Returns the locality-sensitive buckets a hash is stored in, two hashes can only be similar if one of the buckets
+    of a hash is among the lookup buckets of the other.
+    ssdeep hashes are bucketed by the substrings of the length ssdeep requires in common, keyed by the block size of
+    their chunk. TLSH hashes are bucketed by the bands of their body, keyed by their length value.
+    :param fuzzy_hash: the hash
+    :type fuzzy_hash: FuzzyHash
+    :return: the keys of the buckets
+    :rtype: Iterable[tuple]
+    """
+    if isinstance(fuzzy_hash, SsdeepHash):
+        for block_size, chunk in (
+            (fuzzy_hash.block_size, fuzzy_hash.chunk),
+            (fuzzy_hash.block_size * 2, fuzzy_hash.double_chunk),
+        ):
+            for start in range(len(chunk) - _SSDEEP_NGRAM + 1):
+                yield SSDEEP, block_size, chunk[start : start + _SSDEEP_NGRAM]
+    else:
+        yield from _tlsh_buckets(fuzzy_hash, fuzzy_hash.l_value)
+
+
+def lookup_buckets(fuzzy_hash: FuzzyHash) -> Iterable[tuple]:
+    """
+    Returns the buckets the similar hashes of a hash are stored in. For TLSH hashes these are the buckets of all
+    length values within the maximal distance.
+    :param fuzzy_hash: the hash
+    :type fuzzy_hash: FuzzyHash
+    :return: the keys of the buckets
+    :rtype: Iterable[tuple]
+    """
+    if isinstance(fuzzy_hash, SsdeepHash):
+        yield from buckets(fuzzy_hash)
+        return
+    for offset in range(-_TLSH_MAX_LENGTH_DIFFERENCE, _TLSH_MAX_LENGTH_DIFFERENCE + 1):
+        yield from _tlsh_buckets(fuzzy_hash, (fuzzy_hash.l_value + offset) % 256)
+
+
+def _tlsh_buckets(fuzzy_hash: TlshHash, l_value: int) -> Iterable[tuple]:
+    width: int = len(fuzzy_hash.body) // _TLSH_BANDS
+    for band in range(_TLSH_BANDS):
+        yield TLSH, l_value, band, fuzzy_hash.body[band * width : (band + 1) * width]
+
+
+def ssdeep_score(first: SsdeepHash, second: SsdeepHash) -> int:
+    """
+    Computes the match score of two ssdeep hashes like ssdeep itself.
+    :param first: the first hash
+    :type first: SsdeepHash
+    :param second: the second hash
+    :type second: SsdeepHash
+    :return: the score from 0, not similar, to 100, identical
+    :rtype: int
+    """
+    if first.block_size == second.block_size:
+        if first.chunk == second.chunk and first.double_chunk == second.double_chunk:
+            return 100
+        return max(
+            _score_chunks(first.chunk, second.chunk, first.block_size),
+            _score_chunks(first.double_chunk, second.double_chunk, first.block_size * 2),
+        )
+    if first.block_size == second.block_size * 2:
+        return _score_chunks(first.chunk, second.double_chunk, first.block_size)
+    if second.block_size == first.block_size * 2:
+        return _score_chunks(first.double_chunk, second.chunk, second.block_size)
+    return 0
+
+
+def _score_chunks(first: str, second: str, block_size: int) -> int:
+    if len(first) > _SSDEEP_SPAMSUM_LENGTH or len(second) > _SSDEEP_SPAMSUM_LENGTH:
+        return 0
+    grams: set[str] = {first[i : i + _SSDEEP_NGRAM] for i in range(len(first) - _SSDEEP_NGRAM + 1)}
+    if not any(second[i : i + _SSDEEP_NGRAM] in grams for i in range(len(second) - _SSDEEP_NGRAM + 1)):
+        return 0
+
+    score: int = _edit_distance(first, second) * _SSDEEP_SPAMSUM_LENGTH // (len(first) + len(second))
+    score = 100 * score // _SSDEEP_SPAMSUM_LENGTH
+    if score >= 100:
+        return 0
+    score = 100 - score
+    if block_size >= (99 + _SSDEEP_NGRAM) // _SSDEEP_NGRAM * _SSDEEP_MIN_BLOCKSIZE:
+        return score
+    # small block sizes produce short chunks, whose matches are less meaningful
+    return min(score, block_size // _SSDEEP_MIN_BLOCKSIZE * min(len(first), len(second)))
+
+
+def _edit_distance(first: str, second: str) -> int:
+    """
+    Edit distance with the costs ssdeep uses, one for an insertion or removal and two for a replacement.
+    """
+    previous: list[int] = list(range(len(second) + 1))
+    for i, first_character in enumerate(first, start=1):
+        current: list[int] = [i]
+        for j, second_character in enumerate(second, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (0 if first_character == second_character else 2),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def tlsh_distance(first: TlshHash, second: TlshHash) -> int:
+    """
+    Computes the distance of two TLSH hashes like TLSH itself, including the length difference.
+    :param first: the first hash
+    :type first: TlshHash
+    :param second: the second hash
+    :type second: TlshHash
+    :return: the distance, 0 for identical hashes
+    :rtype: int
+    """
+    distance: int = 0
+    length_difference: int = _mod_difference(first.l_value, second.l_value, 256)
+    distance += length_difference if length_difference <= 1 else length_difference * 12
+    for first_ratio, second_ratio in ((first.q1_ratio, second.q1_ratio), (first.q2_ratio, second.q2_ratio)):
+        ratio_difference: int = _mod_difference(first_ratio, second_ratio, 16)
+        distance += ratio_difference if ratio_difference <= 1 else (ratio_difference - 1) * 12
+    if first.checksum != second.checksum:
+        distance += 1
+    for first_byte, second_byte in zip(first.body, second.body):
+        for shift in range(0, 8, 2):
+            difference: int = abs(((first_byte >> shift) & 3) - ((second_byte >> shift) & 3))
+            distance += 6 if difference == 3 else difference
+    return distance
+
+
+def _mod_difference(first: int, second: int, modulus: int) -> int:
+    difference: int = abs(first - second)
+    return min(difference, modulus - difference)
+
+
+def is_similar(first: FuzzyHash, second: FuzzyHash) -> bool:
+    """
+    Checks if two fuzzy hashes are similar enough to be correlated.
+    :param first: the first hash
+    :type first: FuzzyHash
+    :param second: the second hash
+    :type second: FuzzyHash
+    :return: True if both hashes are of the same kind and similar, False otherwise
+    :rtype: bool
+    """
+    if isinstance(first, SsdeepHash) and isinstance(second, SsdeepHash):
+        return ssdeep_score(first, second) >= SSDEEP_MIN_SCORE
+    if isinstance(first, TlshHash) and isinstance(second, TlshHash):
+        return tlsh_distance(first, second) <= TLSH_MAX_DISTANCE
+    return False
+
+
+class FuzzyHashIndex:
+    """
+    Index of the fuzzy hashes of the attributes in locality-sensitive buckets, so only the attributes sharing a bucket
+    with a hash have to be scored.
+    """
+
+    def __init__(self: Self) -> None:
+        self._buckets: dict[tuple, set[int]] = {}
+        self._max_id: int = 0
+        self._built_at: float = 0.0
+
+    def clear(self: Self) -> None:
+        """
+        Removes all attributes from the index.
+        """
+        self._buckets.clear()
+        self._max_id = 0
+
+    async def update(self: Self, db: AsyncSession) -> None:
+        """
+        Adds the attributes created since the last update, the index is built again after the rebuild interval.
+        :param db: the database session
+        :type db: AsyncSession
+        """
+        if time.monotonic() - self._built_at > REBUILD_INTERVAL:
+            self.clear()
+            self._built_at = time.monotonic()
+        async for attribute_id, attribute_type, value1, value2 in misp_sql.stream_attribute_typed_values(
+            db, FUZZY_HASH_ATTRIBUTE_TYPES.keys(), self._max_id, correlation_config_data.rebuild_batch_size
+        ):
+            fuzzy_hash: FuzzyHash | None = parse_fuzzy_hash(attribute_type, value1, value2)
+            if fuzzy_hash is not None:
+                self.add(attribute_id, fuzzy_hash)
+            self._max_id = max(self._max_id, attribute_id)
+
+    def add(self: Self, attribute_id: int, fuzzy_hash: FuzzyHash) -> None:
+        """
+        Adds an attribute to the index.
+        :param attribute_id: the id of the attribute
+        :type attribute_id: int
+        :param fuzzy_hash: the fuzzy hash of the attribute
+        :type fuzzy_hash: FuzzyHash
+        """
+        for bucket in buckets(fuzzy_hash):
+            self._buckets.setdefault(bucket, set()).add(attribute_id)
+
+    def candidates(self: Self, fuzzy_hash: FuzzyHash) -> set[int]:
+        """
+        Returns the attributes stored in a lookup bucket of the hash.
+        :param fuzzy_hash: the hash to look up
+        :type fuzzy_hash: FuzzyHash
+        :return: the ids of the attributes
+        :rtype: set[int]
+        """
+        result: set[int] = set()
+        for bucket in lookup_buckets(fuzzy_hash):
+            result |= self._buckets.get(bucket, set())
+        return result
+
+
+index: FuzzyHashIndex = FuzzyHashIndex()
+
+
+async def run(db: AsyncSession, attribute: Attribute, correlation_threshold: int) -> CorrelationResponse:
+    """
+    Static method to correlate a ssdeep or TLSH attribute with all attributes whose hash is similar. Only the
+    attributes sharing a bucket with the hash are scored. Each correlation is stored under the hash of the older
+    attribute.
+    :param attribute: the attribute to correlate
+    :type attribute: Attribute
+    :param correlation_threshold: the maximum number of attributes an attribute is correlated with
+    :type correlation_threshold: int
+    :return: relevant information about the correlation
+    :rtype: CorrelationResponse
+    """
+    fuzzy_hash: FuzzyHash | None = parse_fuzzy_hash(attribute.type, attribute.value1, attribute.value2)
+    if fuzzy_hash is None:
+        return CorrelationResponse(
+            success=True,
+            found_correlations=False,
+            is_excluded_value=False,
+            is_over_correlating_value=False,
+            plugin_name=NAME,
+        )
+    own_value: str = attribute.value2 if attribute.type.startswith("filename|") else attribute.value1
+    if await exclusion_index.is_excluded(db, own_value):
+        return CorrelationResponse(
+            success=True,
+            found_correlations=False,
+            is_excluded_value=True,
+            is_over_correlating_value=False,
+            plugin_name=NAME,
+        )
+
+    await index.update(db)
+    candidates: set[int] = index.candidates(fuzzy_hash) - {attribute.id}
+    # score the candidates with their current values, they may have changed since they were indexed
+    matches: dict[int, str] = {}
+    for attribute_id, attribute_type, value1, value2 in await misp_sql.get_attribute_typed_values(
+        db, FUZZY_HASH_ATTRIBUTE_TYPES.keys(), attribute_ids=candidates
+    ):
+        other: FuzzyHash | None = parse_fuzzy_hash(attribute_type, value1, value2)
+        if other is not None and is_similar(fuzzy_hash, other):
+            other_value: str = value2 if attribute_type.startswith("filename|") else value1
+            matches[attribute_id] = other_value if attribute_id < attribute.id else own_value
+
+    if len(matches) > correlation_threshold:
+        return CorrelationResponse(
+            success=True,
+            found_correlations=True,
+            is_excluded_value=False,
+            is_over_correlating_value=True,
+            plugin_name=NAME,
+        )
+
+    events: set[UUID] = await save_pairwise_correlations(db, attribute.id, matches)
+    return CorrelationResponse(
+        success=True,
+        found_correlations=len(events) > 0,
+        is_excluded_value=False,
+        is_over_correlating_value=False,
+        plugin_name=NAME,
+        events=events or None,
+    )
+
+
+factory.register(sys.modules[__name__])
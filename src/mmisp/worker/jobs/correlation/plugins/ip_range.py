@@ -0,0 +1,282 @@
+import ipaddress
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Iterable, Self, TypeAlias
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mmisp.db.models.attribute import Attribute
+from mmisp.lib.logger import get_jobs_logger
+from mmisp.plugins import factory
+from mmisp.plugins.types import CorrelationPluginType, PluginType
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.exclusion_index import exclusion_index
+from mmisp.worker.jobs.correlation.job_data import CorrelationResponse
+from mmisp.worker.jobs.correlation.utility import save_pairwise_correlations
+from mmisp.worker.misp_database import misp_sql
+
+db_logger = get_jobs_logger(__name__)
+
+NAME: str = "IPRangeCorrelationPlugin"
+PLUGIN_TYPE: PluginType = PluginType.CORRELATION
+DESCRIPTION: str = "This plugin correlates IP addresses with the CIDR ranges containing them."
+AUTHOR: str = "MMISP"
+VERSION: str = "0.1"
+CORRELATION_TYPE: CorrelationPluginType = CorrelationPluginType.OTHER
+
+IP_ATTRIBUTE_TYPES: frozenset[str] = frozenset({"ip-src", "ip-dst", "ip-src|port", "ip-dst|port"})
+"""The attribute types whose first value is an IP address or a CIDR range."""
+
+CHANGES_INTERVAL: float = 60.0
+"""The time in seconds after which changed attributes are looked up again, new attributes are added on every update."""
+
+Network: TypeAlias = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+def parse_network(value: str) -> Network | None:
+    """
+    Parses an IP address or a CIDR range, an address becomes a range with a single address.
+    :param value: the value to parse
+    :type value: str
+    :return: the range or None if the value is no IP address or range
+    :rtype: Network | None
+    """
+    try:
+        return ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        return None
+
+
+def is_range_value(value: str) -> bool:
+    """
+    Checks if a value is a CIDR range with more than one address, the correlations of such values are maintained by
+    this plugin and not by exact value correlation.
+    :param value: the value to check
+    :type value: str
+    :return: True if the value is a CIDR range, False otherwise
+    :rtype: bool
+    """
+    if "/" not in value:
+        return False
+    network: Network | None = parse_network(value)
+    return network is not None and network.num_addresses > 1
+
+
+class IPRangeIndex:
+    """
+    Index of the IP and CIDR values of the attributes.
+    Because CIDR ranges are either nested or disjoint, the ranges containing a range are found by looking up its
+    supernets in a hash map and the ranges inside a range by a binary search over the ranges sorted by their first
+    address. Entries of changed attributes stay in the sorted ranges until they are compacted, they are skipped by
+    lookups.
+    """
+
+    def __init__(self: Self) -> None:
+        self._networks: dict[int, Network] = {}
+        self._attributes: dict[Network, set[int]] = {}
+        self._starts: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+        self._stale: int = 0
+        self._max_id: int = 0
+        self._max_timestamp: datetime | None = None
+        self._changes_checked_at: float = 0.0
+
+    def clear(self: Self) -> None:
+        """
+        Removes all attributes from the index.
+        """
+        self._networks.clear()
+        self._attributes.clear()
+        self._starts = {4: [], 6: []}
+        self._stale = 0
+        self._max_id = 0
+        self._max_timestamp = None
+
+    async def update(self: Self, db: AsyncSession) -> None:
+        """
+        Adds the attributes created since the last update, attributes changed since then are looked up again after
+        the changes interval.
+        :param db: the database session
+        :type db: AsyncSession
+        """
+        changed_since: datetime | None = None
+        if time.monotonic() - self._changes_checked_at > CHANGES_INTERVAL:
+            changed_since = self._max_timestamp
+            self._changes_checked_at = time.monotonic()
+
+        entries: list[tuple[int, Network | None]] = []
+        async for attribute_id, value, correlatable, timestamp in misp_sql.stream_attribute_first_values(
+            db, IP_ATTRIBUTE_TYPES, self._max_id, changed_since, correlation_config_data.rebuild_batch_size
+        ):
+            entries.append((attribute_id, parse_network(value) if correlatable else None))
+            self._max_id = max(self._max_id, attribute_id)
+            if self._max_timestamp is None or timestamp > self._max_timestamp:
+                self._max_timestamp = timestamp
+        self.set_networks(entries)
+
+    def add(self: Self, attribute_id: int, network: Network) -> None:
+        """
+        Adds an attribute to the index.
+        :param attribute_id: the id of the attribute
+        :type attribute_id: int
+        :param network: the IP range of the attribute
+        :type network: Network
+        """
+        self.set_networks([(attribute_id, network)])
+
+    def set_networks(self: Self, entries: Iterable[tuple[int, Network | None]]) -> None:
+        """
+        Sets the ranges of attributes at once, the sorted ranges are merged with the new ones in one pass.
+        :param entries: the ids of the attributes and their ranges, None removes an attribute from the index
+        :type entries: Iterable[tuple[int, Network | None]]
+        """
+        added: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+        for attribute_id, network in entries:
+            previous: Network | None = self._networks.get(attribute_id)
+            if previous == network:
+                continue
+            if previous is not None:
+                self._attributes[previous].discard(attribute_id)
+                if not self._attributes[previous]:
+                    del self._attributes[previous]
+                del self._networks[attribute_id]
+                self._stale += 1
+            if network is not None:
+                self._networks[attribute_id] = network
+                self._attributes.setdefault(network, set()).add(attribute_id)
+                added[network.version].append((int(network.network_address), network.prefixlen, attribute_id))
+
+        if self._stale > len(self._networks):
+            self._compact()
+            return
+        for version, starts in added.items():
+            if starts:
+                # both lists are sorted runs, which sort merges in linear time
+                self._starts[version].extend(starts)
+                self._starts[version].sort()
+
+    def _compact(self: Self) -> None:
+        """
+        Builds the sorted ranges again from the current ranges of the attributes, dropping the stale entries.
+        """
+        starts: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+        for attribute_id, network in self._networks.items():
+            starts[network.version].append((int(network.network_address), network.prefixlen, attribute_id))
+        for version_starts in starts.values():
+            version_starts.sort()
+        self._starts = starts
+        self._stale = 0
+
+    def overlapping(self: Self, network: Network) -> dict[int, Network]:
+        """
+        Returns the attributes whose range contains the given range or lies in it.
+        :param network: the range to look up
+        :type network: Network
+        :return: the ids of the attributes and the larger range of each pair
+        :rtype: dict[int, Network]
+        """
+        result: dict[int, Network] = {}
+        for prefix_length in range(network.prefixlen + 1):
+            supernet: Network = network.supernet(new_prefix=prefix_length)
+            for attribute_id in self._attributes.get(supernet, ()):
+                result[attribute_id] = supernet
+
+        starts: list[tuple[int, int, int]] = self._starts[network.version]
+        last_address: int = int(network.broadcast_address)
+        position: int = bisect_left(starts, (int(network.network_address), network.prefixlen, 0))
+        while position < len(starts) and starts[position][0] <= last_address:
+            first_address, prefix_length, attribute_id = starts[position]
+            current: Network | None = self._networks.get(attribute_id)
+            is_current: bool = (
+                current is not None
+                and current.prefixlen == prefix_length
+                and int(current.network_address) == first_address
+            )
+            if is_current and prefix_length >= network.prefixlen:
+                result.setdefault(attribute_id, network)
+            position += 1
+        return result
+
+
+index: IPRangeIndex = IPRangeIndex()
+
+
+async def run(db: AsyncSession, attribute: Attribute, correlation_threshold: int) -> CorrelationResponse:
+    """
+    Static method to correlate an IP address or CIDR range attribute with all attributes whose range contains it or
+    lies in it. Each correlation is stored under the value of the larger range.
+    :param attribute: the attribute to correlate
+    :type attribute: Attribute
+    :param correlation_threshold: the maximum number of attributes an attribute is correlated with
+    :type correlation_threshold: int
+    :return: relevant information about the correlation
+    :rtype: CorrelationResponse
+    """
+    network: Network | None = parse_network(attribute.value1) if attribute.type in IP_ATTRIBUTE_TYPES else None
+    if network is None:
+        return CorrelationResponse(
+            success=True,
+            found_correlations=False,
+            is_excluded_value=False,
+            is_over_correlating_value=False,
+            plugin_name=NAME,
+        )
+    if await exclusion_index.is_excluded(db, attribute.value):
+        return CorrelationResponse(
+            success=True,
+            found_correlations=False,
+            is_excluded_value=True,
+            is_over_correlating_value=False,
+            plugin_name=NAME,
+        )
+
+    await index.update(db)
+    candidates: dict[int, Network] = index.overlapping(network)
+    candidates.pop(attribute.id, None)
+    # confirm the candidates, their values may have changed since they were indexed
+    matches: dict[int, Network] = {}
+    for attribute_id, value in await misp_sql.get_attribute_first_values(
+        db, IP_ATTRIBUTE_TYPES, attribute_ids=candidates.keys()
+    ):
+        current: Network | None = parse_network(value)
+        if current is not None and (current.version == network.version) and _overlap(current, network):
+            matches[attribute_id] = current if current.prefixlen <= network.prefixlen else network
+
+    if len(matches) > correlation_threshold:
+        return CorrelationResponse(
+            success=True,
+            found_correlations=True,
+            is_excluded_value=False,
+            is_over_correlating_value=True,
+            plugin_name=NAME,
+        )
+
+    events: set[UUID] = await save_pairwise_correlations(
+        db, attribute.id, {attribute_id: _range_value(larger) for attribute_id, larger in matches.items()}
+    )
+    return CorrelationResponse(
+        success=True,
+        found_correlations=len(events) > 0,
+        is_excluded_value=False,
+        is_over_correlating_value=False,
+        plugin_name=NAME,
+        events=events or None,
+    )
+
+
+def _overlap(first: Network, second: Network) -> bool:
+    return first.subnet_of(second) or second.subnet_of(first)  # type: ignore[arg-type]
+
+
+def _range_value(network: Network) -> str:
+    """
+    Returns the value a correlation with the range is stored under, single addresses without prefix length.
+    """
+    if network.num_addresses == 1:
+        return str(network.network_address)
+    return str(network)
+
+
+factory.register(sys.modules[__name__])
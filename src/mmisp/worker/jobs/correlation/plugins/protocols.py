@@ -0,0 +1,25 @@
+from typing import Any, Protocol, runtime_checkable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mmisp.db.models.attribute import Attribute
+from mmisp.plugins.protocols import CorrelationPlugin
+
+
+@runtime_checkable
+class BatchCorrelationPlugin(CorrelationPlugin, Protocol):
+    """
+    Correlation plugin that can additionally correlate many attributes with one call.
+    Jobs prefer run_many over run when a plugin provides it, so the plugin can share its queries across the batch.
+    """
+
+    async def run_many(
+        self: Any, db: AsyncSession, attributes: list[Attribute], correlation_threshold: int
+    ) -> list[Any]:
+        """
+        Batch entry point of the plugin. Correlates all given attributes.
+
+        :return: The results of the plugin in the same order as the attributes
+        :rtype list[Any]
+        """
+        ...
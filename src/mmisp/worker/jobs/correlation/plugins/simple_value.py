@@ -7,9 +7,12 @@ from mmisp.db.models.attribute import Attribute
 from mmisp.lib.logger import get_jobs_logger
 from mmisp.plugins import factory
 from mmisp.plugins.types import CorrelationPluginType, PluginType
+from mmisp.worker.jobs.correlation.exclusion_index import exclusion_index
 from mmisp.worker.jobs.correlation.job_data import CorrelationResponse
-from mmisp.worker.jobs.correlation.utility import save_correlations
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.jobs.correlation.utility import correlate_values, save_correlations
 from mmisp.worker.misp_database import misp_sql
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
 
 db_logger = get_jobs_logger(__name__)
 
@@ -30,7 +33,7 @@ async def run(db: AsyncSession, attribute: Attribute, correlation_threshold: int
     :rtype: CorrelationResponse
     """
     value = attribute.value
-    if await misp_sql.is_excluded_correlation(db, value):
+    if await exclusion_index.is_excluded(db, value):
         return CorrelationResponse(
             success=True,
             found_correlations=False,
@@ -39,8 +42,7 @@ async def run(db: AsyncSession, attribute: Attribute, correlation_threshold: int
             plugin_name=None,
             events=None,
         )
-    attributes: list[Attribute] = await misp_sql.get_attributes_with_same_value(db, value)
-    count: int = len(attributes)
+    count: int = await misp_sql.get_number_of_attributes_with_same_value(db, value)
     if count > correlation_threshold:
         await misp_sql.delete_correlations(db, value)
         await misp_sql.add_over_correlating_value(db, value, count)
@@ -53,6 +55,9 @@ async def run(db: AsyncSession, attribute: Attribute, correlation_threshold: int
             events=None,
         )
     elif count > 1:
+        attributes: list[MispCorrelationAttribute] = await misp_sql.get_correlation_attributes_with_same_value(
+            db, value
+        )
         uuid_events: set[UUID] = await save_correlations(db, attributes, value)
         return CorrelationResponse(
             success=True,
@@ -73,4 +78,34 @@ async def run(db: AsyncSession, attribute: Attribute, correlation_threshold: int
     )
 
 
+async def run_many(
+    db: AsyncSession, attributes: list[Attribute], correlation_threshold: int
+) -> list[CorrelationResponse]:
+    """
+    Static method to correlate many attributes at once. The distinct values of the attributes are correlated together
+    with a fixed number of queries, values whose occurrence counter in redis is over the threshold are not counted
+    in the database again.
+    :param attributes: the attributes to correlate
+    :type attributes: list[Attribute]
+    :param correlation_threshold: the maximum number of attributes of a value that are correlated
+    :type correlation_threshold: int
+    :return: relevant information about the correlation of every attribute in the same order
+    :rtype: list[CorrelationResponse]
+    """
+    values: set[str] = {attribute.value for attribute in attributes}
+    excluded: set[str] = {value for value in values if await exclusion_index.is_excluded(db, value)}
+    results: dict[str, CorrelationResponse] = await correlate_values(
+        db, values - excluded, correlation_threshold, queue.redis
+    )
+    excluded_response = CorrelationResponse(
+        success=True,
+        found_correlations=False,
+        is_excluded_value=True,
+        is_over_correlating_value=False,
+        plugin_name=None,
+        events=None,
+    )
+    return [excluded_response if attribute.value in excluded else results[attribute.value] for attribute in attributes]
+
+
 factory.register(sys.modules[__name__])
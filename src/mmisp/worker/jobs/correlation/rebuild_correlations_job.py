@@ -0,0 +1,144 @@
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from streaq import WrappedContext
+
+from mmisp.db.database import sessionmanager
+from mmisp.db.models.correlation import DefaultCorrelation
+from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.exclusion_index import ExclusionMatcher, exclusion_index
+from mmisp.worker.jobs.correlation.job_data import RebuildCorrelationsProgress, RebuildCorrelationsResponse
+from mmisp.worker.jobs.correlation.plugins.fuzzy_hash import get_fuzzy_hash_values
+from mmisp.worker.jobs.correlation.plugins.ip_range import is_range_value
+from mmisp.worker.jobs.correlation.utility import create_correlations
+from mmisp.worker.misp_database import misp_sql
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
+
+from .queue import queue
+
+db_logger = get_jobs_logger(__name__)
+
+REBUILD_PROGRESS_KEY: str = "mmisp:correlation:rebuild:progress"
+"""The redis key holding the progress of the running or last rebuild correlations job."""
+
+
+@queue.task()
+@add_ajob_db_log
+async def rebuild_correlations_job(ctx: WrappedContext[None], user: UserData) -> RebuildCorrelationsResponse:
+    """
+    Task to rebuild all exact value correlations in one pass. The correlatable attributes are streamed ordered by
+    value through a server-side cursor, so only one value group and one batch of pending correlations are held in
+    memory at a time. The correlations of CIDR ranges and fuzzy hashes are kept, they are maintained by their plugins.
+    The old correlations of a batch of values are replaced together with writing the new ones, and the correlations
+    of values that don't correlate anymore are deleted at the end, so a failing rebuild never leaves the values it
+    didn't reach without correlations. The progress is written to redis after every batch.
+    :param user: the user who requested the job
+    :type user: UserData
+    :return: if the job was successful, if the database was changed and the final progress
+    :rtype: RebuildCorrelationsResponse
+    """
+    correlation_threshold: int = await get_correlation_threshold(ctx.redis)
+    batch_size: int = correlation_config_data.rebuild_batch_size
+    progress = RebuildCorrelationsProgress()
+    await _save_progress(ctx.redis, progress)
+
+    assert sessionmanager is not None
+    async with sessionmanager.session() as session, sessionmanager.session() as stream_session:
+        fuzzy_hash_values: set[str] = await get_fuzzy_hash_values(session)
+        stale_value_ids: set[int] = {
+            value_id
+            async for value_id, value in misp_sql.stream_correlation_values(stream_session, batch_size)
+            if not is_range_value(value) and value not in fuzzy_hash_values
+        }
+        deleted: int = 0
+        matcher: ExclusionMatcher = await exclusion_index.refresh(session, ctx.redis)
+        over_correlating: set[str] = {value for value, _ in await misp_sql.get_over_correlating_values(session)}
+
+        pending: dict[str, list[MispCorrelationAttribute]] = {}
+        pending_correlations: int = 0
+        async for value, count, attributes in misp_sql.stream_correlation_attribute_groups(
+            stream_session, batch_size, correlation_threshold + 1
+        ):
+            progress.processed_attributes += count
+            progress.processed_values += 1
+            if count > correlation_threshold:
+                if not matcher.is_excluded(value):
+                    await misp_sql.add_over_correlating_value(session, value, count)
+                    progress.over_correlating_values += 1
+                continue
+            if value in over_correlating:
+                await misp_sql.delete_over_correlating_value(session, value)
+            if count < 2 or len({attribute.event_id for attribute in attributes}) < 2 or matcher.is_excluded(value):
+                continue
+
+            pending[value] = attributes
+            pending_correlations += count * (count - 1) // 2
+            if pending_correlations >= batch_size:
+                deleted += await _write_correlations(session, pending, stale_value_ids, progress)
+                await _save_progress(ctx.redis, progress)
+                pending, pending_correlations = {}, 0
+
+        deleted += await _write_correlations(session, pending, stale_value_ids, progress)
+        deleted += await misp_sql.delete_correlations_of_values(session, list(stale_value_ids), batch_size)
+        progress.finished = True
+        await _save_progress(ctx.redis, progress)
+
+    db_logger.info(
+        f"Rebuilt correlations: {progress.added_correlations} correlations of {progress.correlated_values} values, "
+        f"{progress.over_correlating_values} over correlating values"
+    )
+    changed: bool = deleted > 0 or progress.added_correlations > 0 or progress.over_correlating_values > 0
+    return RebuildCorrelationsResponse(success=True, database_changed=changed, progress=progress)
+
+
+async def get_rebuild_progress(redis: Redis) -> RebuildCorrelationsProgress | None:
+    """
+    Returns the progress of the running or last rebuild correlations job.
+    :param redis: the redis connection holding the progress
+    :type redis: Redis
+    :return: the progress or None if no rebuild was started
+    :rtype: RebuildCorrelationsProgress | None
+    """
+    raw: bytes | None = await redis.get(REBUILD_PROGRESS_KEY)
+    if raw is None:
+        return None
+    return RebuildCorrelationsProgress.model_validate_json(raw)
+
+
+async def _save_progress(redis: Redis, progress: RebuildCorrelationsProgress) -> None:
+    await redis.set(REBUILD_PROGRESS_KEY, progress.model_dump_json())
+
+
+async def _write_correlations(
+    session: AsyncSession,
+    pending: dict[str, list[MispCorrelationAttribute]],
+    stale_value_ids: set[int],
+    progress: RebuildCorrelationsProgress,
+) -> int:
+    """
+    Writes the correlations of a batch of values, with one insert of the values and one of the correlations. Values
+    sharing one entry in the correlation_values table are correlated together. The old correlations of the values
+    that weren't written by this rebuild yet are replaced in the same transaction, those values are no longer stale.
+    :return: the number of replaced correlations
+    :rtype: int
+    """
+    if not pending:
+        return 0
+    value_ids: dict[str, int] = await misp_sql.add_correlation_values(session, pending.keys())
+    groups: dict[int, dict[int, MispCorrelationAttribute]] = {}
+    for value, attributes in pending.items():
+        group: dict[int, MispCorrelationAttribute] = groups.setdefault(value_ids[value], {})
+        for attribute in attributes:
+            group[attribute.id] = attribute
+    correlations: list[DefaultCorrelation] = []
+    for value_id, group in groups.items():
+        correlations.extend(create_correlations(list(group.values()), value_id))
+    replaced_value_ids: set[int] = stale_value_ids & groups.keys()
+    deleted: int = await misp_sql.replace_correlations(session, replaced_value_ids, correlations)
+    stale_value_ids -= replaced_value_ids
+    progress.correlated_values += len(groups)
+    progress.added_correlations += len(correlations)
+    db_logger.debug(f"Rebuild correlations progress: {progress.model_dump_json()}")
+    return deleted
@@ -0,0 +1,31 @@
+from streaq import WrappedContext
+
+from mmisp.db.database import sessionmanager
+from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.job_data import DatabaseChangedResponse
+from mmisp.worker.jobs.correlation.occurrence_counters import reconcile_over_correlating_values
+
+from .queue import queue
+
+db_logger = get_jobs_logger(__name__)
+
+
+@queue.task()
+@add_ajob_db_log
+async def reconcile_over_correlating_job(ctx: WrappedContext[None], user: UserData) -> DatabaseChangedResponse:
+    """
+    Task to write the values whose occurrence counter went over the threshold since the last run to the over
+    correlating values table, in batches. Only these values are counted in the database again.
+    :param user: the user who requested the job
+    :type user: UserData
+    :return: if the job was successful and if the database was changed
+    :rtype: DatabaseChangedResponse
+    """
+    correlation_threshold: int = await get_correlation_threshold(ctx.redis)
+
+    assert sessionmanager is not None
+    async with sessionmanager.session() as session:
+        updated: int = await reconcile_over_correlating_values(session, ctx.redis, correlation_threshold)
+        return DatabaseChangedResponse(success=True, database_changed=updated > 0)
@@ -1,111 +1,221 @@
+from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from streaq import WrappedContext
+from streaq.task import Task, TaskResult
 
 from mmisp.db.database import sessionmanager
 from mmisp.db.models.attribute import Attribute
 from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
 from mmisp.worker.api.requests_schemas import UserData
-from mmisp.worker.jobs.correlation.correlation_job import correlation_job
-from mmisp.worker.jobs.correlation.job_data import CorrelationJobData, DatabaseChangedResponse
-from mmisp.worker.jobs.correlation.utility import get_amount_of_possible_correlations
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.correlation_job import correlate_attributes
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.job_data import DatabaseChangedResponse, RegenerateOccurrencesShardData
+from mmisp.worker.jobs.correlation.occurrence_counters import reconcile_over_correlating_values, set_occurrences
+from mmisp.worker.jobs.correlation.plugins import simple_value
+from mmisp.worker.jobs.correlation.plugins.fuzzy_hash import get_fuzzy_hash_values
+from mmisp.worker.jobs.correlation.plugins.ip_range import is_range_value
 from mmisp.worker.misp_database.misp_sql import (
     add_over_correlating_value,
     delete_correlations,
     delete_over_correlating_value,
-    get_attributes_with_same_value,
-    get_number_of_correlations,
-    get_over_correlating_values,
-    get_values_with_correlation,
+    get_correlation_value_statistics,
+    get_number_of_correlations_per_value,
+    get_over_correlating_value_statistics,
 )
 
 from .queue import queue
 
 db_logger = get_jobs_logger(__name__)
 
+SHARD_CLAIM_KEY: str = "mmisp:correlation:regeneration_shard"
+"""The prefix of the redis keys marking the shards of a regeneration that were started."""
+
+SHARD_CLAIM_TTL: int = 24 * 60 * 60
+"""The time in seconds the claim of a shard is kept."""
+
 
 @queue.task()
 @add_ajob_db_log
 async def regenerate_occurrences_job(ctx: WrappedContext[None], user: UserData) -> DatabaseChangedResponse:
     """
     Method to regenerate the occurrences of the correlations in the database.
-    Over correlating values and values with correlations are checked.
+    Over correlating values and values with correlations are checked, after the values marked by the occurrence
+    counters are reconciled.
+    If more than one shard is configured, the values are split into shards which are regenerated by sub-jobs on the
+    correlation queue, so the work is spread over all correlation workers. Each shard is claimed by whoever starts
+    it first, this job runs all shards no sub-job has started and only waits for the shards already running.
+    :param user: the user who requested the job
+    :type user: UserData
+    :return: if the job was successful and if the database was changed
+    :rtype: DatabaseChangedResponse
+    """
+    correlation_threshold: int = await get_correlation_threshold(ctx.redis)
+    assert sessionmanager is not None
+    async with sessionmanager.session() as session:
+        await reconcile_over_correlating_values(session, ctx.redis, correlation_threshold)
+
+    shard_count: int = correlation_config_data.regeneration_shards
+    if shard_count <= 1:
+        data = RegenerateOccurrencesShardData(shard=0, shard_count=1, correlation_threshold=correlation_threshold)
+        return await regenerate_occurrences_shard_job.run(user, data)
+
+    tasks: list[Task[DatabaseChangedResponse]] = []
+    for shard in range(shard_count):
+        data = RegenerateOccurrencesShardData(
+            shard=shard, shard_count=shard_count, correlation_threshold=correlation_threshold, run_id=ctx.task_id
+        )
+        tasks.append(await regenerate_occurrences_shard_job.enqueue(user, data))
+
+    # The shards no other worker has started yet are run here, so this job never waits for a shard that is still
+    # queued behind it, even if every worker slot is taken.
+    results: list[DatabaseChangedResponse | None] = []
+    for shard in reversed(range(shard_count)):
+        if await __claim_shard(ctx.redis, ctx.task_id, shard):
+            data = RegenerateOccurrencesShardData(
+                shard=shard, shard_count=shard_count, correlation_threshold=correlation_threshold
+            )
+            results.append(await __regenerate_shard(ctx.redis, data))
+            continue
+        task_result: TaskResult[DatabaseChangedResponse] = await tasks[shard].result()
+        if not task_result.success or not isinstance(task_result.result, DatabaseChangedResponse):
+            db_logger.error(f"Regeneration of a shard failed: {task_result.result}")
+            results.append(None)
+        else:
+            results.append(task_result.result)
+
+    success: bool = True
+    changed: bool = False
+    for result in results:
+        if result is None:
+            success = False
+            continue
+        success = success and result.success
+        changed = changed or result.database_changed
+    return DatabaseChangedResponse(success=success, database_changed=changed)
+
+
+@queue.task()
+@add_ajob_db_log
+async def regenerate_occurrences_shard_job(
+    ctx: WrappedContext[None], user: UserData, data: RegenerateOccurrencesShardData
+) -> DatabaseChangedResponse:
+    """
+    Method to regenerate the occurrences of the correlations of the values in one shard.
     :param user: the user who requested the job
     :type user: UserData
+    :param data: the shard to regenerate and the correlation threshold
+    :type data: RegenerateOccurrencesShardData
+    :return: if the job was successful and if the database was changed
+    :rtype: DatabaseChangedResponse
+    """
+    if data.run_id and not await __claim_shard(ctx.redis, data.run_id, data.shard):
+        # the regeneration job or another sub-job already regenerated the shard
+        return DatabaseChangedResponse(success=True, database_changed=False)
+    return await __regenerate_shard(ctx.redis, data)
+
+
+async def __claim_shard(redis: Redis, run_id: str, shard: int) -> bool:
+    """
+    Claims a shard of a regeneration, a shard can only be claimed once.
+    :return: if the shard was claimed by the caller
+    :rtype: bool
+    """
+    return bool(await redis.set(f"{SHARD_CLAIM_KEY}:{run_id}:{shard}", 1, nx=True, ex=SHARD_CLAIM_TTL))
+
+
+async def __regenerate_shard(redis: Redis, data: RegenerateOccurrencesShardData) -> DatabaseChangedResponse:
+    """
+    Regenerates the occurrences of the values in one shard.
     :return: if the job was successful and if the database was changed
     :rtype: DatabaseChangedResponse
     """
     assert sessionmanager is not None
-    # TODO: get correlation_threshold from redis, or db, anything that can be changed
-    correlation_threshold = 30
     async with sessionmanager.session() as session:
-        first_changed: bool = await __regenerate_over_correlating(session, correlation_threshold)
-        second_changed: bool = await __regenerate_correlation_values(session, correlation_threshold)
+        first_changed: bool = await __regenerate_over_correlating(session, redis, data)
+        second_changed: bool = await __regenerate_correlation_values(session, data)
         changed: bool = first_changed or second_changed
         return DatabaseChangedResponse(success=True, database_changed=changed)
 
 
-async def __regenerate_correlation_values(session: AsyncSession, correlation_threshold: int) -> bool:
+async def __regenerate_correlation_values(session: AsyncSession, data: RegenerateOccurrencesShardData) -> bool:
     """
     Method to regenerate the amount of correlations for the values with correlations.
+    The numbers of attributes, possible correlations and existing correlations of all values are computed with a
+    few aggregate queries, only values whose numbers disagree are changed. Values whose correlations are missing are
+    correlated again together in one batch.
     :return: if the database was changed
     :rtype: bool
     """
     changed: bool = False
-    correlation_values: list[str] = await get_values_with_correlation(session)
-    for value in correlation_values:
-        query = select(Attribute.id).filter(Attribute.value == value).limit(1)  # type: ignore
-        attribute_id = (await session.execute(query)).scalars().first()
-        if attribute_id is None:
+    correlation_threshold: int = data.correlation_threshold
+    attribute_ids: list[int] = []
+    fuzzy_hash_values: set[str] = await get_fuzzy_hash_values(session)
+    statistics: list[tuple[str, int, int, int | None]] = await get_correlation_value_statistics(
+        session, data.shard, data.shard_count
+    )
+    correlation_counts: dict[str, int] = await get_number_of_correlations_per_value(
+        session, data.shard, data.shard_count
+    )
+    for value, count_attributes, count_possible_correlations, attribute_id in statistics:
+        if is_range_value(value) or value in fuzzy_hash_values:
+            # the correlations of CIDR ranges and fuzzy hashes are maintained by their plugins, not by exact value
             continue
-
-        count_correlations: int = await get_number_of_correlations(session, value, False)
-        current_attributes: list[Attribute] = await get_attributes_with_same_value(session, value)
-        count_possible_correlations: int = get_amount_of_possible_correlations(current_attributes)
-        count_attributes: int = len(current_attributes)
+        count_correlations: int = correlation_counts.get(value, 0)
         if count_attributes > correlation_threshold:
             await delete_correlations(session, value)
             await add_over_correlating_value(session, value, count_attributes)
             changed = True
-        elif count_possible_correlations != count_correlations:
+        elif count_possible_correlations == 0 or attribute_id is None:
             await delete_correlations(session, value)
-            job_data = CorrelationJobData(attribute_id=attribute_id)
-            user_data = UserData(user_id=0)
-            await correlation_job.run(user_data, job_data)
             changed = True
-        elif count_possible_correlations == count_correlations == 0:
+        elif count_possible_correlations != count_correlations:
             await delete_correlations(session, value)
+            attribute_ids.append(attribute_id)
             changed = True
+    await __correlate_attributes(session, attribute_ids, correlation_threshold)
     return changed
 
 
-async def __regenerate_over_correlating(session: AsyncSession, correlation_threshold: int) -> bool:
+async def __regenerate_over_correlating(
+    session: AsyncSession, redis: Redis, data: RegenerateOccurrencesShardData
+) -> bool:
     """
     Method to regenerate the amount of correlations for the over correlating values.
+    The current number of attributes of all over correlating values is computed with one aggregate query and the
+    occurrence counters of the values are reset to it.
     :return: if the database was changed
     :rtype: bool
     """
     changed: bool = False
-    over_correlating_values: list[tuple[str, int]] = await get_over_correlating_values(session)
-    for entry in over_correlating_values:
-        value: str = entry[0]
-        count: int = entry[1]
-
-        query = select(Attribute.id).filter(Attribute.value == value).limit(1)  # type: ignore
-        attribute_id = (await session.execute(query)).scalars().first()
+    correlation_threshold: int = data.correlation_threshold
+    attribute_ids: list[int] = []
+    statistics: list[tuple[str, int, int, int | None]] = await get_over_correlating_value_statistics(
+        session, data.shard, data.shard_count
+    )
+    await set_occurrences(redis, {value: count_attributes for value, _, count_attributes, _ in statistics})
+    for value, count, count_attributes, attribute_id in statistics:
         if attribute_id is None:
             continue
 
-        current_attributes: list[Attribute] = await get_attributes_with_same_value(session, value)
-        count_attributes: int = len(current_attributes)
-
         if count_attributes != count and count_attributes > correlation_threshold:
             await add_over_correlating_value(session, value, count_attributes)
             changed = True
         elif count_attributes <= correlation_threshold:
             await delete_over_correlating_value(session, value)
-            job_data = CorrelationJobData(attribute_id=attribute_id)
-            user_data = UserData(user_id=0)
-            await correlation_job.run(user_data, job_data)
+            attribute_ids.append(attribute_id)
             changed = True
+    await __correlate_attributes(session, attribute_ids, correlation_threshold)
     return changed
+
+
+async def __correlate_attributes(session: AsyncSession, attribute_ids: list[int], correlation_threshold: int) -> None:
+    """
+    Correlates the attributes with the given ids again with one call of the exact value correlation plugin.
+    """
+    if not attribute_ids:
+        return
+    statement = select(Attribute).where(Attribute.id.in_(attribute_ids))
+    attributes: list[Attribute] = list((await session.execute(statement)).scalars().all())
+    await correlate_attributes(session, simple_value.NAME, attributes, correlation_threshold)
@@ -3,34 +3,49 @@ from streaq import WrappedContext
 from mmisp.db.database import sessionmanager
 from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
 from mmisp.worker.api.requests_schemas import UserData
-from mmisp.worker.jobs.correlation.job_data import TopCorrelationsResponse
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.job_data import TopCorrelationsData, TopCorrelationsResponse
 from mmisp.worker.misp_database import misp_sql
 
 from .queue import queue
 
 db_logger = get_jobs_logger(__name__)
 
+TOP_CORRELATIONS_CACHE_KEY: str = "mmisp:correlation:top_correlations"
+"""The prefix of the redis keys the snapshots of the top correlations are cached under."""
+
 
 @queue.task()
 @add_ajob_db_log
-async def top_correlations_job(ctx: WrappedContext[None], user: UserData) -> TopCorrelationsResponse:
+async def top_correlations_job(
+    ctx: WrappedContext[None], user: UserData, data: TopCorrelationsData | None = None
+) -> TopCorrelationsResponse:
     """
     Method to get a list of all correlations with their occurrence in the database.
-    The list is sorted decreasing by the occurrence.
+    The list is sorted decreasing by the occurrence and can be paginated with limit and offset.
+    The result is cached in redis for the configured time, so repeated requests don't query the database.
     :param user: the user who requested the job
     :type user: UserData
+    :param data: the optional limit and offset of the list
+    :type data: TopCorrelationsData
     :return: TopCorrelationsResponse with the list and if the job was successful
     :rtype: TopCorrelationsResponse
     """
+    if data is None:
+        data = TopCorrelationsData()
+    cache_ttl: int = correlation_config_data.top_correlations_cache_ttl
+    cache_key: str = f"{TOP_CORRELATIONS_CACHE_KEY}:{data.limit}:{data.offset}"
+
+    if cache_ttl > 0:
+        cached: bytes | None = await ctx.redis.get(cache_key)
+        if cached is not None:
+            return TopCorrelationsResponse.model_validate_json(cached)
+
     assert sessionmanager is not None
     async with sessionmanager.session() as session:
-        values: list[str] = await misp_sql.get_values_with_correlation(session)
-        top_correlations: list[tuple[str, int]] = list()
-        for value in values:
-            count: int = await misp_sql.get_number_of_correlations(session, value, False)
-            top_correlations.append((value, count))
-
-        top_correlations = list(filter(lambda num: num[1] != 0, top_correlations))  # remove all 0s from the list
-        top_correlations.sort(key=lambda a: a[1], reverse=True)  # sort by the second element of the tuple
+        top_correlations: list[tuple[str, int]] = await misp_sql.get_top_correlations(session, data.limit, data.offset)
 
-        return TopCorrelationsResponse(success=True, top_correlations=top_correlations)
+    response = TopCorrelationsResponse(success=True, top_correlations=top_correlations)
+    if cache_ttl > 0:
+        await ctx.redis.set(cache_key, response.model_dump_json(), ex=cache_ttl)
+    return response
@@ -0,0 +1,84 @@
+from sqlalchemy import select
+from streaq import WrappedContext
+
+from mmisp.db.database import sessionmanager
+from mmisp.db.models.attribute import Attribute
+from mmisp.lib.logger import add_ajob_db_log, get_jobs_logger
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.exclusion_index import ExclusionMatcher, exclusion_index
+from mmisp.worker.jobs.correlation.job_data import AttributeChangeData, CorrelationResponse, DatabaseChangedResponse
+from mmisp.worker.jobs.correlation.occurrence_counters import invalidate_occurrences
+from mmisp.worker.jobs.correlation.utility import correlate_values
+from mmisp.worker.misp_database import misp_sql
+
+from .queue import queue
+
+db_logger = get_jobs_logger(__name__)
+
+
+@queue.task()
+@add_ajob_db_log
+async def update_attribute_correlations_job(
+    ctx: WrappedContext[None], user: UserData, data: AttributeChangeData
+) -> DatabaseChangedResponse:
+    """
+    Method to update the correlations of a single attribute after its value changed, it was deleted or its
+    correlation was disabled or enabled.
+    Only the correlations of the attribute and the over correlating entries and occurrence counters of its old and
+    new value are touched, correlation values without correlations left are removed. The counters of the old and the
+    current value are removed and counted in the database again on their next use, unlike a decrement this stays
+    exact when the job is retried or run twice for the same change.
+    Concurrent jobs writing correlations of the same values are serialised by the row locks of add_correlations.
+    :param user: the user who requested the job
+    :type user: UserData
+    :param data: the attribute and its value before the change
+    :type data: AttributeChangeData
+    :return: if the job was successful and if the database was changed
+    :rtype: DatabaseChangedResponse
+    """
+    correlation_threshold: int = await get_correlation_threshold(ctx.redis)
+
+    assert sessionmanager is not None
+    async with sessionmanager.session() as session:
+        value_ids: set[int] = await misp_sql.delete_attribute_correlations(session, data.attribute_id)
+        changed: bool = len(value_ids) > 0
+
+        statement = select(Attribute).where(Attribute.id == data.attribute_id)
+        attribute: Attribute | None = (await session.execute(statement)).scalars().one_or_none()
+        old_value: str | None = data.old_value
+        current_value: str | None = None
+        if attribute is not None:
+            if old_value is None:
+                old_value = attribute.value
+            if not attribute.deleted and not attribute.disable_correlation:
+                current_value = attribute.value
+
+        affected_values: set[str] = {value for value in (old_value, current_value) if value is not None}
+        await invalidate_occurrences(ctx.redis, affected_values)
+
+        exclusions: ExclusionMatcher = await exclusion_index.refresh(session, ctx.redis)
+        to_correlate: set[str] = set()
+        if current_value is not None and not exclusions.is_excluded(current_value):
+            to_correlate.add(current_value)
+
+        for value in affected_values:
+            if not await misp_sql.is_over_correlating_value(session, value):
+                continue
+            count: int = await misp_sql.get_number_of_attributes_with_same_value(session, value)
+            if count <= correlation_threshold:
+                await misp_sql.delete_over_correlating_value(session, value)
+                if not exclusions.is_excluded(value):
+                    to_correlate.add(value)
+            elif value not in to_correlate:
+                await misp_sql.add_over_correlating_value(session, value, count)
+            changed = True
+
+        results: dict[str, CorrelationResponse] = await correlate_values(
+            session, to_correlate, correlation_threshold, ctx.redis
+        )
+        changed = changed or any(result.found_correlations for result in results.values())
+
+        if await misp_sql.delete_unused_correlation_values(session, value_ids) > 0:
+            changed = True
+        return DatabaseChangedResponse(success=True, database_changed=changed)
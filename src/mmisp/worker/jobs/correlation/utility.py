@@ -1,24 +1,26 @@
 from itertools import combinations
+from operator import attrgetter
+from typing import Collection
 from uuid import UUID
 
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mmisp.api_schemas.events import AddEditGetEventDetails
-from mmisp.api_schemas.objects import ObjectWithAttributesResponse
 from mmisp.db.models.attribute import Attribute
 from mmisp.db.models.correlation import DefaultCorrelation
-from mmisp.db.models.event import Event
-from mmisp.db.models.object import Object
+from mmisp.worker.jobs.correlation.job_data import CorrelationResponse
+from mmisp.worker.jobs.correlation.occurrence_counters import get_occurrences, mark_dirty, set_occurrences
 from mmisp.worker.misp_database import misp_sql
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
 
 
-async def save_correlations(db: AsyncSession, attributes: list[Attribute], value: str) -> set[UUID]:
+async def save_correlations(db: AsyncSession, attributes: list[MispCorrelationAttribute], value: str) -> set[UUID]:
     """
-    Method to generate DefaultCorrelation objects from the given list of MispEventAttribute and save them in the
-    database. All MispEventAttribute in the list have to be attributes which have the same value and are correlated
-    with each other.
+    Method to generate DefaultCorrelation objects from the given list of MispCorrelationAttribute and save them in the
+    database. All MispCorrelationAttribute in the list have to be attributes which have the same value and are
+    correlated with each other.
     :param attributes: the attributes to correlate with each other
-    :type attributes: list[Attribute]
+    :type attributes: list[MispCorrelationAttribute]
     :param value: on which the correlations are based
     :type value: str
     :return: a set of UUIDs representing the events the correlation are associated with
@@ -26,40 +28,123 @@ async def save_correlations(db: AsyncSession, attributes: list[Attribute], value
     """
 
     value_id: int = await misp_sql.add_correlation_value(db, value)
-    events: list[Event] = list()
-    objects: list[Object] = list()
+    correlations = create_correlations(attributes, value_id)
+    await misp_sql.add_correlations(db, correlations)
+    return {UUID(attribute.event_uuid) for attribute in attributes}
+
 
-    for attribute in attributes:
-        events.append(attribute.event)
-        objects.append(attribute.mispobject)
-    correlations = create_correlations(attributes, events, objects, value_id)
+async def save_pairwise_correlations(db: AsyncSession, attribute_id: int, matches: dict[int, str]) -> set[UUID]:
+    """
+    Method to save the correlations of one attribute with attributes it matches by similarity instead of by value.
+    Each correlation is stored under its own value, attributes of the same event are not correlated.
+    :param attribute_id: the id of the attribute
+    :type attribute_id: int
+    :param matches: the ids of the matching attributes and the value the correlation with each is stored under
+    :type matches: dict[int, str]
+    :return: the UUIDs of the events with correlations, empty if no correlation was saved
+    :rtype: set[UUID]
+    """
+    rows: dict[int, MispCorrelationAttribute] = {
+        row.id: row for row in await misp_sql.get_correlation_attributes(db, [attribute_id, *matches])
+    }
+    own: MispCorrelationAttribute | None = rows.get(attribute_id)
+    if own is None:
+        return set()
+    pairs: dict[int, MispCorrelationAttribute] = {
+        other_id: other
+        for other_id, other in rows.items()
+        if other_id in matches and other_id != attribute_id and other.event_id != own.event_id
+    }
+    if not pairs:
+        return set()
+
+    value_ids: dict[str, int] = await misp_sql.add_correlation_values(db, {matches[other_id] for other_id in pairs})
+    correlations: list[DefaultCorrelation] = []
+    for other_id, other in pairs.items():
+        correlations.extend(create_correlations([own, other], value_ids[matches[other_id]]))
     await misp_sql.add_correlations(db, correlations)
-    result: list[UUID] = list()
-    for event in events:
-        result.append(UUID(event.uuid))
-    return set(result)
+    return {UUID(own.event_uuid)} | {UUID(other.event_uuid) for other in pairs.values()}
 
 
-def create_correlations(
-    attributes: list[Attribute],
-    events: list[Event],
-    objects: list[Object],
-    value_id: int,
-) -> list[DefaultCorrelation]:
+async def correlate_values(
+    db: AsyncSession, values: Collection[str], correlation_threshold: int, redis: Redis | None = None
+) -> dict[str, CorrelationResponse]:
+    """
+    Method to correlate many values by their exact value with a fixed number of queries.
+    The attributes of all values are counted together, values with more attributes than the threshold are marked as
+    over correlating and the attributes of the other values are loaded and correlated together. Exclusions have to be
+    filtered out before.
+    If redis is given, values whose occurrence counter is already over the threshold are not counted in the database
+    again but marked for reconciliation, the counters of the other values are set to the counted numbers.
+    :param values: the values to correlate
+    :type values: Collection[str]
+    :param correlation_threshold: the maximum number of attributes of a value that are correlated
+    :type correlation_threshold: int
+    :param redis: the redis connection holding the occurrence counters
+    :type redis: Redis | None
+    :return: the result of the correlation of every value
+    :rtype: dict[str, CorrelationResponse]
+    """
+    known_over_correlating: set[str] = set()
+    if redis is not None:
+        occurrences: dict[str, int] = await get_occurrences(redis, values)
+        known_over_correlating = {value for value, count in occurrences.items() if count > correlation_threshold}
+        await mark_dirty(redis, known_over_correlating)
+
+    counted_values: list[str] = [value for value in values if value not in known_over_correlating]
+    counts: dict[str, int] = await misp_sql.get_number_of_attributes_by_value(db, counted_values)
+    if redis is not None:
+        await set_occurrences(redis, {value: counts.get(value, 0) for value in counted_values})
+
+    over_correlating: set[str] = {value for value, count in counts.items() if count > correlation_threshold}
+    for value in over_correlating:
+        await misp_sql.delete_correlations(db, value)
+        await misp_sql.add_over_correlating_value(db, value, counts[value])
+    over_correlating |= known_over_correlating
+
+    attributes_by_value: dict[str, list[MispCorrelationAttribute]] = await misp_sql.get_correlation_attributes_by_value(
+        db, {value for value, count in counts.items() if 1 < count <= correlation_threshold}
+    )
+    correlating: dict[str, list[MispCorrelationAttribute]] = {
+        value: attributes
+        for value, attributes in attributes_by_value.items()
+        if len({attribute.event_id for attribute in attributes}) > 1
+    }
+    value_ids: dict[str, int] = await misp_sql.add_correlation_values(db, correlating.keys())
+    correlations: list[DefaultCorrelation] = []
+    for value, attributes in correlating.items():
+        correlations.extend(create_correlations(attributes, value_ids[value]))
+    await misp_sql.add_correlations(db, correlations)
+
+    result: dict[str, CorrelationResponse] = {}
+    for value in values:
+        events: set[UUID] | None = None
+        if value in correlating:
+            events = {UUID(attribute.event_uuid) for attribute in correlating[value]}
+        result[value] = CorrelationResponse(
+            success=True,
+            found_correlations=value in correlating or value in over_correlating,
+            is_excluded_value=False,
+            is_over_correlating_value=value in over_correlating,
+            events=events,
+        )
+    return result
+
+
+def create_correlations(attributes: list[MispCorrelationAttribute], value_id: int) -> list[DefaultCorrelation]:
     """
-    Method to create DefaultCorrelation objects based on the given list of MispEventAttribute und list of
-    AddEditGetEventDetails. For every attribute a correlation is created with any other attribute in the list
-    (except itself). The MispEventAttribute at place i in the list has to be an attribute of the AddEditGetEventDetails
-    at place i in the list of AddEditGetEventDetails to function properly.
+    Method to create DefaultCorrelation objects based on the given list of MispCorrelationAttribute.
+    For every attribute a correlation is created with any other attribute in the list
+    (except itself and the attributes of the same event).
+    The pairs are canonical, the attribute with the smaller id is always the first attribute of the correlation.
 
-    :param attributes: list of MispEventAttribute to create correlations from
-    :param events: list of the MispEvents the MispEventAttribute occurs in
+    :param attributes: list of MispCorrelationAttribute to create correlations from
     :param value_id: the id of the value for the correlation
     :return: a list of DefaultCorrelation
     """
     correlations = [
-        _create_correlation_from_attributes(a1, e1, o1, a2, e2, o2, value_id)
-        for ((a1, e1, o1), (a2, e2, o2)) in combinations(zip(attributes, events, objects), 2)
+        _create_correlation_from_attributes(a1, a2, value_id)
+        for (a1, a2) in combinations(sorted(attributes, key=attrgetter("id")), 2)
         if a1.event_id != a2.event_id
     ]
 
@@ -67,30 +152,18 @@ def create_correlations(
 
 
 def _create_correlation_from_attributes(
-    attribute_1: Attribute,
-    event_1: AddEditGetEventDetails,
-    object_1: ObjectWithAttributesResponse,
-    attribute_2: Attribute,
-    event_2: AddEditGetEventDetails,
-    object_2: ObjectWithAttributesResponse,
+    attribute_1: MispCorrelationAttribute,
+    attribute_2: MispCorrelationAttribute,
     value_id: int,
 ) -> DefaultCorrelation:
     """
-    Method to construct a DefaultCorrelation object based on two attributes and the events they occur in.
+    Method to construct a DefaultCorrelation object based on two attributes.
     The value of the correlation is specified by the value id.
 
     :param attribute_1: first attribute of the correlation
-    :type attribute_1: Attribute
-    :param event_1: event of the first attribute
-    :type event_1: AddEditGetEventDetails
-    :param object_1: object of the first attribute
-    :type object_1: MispObject
+    :type attribute_1: MispCorrelationAttribute
     :param attribute_2: second attribute of the correlation
-    :type attribute_2: Attribute
-    :param event_2: event of the second attribute
-    :type event_2: AddEditGetEventDetails
-    :param object_2: object of the second attribute
-    :type object_2: MispObject
+    :type attribute_2: MispCorrelationAttribute
     :param value_id: value of the correlation
     :type value_id: int
     :return: a DefaultCorrelation object based on the input
@@ -100,23 +173,23 @@ def _create_correlation_from_attributes(
         attribute_id=attribute_1.id,
         object_id=attribute_1.object_id,
         event_id=attribute_1.event_id,
-        org_id=event_1.org_id,
+        org_id=attribute_1.event_org_id,
         distribution=attribute_1.distribution,
-        object_distribution=object_1.distribution if object_1 is not None else 0,
-        event_distribution=event_1.distribution,
-        sharing_group_id=attribute_1.sharing_group_id or 0,
-        object_sharing_group_id=object_1.sharing_group_id if object_1 is not None else 0,
-        event_sharing_group_id=event_1.sharing_group_id or 0,
+        object_distribution=attribute_1.object_distribution,
+        event_distribution=attribute_1.event_distribution,
+        sharing_group_id=attribute_1.sharing_group_id,
+        object_sharing_group_id=attribute_1.object_sharing_group_id,
+        event_sharing_group_id=attribute_1.event_sharing_group_id,
         attribute_id_1=attribute_2.id,
         object_id_1=attribute_2.object_id,
         event_id_1=attribute_2.event_id,
-        org_id_1=event_2.org_id,
+        org_id_1=attribute_2.event_org_id,
         distribution_1=attribute_2.distribution,
-        object_distribution_1=object_2.distribution if object_2 is not None else 0,
-        event_distribution_1=event_2.distribution,
-        sharing_group_id_1=attribute_2.sharing_group_id or 0,
-        object_sharing_group_id_1=object_2.sharing_group_id if object_2 is not None else 0,
-        event_sharing_group_id_1=event_2.sharing_group_id or 0,
+        object_distribution_1=attribute_2.object_distribution,
+        event_distribution_1=attribute_2.event_distribution,
+        sharing_group_id_1=attribute_2.sharing_group_id,
+        object_sharing_group_id_1=attribute_2.object_sharing_group_id,
+        event_sharing_group_id_1=attribute_2.event_sharing_group_id,
         value_id=value_id,
     )
 
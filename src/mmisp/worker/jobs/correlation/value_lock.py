@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import logging
+import math
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator
+
+from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError, LockNotOwnedError
+
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+
+PENDING_KEY: str = "mmisp:correlation:pending"
+"""The prefix of the redis keys marking values with a correlation job of a plugin waiting to run."""
+
+LOCK_KEY: str = "mmisp:correlation:lock"
+"""The prefix of the redis keys of the locks held while a value is correlated by a plugin."""
+
+_log = logging.getLogger(__name__)
+
+
+def value_digest(value: str) -> str:
+    """
+    Returns a fixed length digest of a value, used in redis keys instead of the value.
+    :param value: the value
+    :type value: str
+    :return: the hex digest of the value
+    :rtype: str
+    """
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+def _value_key(prefix: str, plugin_name: str, value: str) -> str:
+    return f"{prefix}:{plugin_name}:{value_digest(value)}"
+
+
+async def claim_value(redis: Redis, plugin_name: str, value: str) -> bool:
+    """
+    Marks that a correlation job of the plugin for the value is waiting to run.
+    Fails if another job of the plugin already waits for the value, in that case the other job will see all
+    attributes of the value that are saved by now, so the calling job can be coalesced into it. Only jobs of plugins
+    correlating all attributes of a value at once can be coalesced.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param plugin_name: the name of the correlation plugin
+    :type plugin_name: str
+    :param value: the value to correlate
+    :type value: str
+    :return: True if the caller has to correlate the value, False if another job will do it
+    :rtype: bool
+    """
+    timeout: int = math.ceil(correlation_config_data.coalesce_window) + correlation_config_data.value_lock_timeout
+    return bool(await redis.set(_value_key(PENDING_KEY, plugin_name, value), 1, nx=True, ex=timeout))
+
+
+async def release_claim(redis: Redis, plugin_name: str, value: str) -> None:
+    """
+    Removes the mark of a waiting correlation job of the plugin for the value, jobs of the plugin for the value
+    started afterwards correlate it again.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param plugin_name: the name of the correlation plugin
+    :type plugin_name: str
+    :param value: the value
+    :type value: str
+    """
+    await redis.delete(_value_key(PENDING_KEY, plugin_name, value))
+
+
+async def _keep_lock(lock: Lock, timeout: int) -> None:
+    while True:
+        await asyncio.sleep(timeout / 3)
+        try:
+            await lock.reacquire()
+        except LockError:
+            _log.warning("lock %s expired before it could be extended, the value is no longer locked", lock.name)
+            return
+
+
+@asynccontextmanager
+async def value_lock(redis: Redis, plugin_name: str, value: str) -> AsyncIterator[None]:
+    """
+    Holds the lock of a value for a plugin, so only one worker correlates the value with the plugin at a time.
+    The lock expires after the configured timeout if the worker holding it dies, while the worker is alive it is
+    extended to the full timeout every third of it. If it expires anyway, e.g. because the worker was blocked for
+    longer than the timeout, another worker can take it, so from then on the job is no longer exclusive. Such a lost
+    lock is logged and not raised when the job ends.
+    :param redis: the redis connection
+    :type redis: Redis
+    :param plugin_name: the name of the correlation plugin
+    :type plugin_name: str
+    :param value: the value to lock
+    :type value: str
+    """
+    timeout: int = correlation_config_data.value_lock_timeout
+    lock: Lock = redis.lock(_value_key(LOCK_KEY, plugin_name, value), timeout=timeout)
+    await lock.acquire()
+    keeper: asyncio.Task[None] = asyncio.create_task(_keep_lock(lock, timeout))
+    try:
+        yield
+    finally:
+        keeper.cancel()
+        with suppress(asyncio.CancelledError):
+            await keeper
+        try:
+            await lock.release()
+        except LockNotOwnedError:
+            _log.warning("lock %s expired before it was released, the value was not locked until the end", lock.name)
@@ -1,6 +1,25 @@
 import mmisp.db.all_models  # noqa: F401
 
-from . import correlation_job, top_correlations_job
+from . import (
+    clean_excluded_correlations_job,
+    correlate_event_job,
+    correlation_job,
+    rebuild_correlations_job,
+    reconcile_over_correlating_job,
+    regenerate_occurrences_job,
+    top_correlations_job,
+    update_attribute_correlations_job,
+)
 from .queue import queue
 
-__all__ = ["queue", "top_correlations_job", "correlation_job"]
+__all__ = [
+    "queue",
+    "top_correlations_job",
+    "correlation_job",
+    "correlate_event_job",
+    "regenerate_occurrences_job",
+    "clean_excluded_correlations_job",
+    "update_attribute_correlations_job",
+    "reconcile_over_correlating_job",
+    "rebuild_correlations_job",
+]
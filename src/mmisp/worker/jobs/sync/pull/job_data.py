@@ -13,6 +13,18 @@ class PullTechniqueEnum(str, Enum):
     PULL_RELEVANT_CLUSTERS = "pull_relevant_clusters"
 
 
+class PullEventResult(str, Enum):
+    """
+    Enum for the outcome of pulling a single event.
+    """
+
+    PULLED = "pulled"
+    FAILED = "failed"
+    """The pull failed for a reason that may go away, like an API error, so the event is pulled again."""
+    REJECTED = "rejected"
+    """The event can't be pulled as it is, like when its creator organisation is unknown locally."""
+
+
 class PullData(BaseModel):
     """
     Represents the input data of the PullJob.
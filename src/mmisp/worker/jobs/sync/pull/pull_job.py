@@ -1,7 +1,10 @@
+import asyncio
 import logging
 import uuid
+from datetime import datetime
 from uuid import UUID
 
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from streaq import WrappedContext
 
@@ -31,9 +34,16 @@ from mmisp.worker.api.requests_schemas import UserData
 from mmisp.worker.exceptions.job_exceptions import JobException
 from mmisp.worker.exceptions.misp_api_exceptions import APIException, InvalidAPIResponse
 from mmisp.worker.exceptions.server_exceptions import ForbiddenByServerSettings
-from mmisp.worker.jobs.sync.pull.job_data import PullData, PullResult, PullTechniqueEnum
+from mmisp.worker.jobs.sync.pull.job_data import PullData, PullEventResult, PullResult, PullTechniqueEnum
+from mmisp.worker.jobs.sync.pull.pull_watermark import (
+    clear_pull_failures,
+    count_pull_failures,
+    get_pull_watermark,
+    next_pull_watermark,
+    set_pull_watermark,
+)
 from mmisp.worker.jobs.sync.sync_config_data import SyncConfigData, sync_config_data
-from mmisp.worker.jobs.sync.sync_helper import _get_mini_events_from_server
+from mmisp.worker.jobs.sync.sync_helper import _filter_mini_events, server_concurrency_limits
 from mmisp.worker.misp_database.misp_api import MispAPI
 from mmisp.worker.misp_database.misp_sql import (
     event_id_exists,
@@ -88,7 +98,7 @@ async def pull_job(ctx: WrappedContext[None], user_data: UserData, pull_data: Pu
             )
 
         pull_event_return: tuple[int, int] = await __pull_events(
-            session, misp_api, sync_config, user, technique, remote_server
+            session, ctx.redis, misp_api, sync_config, user, technique, remote_server
         )
         pulled_events: int = pull_event_return[0]
         failed_pulled_events: int = pull_event_return[1]
@@ -647,6 +657,7 @@ async def __get_sharing_group_ids_of_user(misp_api: MispAPI, user: MispUser) ->
 @alog
 async def __pull_events(
     session: AsyncSession,
+    redis: Redis,
     misp_api: MispAPI,
     sync_config: SyncConfigData,
     user: MispUser,
@@ -655,64 +666,121 @@ async def __pull_events(
 ) -> tuple[int, int]:
     """
     This function pulls the events from the remote server and saves them in the local server.
+    Afterwards the pull watermark of the server is advanced, so the next incremental pull only lists the events
+    changed since then.
+    :param redis: The redis connection holding the pull watermarks.
     :param user: The user who started the job.
     :param technique: The technique used to pull the events.
     :param remote_server: The remote server from which the events are pulled.
     :return: The number of pulled events and the number of failed pulled events.
     """
 
-    pulled_events: int = 0
-    remote_event_ids: list[int] = await __get_event_ids_based_on_pull_technique(
-        session, misp_api, sync_config, technique, remote_server
+    watermark: datetime | None = await get_pull_watermark(redis, remote_server.id)
+    listed_events, remote_events = await __get_events_based_on_pull_technique(
+        session, misp_api, sync_config, technique, remote_server, watermark
     )
+    remote_event_ids: list[int] = [event.id for event in remote_events]
     __logger.debug(
         f"Found {len(remote_event_ids)} events to pull from Server {remote_server.name}. Event IDs: {remote_event_ids}"
     )
 
-    for event_id in remote_event_ids:
-        if await __pull_event(session, misp_api, event_id, remote_server):
-            pulled_events += 1
-        else:
-            __logger.info(f"Event with id {event_id} already exists and is up to date.")
+    # the events are pulled by a pool of workers, each with its own session because a session can't be shared
+    # between concurrent tasks, the number of events pulled from the same server at once is limited per process
+    limit: asyncio.Semaphore = server_concurrency_limits.get(remote_server.id)
+    pending_event_ids = iter(remote_event_ids)
+    pulled_event_ids: set[int] = set()
+    failed_event_ids: set[int] = set()
+    local_orgs: dict[str, asyncio.Future[GetOrganisationElement | None]] = {}
+
+    async def pull_worker() -> None:
+        assert sessionmanager is not None
+        async with sessionmanager.session() as worker_session:
+            worker_api = MispAPI(worker_session)
+            for event_id in pending_event_ids:
+                # an error pulling one event must not cancel the pulls of the other workers
+                result: PullEventResult
+                try:
+                    async with limit:
+                        result = await __pull_event(worker_session, worker_api, event_id, remote_server, local_orgs)
+                except Exception as e:
+                    __logger.warning(
+                        f"Error while pulling Event with id {event_id} from Server {remote_server.id}: {e}"
+                    )
+                    await worker_session.rollback()
+                    result = PullEventResult.FAILED
+                if result == PullEventResult.PULLED:
+                    pulled_event_ids.add(event_id)
+                elif result == PullEventResult.FAILED:
+                    failed_event_ids.add(event_id)
+
+    async with asyncio.TaskGroup() as task_group:
+        for _ in range(min(sync_config.pull_concurrency, len(remote_event_ids))):
+            task_group.create_task(pull_worker())
+    pulled_events: int = len(pulled_event_ids)
     failed_pulled_events: int = len(remote_event_ids) - pulled_events
+
+    # events whose pull failed hold the watermark back until they were retried often enough, events that were
+    # rejected don't, they are listed again by a full pull or when they change on the remote server
+    await clear_pull_failures(redis, remote_server.id, pulled_event_ids)
+    failures: dict[int, int] = await count_pull_failures(redis, remote_server.id, failed_event_ids)
+    given_up: set[int] = {event_id for event_id, count in failures.items() if count >= sync_config.pull_max_retries}
+    if given_up:
+        __logger.warning(
+            f"Giving up pulling the events {sorted(given_up)} from Server {remote_server.id} after "
+            f"{sync_config.pull_max_retries} failed pulls."
+        )
+        await clear_pull_failures(redis, remote_server.id, given_up)
+
+    new_watermark: datetime | None = next_pull_watermark(listed_events, failed_event_ids - given_up, watermark)
+    if new_watermark is not None and new_watermark != watermark:
+        await set_pull_watermark(redis, remote_server.id, new_watermark)
     return pulled_events, failed_pulled_events
 
 
 @alog
-async def __get_event_ids_based_on_pull_technique(
+async def __get_events_based_on_pull_technique(
     session: AsyncSession,
     misp_api: MispAPI,
     sync_config: SyncConfigData,
     technique: PullTechniqueEnum,
     remote_server: Server,
-) -> list[int]:
+    watermark: datetime | None,
+) -> tuple[list[MispMinimalEvent], list[MispMinimalEvent]]:
     """
-    This function returns a list of event ids based on the pull technique.
+    This function returns the remote events to pull based on the pull technique.
+    An incremental pull only lists the events changed since the watermark of the server, if the server was never
+    pulled before it lists all events.
     :param technique: The technique used to pull the events.
     :param remote_server: The remote server from which the events are pulled.
-    :return: A list of event ids.
+    :param watermark: The time up to which all events of the server have been pulled.
+    :return: All events listed by the remote server and the events of them to pull.
     """
     local_minimal_events: list[MispMinimalEvent] = await misp_api.get_minimal_events(True)
     local_event_ids: list[int] = [event.id for event in local_minimal_events]
     if technique == PullTechniqueEnum.FULL:
-        return await __get_event_ids_from_server(session, misp_api, sync_config, False, local_event_ids, remote_server)
+        return await __get_events_from_server(session, misp_api, sync_config, False, local_event_ids, remote_server)
     elif technique == PullTechniqueEnum.INCREMENTAL:
-        remote_event_ids: list[int] = await __get_event_ids_from_server(
-            session, misp_api, sync_config, True, local_event_ids, remote_server
+        return await __get_events_from_server(
+            session, misp_api, sync_config, True, local_event_ids, remote_server, watermark
         )
-        # TODO: This is not "incremental"
-        return list(set(local_event_ids) & set(remote_event_ids))
     else:
-        return []
+        return [], []
 
 
 @alog
-async def __pull_event(session: AsyncSession, misp_api: MispAPI, event_id: int, remote_server: Server) -> bool:
+async def __pull_event(
+    session: AsyncSession,
+    misp_api: MispAPI,
+    event_id: int,
+    remote_server: Server,
+    local_orgs: dict[str, asyncio.Future[GetOrganisationElement | None]],
+) -> PullEventResult:
     """
     This function pulls the event from the remote server and saves it in the local server.
     :param event_id: The id of the event.
     :param remote_server: The remote server from which the event is pulled.
-    :return: True if the event was pulled successfully, False otherwise.
+    :param local_orgs: The lookups of the local creator organisations by their uuid, shared by all events of the pull.
+    :return: If the event was pulled, its pull failed or it was rejected because it can't be pulled as it is.
     """
 
     try:
@@ -721,44 +789,67 @@ async def __pull_event(session: AsyncSession, misp_api: MispAPI, event_id: int,
         __logger.warning(
             f"Error while fetching Event with id {event_id} from Server with id {remote_server.id}: " + str(e)
         )
-        return False
+        return PullEventResult.FAILED
 
     remote_orgc: GetOrganisationElement = await misp_api.get_organisation(event.orgc_id, remote_server)
-    local_orgc: GetOrganisationElement | None
-    try:
-        local_orgc = await misp_api.get_organisation(remote_orgc.uuid) if remote_orgc.uuid else None
-    except APIException:
-        local_orgc = None
-
+    local_orgc: GetOrganisationElement | None = await __get_local_organisation(misp_api, remote_orgc, local_orgs)
     if not local_orgc:
         __logger.warning(
             f"Event {event.uuid}, cannot be pulled. Organisation with id {event.orgc_id} not found locally."
         )
-        return False
+        return PullEventResult.REJECTED
 
     updated_event: AddEditGetEventDetails = await _update_pulled_event_before_insert(event, local_orgc, remote_server)
 
     if await event_id_exists(session, updated_event.uuid):
         if await misp_api.update_event(updated_event):
             __logger.debug(f"Event {updated_event.uuid} updated. Update pulled from Server {remote_server.id}.")
-            return True
+            return PullEventResult.PULLED
         else:
             __logger.warning(
                 f"Error while pulling Event with id {updated_event.uuid} from Server with id {remote_server.id}. "
                 f"Event should exist locally but cannot be updated."
             )
-            return False
+            return PullEventResult.FAILED
     else:
         if await misp_api.save_event(updated_event):
             __logger.debug(f"Event {updated_event} saved locally. Pulled from Server {remote_server.id}.")
-            return True
+            return PullEventResult.PULLED
         else:
             __logger.warning(
                 f"Error while pulling Event with id {updated_event.uuid} from Server with id {remote_server.id}. "
                 f"Event should not exist locally but cannot be saved."
             )
+            return PullEventResult.FAILED
 
-    return False
+
+async def __get_local_organisation(
+    misp_api: MispAPI,
+    remote_orgc: GetOrganisationElement,
+    local_orgs: dict[str, asyncio.Future[GetOrganisationElement | None]],
+) -> GetOrganisationElement | None:
+    """
+    Returns the local organisation with the uuid of the remote creator organisation. It is looked up once per pull,
+    concurrent events of the same organisation wait for the same lookup and are pulled in parallel afterwards.
+    :param remote_orgc: The creator organisation of the event on the remote server.
+    :param local_orgs: The lookups of the local creator organisations by their uuid, shared by all events of the pull.
+    :return: The local organisation or None if it doesn't exist locally.
+    """
+    if not remote_orgc.uuid:
+        return None
+    lookup: asyncio.Future[GetOrganisationElement | None] | None = local_orgs.get(str(remote_orgc.uuid))
+    if lookup is None:
+        lookup = asyncio.ensure_future(__lookup_local_organisation(misp_api, str(remote_orgc.uuid)))
+        local_orgs[str(remote_orgc.uuid)] = lookup
+    # a cancelled event must not cancel the lookup the other events of the organisation wait for
+    return await asyncio.shield(lookup)
+
+
+async def __lookup_local_organisation(misp_api: MispAPI, org_uuid: str) -> GetOrganisationElement | None:
+    try:
+        return await misp_api.get_organisation(org_uuid)
+    except APIException:
+        return None
 
 
 @alog
@@ -793,31 +884,27 @@ async def _update_pulled_event_before_insert(
 
 
 @alog
-async def __get_event_ids_from_server(
+async def __get_events_from_server(
     session: AsyncSession,
     misp_api: MispAPI,
     sync_config: SyncConfigData,
     ignore_filter_rules: bool,
     local_event_ids: list[int],
     remote_server: Server,
-) -> list[int]:
+    since: datetime | None = None,
+) -> tuple[list[MispMinimalEvent], list[MispMinimalEvent]]:
     """
-    This function returns a list of event ids from the remote server.
+    This function returns the minimal events from the remote server and the ones of them that are new or newer than
+    the local ones.
     :param ignore_filter_rules: If True, the filter rules will be ignored. If False, the filter rules will be applied.
     :param local_event_ids: The ids of the events that are saved in the local server.
     :param remote_server: The remote server from which the event ids are pulled.
-    :return: A list of event ids.
-    """
-    remote_event_views: list[MispMinimalEvent] = await _get_mini_events_from_server(
-        session,
-        ignore_filter_rules,
-        local_event_ids,
-        sync_config,
-        misp_api,
-        remote_server,
-    )
-
-    return [event.id for event in remote_event_views]
+    :param since: If given only the events changed at or after this time are listed.
+    :return: All listed minimal events and the minimal events to pull.
+    """
+    listed_events: list[MispMinimalEvent] = await misp_api.get_minimal_events(ignore_filter_rules, remote_server, since)
+    events: list[MispMinimalEvent] = await _filter_mini_events(session, listed_events, local_event_ids, sync_config)
+    return listed_events, events
 
 
 # <-----------
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from typing import Collection
+
+from redis.asyncio import Redis
+
+from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
+
+PULL_WATERMARK_KEY: str = "mmisp:sync:pull_watermark:{server_id}"
+"""The redis key of the timestamp up to which all events of a remote server have been pulled."""
+
+PULL_FAILURES_KEY: str = "mmisp:sync:pull_failures:{server_id}"
+"""The redis key of the hash counting the failed pulls of the events of a remote server by event id."""
+
+
+async def get_pull_watermark(redis: Redis, server_id: int) -> datetime | None:
+    """
+    Returns the timestamp up to which all events of the server have been pulled.
+    :param redis: the redis connection holding the watermark
+    :type redis: Redis
+    :param server_id: the id of the remote server
+    :type server_id: int
+    :return: the watermark or None if the server was never pulled
+    :rtype: datetime | None
+    """
+    raw: bytes | None = await redis.get(PULL_WATERMARK_KEY.format(server_id=server_id))
+    if raw is None:
+        return None
+    return datetime.fromtimestamp(int(raw), tz=timezone.utc)
+
+
+async def set_pull_watermark(redis: Redis, server_id: int, watermark: datetime) -> None:
+    """
+    Stores the timestamp up to which all events of the server have been pulled.
+    :param redis: the redis connection holding the watermark
+    :type redis: Redis
+    :param server_id: the id of the remote server
+    :type server_id: int
+    :param watermark: the new watermark
+    :type watermark: datetime
+    """
+    await redis.set(PULL_WATERMARK_KEY.format(server_id=server_id), int(watermark.timestamp()))
+
+
+async def count_pull_failures(redis: Redis, server_id: int, event_ids: Collection[int]) -> dict[int, int]:
+    """
+    Counts another failed pull of each of the events.
+    :param redis: the redis connection holding the failure counts
+    :type redis: Redis
+    :param server_id: the id of the remote server
+    :type server_id: int
+    :param event_ids: the ids of the events on the remote server whose pull failed
+    :type event_ids: Collection[int]
+    :return: the number of failed pulls of each event so far
+    :rtype: dict[int, int]
+    """
+    if not event_ids:
+        return {}
+    ordered: list[int] = list(event_ids)
+    async with redis.pipeline(transaction=False) as pipe:
+        for event_id in ordered:
+            pipe.hincrby(PULL_FAILURES_KEY.format(server_id=server_id), str(event_id), 1)
+        counts: list[int] = await pipe.execute()
+    return dict(zip(ordered, counts))
+
+
+async def clear_pull_failures(redis: Redis, server_id: int, event_ids: Collection[int]) -> None:
+    """
+    Forgets the failed pulls of the events, after they were pulled or given up.
+    :param redis: the redis connection holding the failure counts
+    :type redis: Redis
+    :param server_id: the id of the remote server
+    :type server_id: int
+    :param event_ids: the ids of the events on the remote server
+    :type event_ids: Collection[int]
+    """
+    if event_ids:
+        await redis.hdel(PULL_FAILURES_KEY.format(server_id=server_id), *(str(event_id) for event_id in event_ids))
+
+
+def next_pull_watermark(
+    listed_events: list[MispMinimalEvent], retried_event_ids: set[int], watermark: datetime | None
+) -> datetime | None:
+    """
+    Computes the watermark after a pull. It advances to the newest event the remote server listed, including events
+    that were skipped because they are blocked or up to date locally, but not past the oldest event that is retried,
+    so that event is listed again by the next incremental pull.
+    :param listed_events: all events listed by the remote server for the pull
+    :type listed_events: list[MispMinimalEvent]
+    :param retried_event_ids: the ids of the listed events whose pull failed and is retried
+    :type retried_event_ids: set[int]
+    :param watermark: the watermark before the pull
+    :type watermark: datetime | None
+    :return: the new watermark
+    :rtype: datetime | None
+    """
+    if not listed_events:
+        return watermark
+    retried: list[datetime] = [event.timestamp for event in listed_events if event.id in retried_event_ids]
+    if retried:
+        return min(retried)
+    return max(event.timestamp for event in listed_events)
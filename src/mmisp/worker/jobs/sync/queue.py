@@ -1,5 +1,6 @@
 from streaq import Worker
 
+from mmisp.worker.misp_database.misp_api_client_pool import misp_api_client_lifespan
 from mmisp.worker.redis_config import redis_config
 
-queue: Worker = Worker(redis_url=redis_config.redis_url(), queue_name="sync")
+queue: Worker = Worker(redis_url=redis_config.redis_url(), queue_name="sync", lifespan=misp_api_client_lifespan)
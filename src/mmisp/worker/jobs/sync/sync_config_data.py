@@ -1,9 +1,13 @@
-from pydantic import Field
+from pydantic import Field, PositiveInt
 from pydantic_settings import BaseSettings
 
 ENV_ENABLE_EVENT_BLOCKLISTING = "MISP.enableEventBlocklisting"
 ENV_ENABLE_ORG_BLOCKLISTING = "MISP.enableOrgBlocklisting"
 ENV_HOST_ORG_ID = "MISP.host_org_id"
+ENV_PULL_CONCURRENCY = "SYNC_PULL_CONCURRENCY"
+"""The name of the environment variable that configures how many events are pulled from a server at once."""
+ENV_PULL_MAX_RETRIES = "SYNC_PULL_MAX_RETRIES"
+"""The name of the environment variable that configures how often the pull of a failing event is retried."""
 
 
 class SyncConfigData(BaseSettings):
@@ -14,6 +18,10 @@ class SyncConfigData(BaseSettings):
     misp_enable_event_blocklisting: bool = Field(False, validation_alias=ENV_ENABLE_EVENT_BLOCKLISTING)
     misp_enable_org_blocklisting: bool = Field(False, validation_alias=ENV_ENABLE_ORG_BLOCKLISTING)
     misp_host_org_id: int = Field(0, validation_alias=ENV_HOST_ORG_ID)
+    pull_concurrency: PositiveInt = Field(8, validation_alias=ENV_PULL_CONCURRENCY)
+    """The maximum number of events pulled from one remote server at the same time by a worker process."""
+    pull_max_retries: PositiveInt = Field(3, validation_alias=ENV_PULL_MAX_RETRIES)
+    """The number of incremental pulls an event whose pull failed holds the pull watermark back for."""
 
 
 sync_config_data: SyncConfigData = SyncConfigData()
@@ -1,17 +1,47 @@
-import logging
+import asyncio
 from datetime import datetime
+from typing import Self
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mmisp.api_schemas.events import AddEditGetEventDetails
 from mmisp.api_schemas.server import Server
-from mmisp.worker.jobs.sync.sync_config_data import SyncConfigData
+from mmisp.worker.jobs.sync.sync_config_data import SyncConfigData, sync_config_data
 from mmisp.worker.misp_database.misp_api import MispAPI
-from mmisp.worker.misp_database.misp_sql import filter_blocked_events
+from mmisp.worker.misp_database.misp_sql import filter_blocked_events, get_event_timestamps
 from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
 
-log = logging.getLogger(__name__)
+
+class ServerConcurrencyLimits:
+    """
+    Limits how many requests of a worker process run against the same remote server at once, shared by all jobs of
+    the process. The semaphores are bound to the event loop they were created in, new ones are created if they are
+    used from another loop.
+    """
+
+    def __init__(self: Self, config: SyncConfigData) -> None:
+        self.__config: SyncConfigData = config
+        self.__semaphores: dict[int, asyncio.Semaphore] = {}
+        self.__loop: asyncio.AbstractEventLoop | None = None
+
+    def get(self: Self, server_id: int) -> asyncio.Semaphore:
+        """
+        Returns the semaphore of the server in the running event loop, it is created with the configured pull
+        concurrency on first use.
+        :param server_id: the id of the remote server
+        :type server_id: int
+        :return: the semaphore limiting the concurrent requests to the server
+        :rtype: asyncio.Semaphore
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if self.__loop is not loop:
+            self.__semaphores = {}
+            self.__loop = loop
+        semaphore: asyncio.Semaphore | None = self.__semaphores.get(server_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.__config.pull_concurrency)
+            self.__semaphores[server_id] = semaphore
+        return semaphore
 
 
 async def _get_mini_events_from_server(
@@ -21,43 +51,64 @@ async def _get_mini_events_from_server(
     config: SyncConfigData,
     misp_api: MispAPI,
     remote_server: Server,
+    since: datetime | None = None,
+) -> list[MispMinimalEvent]:
+    remote_event_views: list[MispMinimalEvent] = await misp_api.get_minimal_events(
+        ignore_filter_rules, remote_server, since
+    )
+    return await _filter_mini_events(session, remote_event_views, local_event_ids, config)
+
+
+async def _filter_mini_events(
+    session: AsyncSession,
+    remote_event_views: list[MispMinimalEvent],
+    local_event_ids: list[int],
+    config: SyncConfigData,
 ) -> list[MispMinimalEvent]:
+    """
+    Removes the blocked events and the events that are not newer than their local copy from the listing of a remote
+    server.
+    :param remote_event_views: the minimal events listed by the remote server
+    :type remote_event_views: list[MispMinimalEvent]
+    :param local_event_ids: the ids of the local events
+    :type local_event_ids: list[int]
+    :param config: the sync configuration
+    :type config: SyncConfigData
+    :return: the events to sync
+    :rtype: list[MispMinimalEvent]
+    """
     use_event_blocklist: bool = config.misp_enable_event_blocklisting
     use_org_blocklist: bool = config.misp_enable_org_blocklisting
-    local_event_ids_dic: dict[UUID, AddEditGetEventDetails] = await _get_local_events_dic(local_event_ids, misp_api)
+    local_event_timestamps: dict[UUID, tuple[int, bool]] = await get_event_timestamps(session, local_event_ids)
 
-    remote_event_views: list[MispMinimalEvent] = await misp_api.get_minimal_events(ignore_filter_rules, remote_server)
     remote_event_views = await filter_blocked_events(
         session, remote_event_views, use_event_blocklist, use_org_blocklist
     )
-    remote_event_views = _filter_old_events(local_event_ids_dic, remote_event_views)
-
-    return remote_event_views
+    return _filter_old_events(local_event_timestamps, remote_event_views)
 
 
 def _filter_old_events(
-    local_event_ids_dic: dict[UUID, AddEditGetEventDetails], events: list[MispMinimalEvent]
+    local_event_timestamps: dict[UUID, tuple[int, bool]], events: list[MispMinimalEvent]
 ) -> list[MispMinimalEvent]:
+    """
+    Keeps the events that are not saved locally, or are newer than the locked local copy.
+    :param local_event_timestamps: the timestamp as unix epoch and the locked flag of the local events by their uuid
+    :type local_event_timestamps: dict[UUID, tuple[int, bool]]
+    :param events: the minimal events of the remote server
+    :type events: list[MispMinimalEvent]
+    :return: the events to sync
+    :rtype: list[MispMinimalEvent]
+    """
     out: list[MispMinimalEvent] = []
     for event in events:
         uuid: UUID = UUID(event.uuid)
-        if uuid not in local_event_ids_dic:
+        if uuid not in local_event_timestamps:
             out.append(event)
         else:
-            # smallest possible date for none
-            local_timestamp = local_event_ids_dic[uuid].timestamp or datetime(1, 1, 1)
-            if event.timestamp > local_timestamp and local_event_ids_dic[uuid].locked:
+            local_timestamp, locked = local_event_timestamps[uuid]
+            if int(event.timestamp.timestamp()) > local_timestamp and locked:
                 out.append(event)
     return out
 
 
-async def _get_local_events_dic(local_event_ids: list[int], misp_api: MispAPI) -> dict[UUID, AddEditGetEventDetails]:
-    out: dict[UUID, AddEditGetEventDetails] = {}
-    for event_id in local_event_ids:
-        try:
-            event: AddEditGetEventDetails = await misp_api.get_event(event_id)
-        except Exception as e:
-            log.warning(f"Error while getting event {event_id} from local MISP: {e}")
-            continue
-        out[UUID(event.uuid)] = event
-    return out
+server_concurrency_limits: ServerConcurrencyLimits = ServerConcurrencyLimits(sync_config_data)
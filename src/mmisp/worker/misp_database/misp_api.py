@@ -4,9 +4,9 @@ from datetime import datetime, timedelta
 from typing import List, Self
 from uuid import UUID
 
-import requests
+import httpx
 from fastapi.encoders import jsonable_encoder
-from requests import PreparedRequest, Request, Response, Session, TooManyRedirects
+from httpx import Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from mmisp.api_schemas.attributes import (
@@ -44,8 +44,9 @@ from mmisp.lib.distribution import AttributeDistributionLevels
 from mmisp.util.uuid import uuid
 from mmisp.worker.exceptions.misp_api_exceptions import APIException, InvalidAPIResponse
 from mmisp.worker.misp_database import misp_api_utils
+from mmisp.worker.misp_database.misp_api_client_pool import misp_api_client_pool
 from mmisp.worker.misp_database.misp_api_config import MispAPIConfigData, misp_api_config_data
-from mmisp.worker.misp_database.misp_sql import get_api_authkey
+from mmisp.worker.misp_database.server_authkey_cache import server_authkey_cache
 from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
 from mmisp.worker.misp_dataclasses.misp_user import MispUser
 
@@ -68,58 +69,52 @@ class MispAPI:
         self.__config: MispAPIConfigData = misp_api_config_data
         self._db = db
 
-    def __setup_api_session(self: Self) -> Session:
+    def __get_api_headers(self: Self) -> dict[str, str]:
         """
-        This method is used to set up the session for the API.
+        This method is used to get the headers for requests to the own API.
 
-        :return:  returns the session that was set up
-        :rtype: Session
+        :return: returns the headers including the authorization
+        :rtype: dict[str, str]
         """
         _log.debug("Using authkey starting with %.4s", self.__config.key)
         if not self.__config.key:
             raise ValueError("Authorization cannot be empty")
 
-        session = Session()
-        session.headers.update(self.__HEADERS)
-        session.headers.update({"Authorization": f"{self.__config.key}"})
-        return session
+        return {**self.__HEADERS, "Authorization": f"{self.__config.key}"}
 
-    async def __setup_remote_api_session(self: Self, server_id: int) -> Session:
+    async def __get_remote_api_headers(self: Self, server_id: int) -> dict[str, str]:
         """
-        This method is used to set up the session for the remote API.
+        This method is used to get the headers for requests to the remote API.
+        The key of the server is cached per server id.
 
-        :param server_id: server id of the remote server to set up the session for
+        :param server_id: server id of the remote server to get the headers for
         :type server_id: int
-        :return: returns the session to the specified server that was set up
-        :rtype: Session
+        :return: returns the headers including the authorization for the specified server
+        :rtype: dict[str, str]
         """
 
-        key: str | None = await get_api_authkey(self._db, server_id)
+        key: str | None = await server_authkey_cache.get(self._db, server_id)
         if key is None:
             raise APIException(f"API key for server {server_id} is not available.")
 
-        session = Session()
-        session.headers.update(self.__HEADERS)
-        session.headers.update({"Authorization": f"{key}"})
-        return session
+        return {**self.__HEADERS, "Authorization": f"{key}"}
 
-    async def __get_session(self: Self, server: Server | None = None) -> Session:
+    async def __get_headers(self: Self, server: Server | None = None) -> dict[str, str]:
         """
-        This method is used to get the session for the given server_id
-        if a session for the given server_id already exists, it returns the existing session,
-        otherwise it sets up a new session and returns it.
+        This method is used to get the headers for requests to the given server.
+        The connections themselves are pooled by the shared client of the worker process.
 
-        :param server: server to get the session for, if no server is given, the own API is used
+        :param server: server to get the headers for, if no server is given, the own API is used
         :type server: Server
-        :return: returns a session to the specified server
-        :rtype: Session
+        :return: returns the headers for requests to the specified server
+        :rtype: dict[str, str]
         """
 
         server_id: int = server.id if server is not None else 0
         if server_id == 0:
-            return self.__setup_api_session()
+            return self.__get_api_headers()
         else:
-            return await self.__setup_remote_api_session(server_id)
+            return await self.__get_remote_api_headers(server_id)
 
     def __get_url(self: Self, path: str, server: Server | None = None) -> str:
         """
@@ -165,37 +160,36 @@ class MispAPI:
         else:
             return f"{url}/{path}"
 
-    async def __send_request(self: Self, request: PreparedRequest, server: Server | None = None, **kwargs) -> dict:
+    async def __send_request(self: Self, request: Request, server: Server | None = None) -> dict:
         """
         This method is used to send the given request and return the response.
+        The request is sent with the pooled client of the worker process without blocking the event loop.
 
         :param request: the request to send
-        :type request: PreparedRequest
-        :param kwargs: keyword arguments
-        :type kwargs: dict[str, Any]
+        :type request: Request
+        :param server: the server the request is sent to, if no server is given, the own API is used
+        :type server: Server
         :return: returns the response of the request
         :rtype: dict
         """
+        request.headers.update(await self.__get_headers(server))
         _log.debug(f"Sending request {request}")
         _log.debug(f"Request URL: {request.url}")
         _log.debug(f"Request method: {request.method}")
         if request.method in ["POST", "PUT"]:
-            _log.debug(f"Request body: {str(request.body)}")
+            _log.debug(f"Request body: {str(request.content)}")
 
         response: Response
 
-        if "timeout" not in kwargs:
-            kwargs["timeout"] = (self.__config.connect_timeout, self.__config.read_timeout)
-
         try:
-            response = (await self.__get_session(server)).send(request, **kwargs)
-        except (ConnectionError, TimeoutError, TooManyRedirects) as api_exception:
+            response = await misp_api_client_pool.get_client().send(request)
+        except (httpx.TransportError, httpx.TooManyRedirects) as api_exception:
             _log.warning(f"API not available. The request could not be made. ==> {api_exception}")
             raise APIException(f"API not available. The request could not be made. ==> {api_exception}")
 
         try:
             response.raise_for_status()
-        except requests.HTTPError as http_err:
+        except httpx.HTTPStatusError as http_err:
             # Füge hier eine detaillierte Fehlerausgabe hinzu
             error_details = (
                 f"HTTP Error occurred: {http_err}\n"
@@ -205,11 +199,11 @@ class MispAPI:
                 f"Headers: {response.headers}"
             )
             _log.error(error_details)
+            if server is not None and response.status_code in (401, 403):
+                # the key may have been changed, it is loaded from the database again on the next request
+                server_authkey_cache.invalidate(server.id)
             raise APIException(error_details) from http_err
 
-        if not response.ok:
-            raise requests.HTTPError(response, response.text)
-
         return misp_api_utils.decode_json_response(response)
 
     async def get_user(self: Self, user_id: int | None, server: Server | None = None) -> MispUser:
@@ -230,8 +224,7 @@ class MispAPI:
             url = self.__get_url("/users/view/me.json", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         get_user_element_responds: GetUsersElement = GetUsersElement.model_validate(response)
         user_dict: dict = get_user_element_responds.User.model_dump(mode="json")
         user_dict["role"] = get_user_element_responds.Role.model_dump(mode="json")
@@ -257,8 +250,7 @@ class MispAPI:
         url: str = self.__get_url(f"/organisations/view/{organisation_id}", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return GetOrganisationResponse.model_validate(response).Organisation
@@ -285,8 +277,7 @@ class MispAPI:
         url: str = self.__get_url(f"objects/view/{object_id}", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return ObjectResponse.model_validate(response).Object
@@ -311,8 +302,7 @@ class MispAPI:
 
         url: str = self.__get_url(f"/sharing_groups/view/{sharing_group_id}", server)
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         try:
             return ViewUpdateSharingGroupLegacyResponse.model_validate(response)
         except ValueError as value_error:
@@ -331,8 +321,7 @@ class MispAPI:
         """
         url: str = self.__get_url("/servers/getVersion", server)
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return ServerVersion.model_validate(response)
@@ -352,8 +341,7 @@ class MispAPI:
 
         url: str = self.__get_url(f"/galaxies/view/{galaxy_id}", server)
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return GetGalaxyResponse.model_validate(response)
@@ -379,8 +367,7 @@ class MispAPI:
         url: str = self.__get_url("/galaxy_clusters/restsearch", server)
 
         request: Request = Request("POST", url, json=conditions.model_dump(exclude_unset=True, mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         parsed_response: GalaxyClusterSearchResponse
 
@@ -417,9 +404,8 @@ class MispAPI:
         url: str = self.__get_url(f"/galaxy_clusters/view/{cluster_id}", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return GalaxyClusterResponse.model_validate(response).GalaxyCluster
@@ -427,7 +413,7 @@ class MispAPI:
             raise InvalidAPIResponse(f"Invalid API response. MISP Event could not be parsed: {value_error}")
 
     async def get_minimal_events(
-        self: Self, ignore_filter_rules: bool, server: Server | None = None
+        self: Self, ignore_filter_rules: bool, server: Server | None = None, since: datetime | None = None
     ) -> list[MispMinimalEvent]:
         """
         Returns all minimal events from the given server.
@@ -439,6 +425,8 @@ class MispAPI:
         :type ignore_filter_rules: bool
         :param server: the server to get the event from, if no server is given, the own API is used
         :type server: Server
+        :param since: if given only the events changed at or after this time are returned
+        :type since: datetime | None
         :return:    return all minimal events from the given server, capped by the limit
         :rtype: list[MispMinimalEvent]
         """
@@ -454,6 +442,8 @@ class MispAPI:
         # We need to refactor this, but lets just use a little more bandwith for now
         #        fr = IndexEventsBody(minimal=1, published=1, limit=self.__LIMIT)
         fr = IndexEventsBody(published=True, limit=self.__LIMIT)
+        if since is not None:
+            fr.timestamp = since
 
         i: int = 1
         while not finished:
@@ -462,8 +452,7 @@ class MispAPI:
             i += 1
 
             request: Request = Request("POST", url, json=fr.model_dump(exclude_unset=True, mode="json"))
-            prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
 
             for event_view in response:
                 try:
@@ -490,8 +479,7 @@ class MispAPI:
         """
         url: str = self.__get_url(f"/events/view/{event_id}", server)
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         try:
             return AddEditGetEventDetails.model_validate(response["Event"])
         except ValueError as value_error:
@@ -516,8 +504,7 @@ class MispAPI:
         url: str = self.__get_url(f"/sightings/index/{event_id}", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         out: list[SightingAttributesResponse] = []
         for sighting in response:
@@ -552,8 +539,7 @@ class MispAPI:
             url: str = self.__get_url("/shadow_attributes/index" + param, server)
 
             request: Request = Request("GET", url)
-            prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
 
             for proposal in response:
                 try:
@@ -579,8 +565,7 @@ class MispAPI:
         url: str = self.__get_url("/sharing_groups", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return GetAllSharingGroupsResponse.model_validate(response).response
@@ -602,8 +587,7 @@ class MispAPI:
         url: str = self.__get_url(f"/attributes/{attribute_id}", server)
 
         request: Request = Request("GET", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return GetAttributeResponse.model_validate(response).Attribute
@@ -631,8 +615,7 @@ class MispAPI:
             eventid=event_id, with_attachments=True, include_event_uuid=True
         )
         request: Request = Request("POST", url, json=body.model_dump(mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         try:
             return SearchAttributesResponse.model_validate(response).response.Attribute
@@ -659,8 +642,7 @@ class MispAPI:
         url: str = self.__get_url(f"/attributes/add/{attribute.event_id}", server)
 
         request: Request = Request("POST", url, json=attribute.model_dump(mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         if "Attribute" in response:
             return int(response["Attribute"]["id"])
 
@@ -680,9 +662,8 @@ class MispAPI:
 
         url: str = self.__get_url("/tags/add", server)
         request: Request = Request("POST", url, json=tag.model_dump(mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         return int(response["Tag"]["id"])
 
     async def attach_attribute_tag(
@@ -710,8 +691,7 @@ class MispAPI:
             server,
         )
         request: Request = Request("POST", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         _log.debug(
             f"Tag with id={tag_id} was attached to attribute with id={attribute_id} on server {server}. "
             f"Response: {response}"
@@ -739,9 +719,8 @@ class MispAPI:
 
         url: str = self.__get_url(f"/events/addTag/{event_id}/{tag_id}/local:{local}", server)
         request: Request = Request("POST", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
         _log.debug(
             f"Tag with id={tag_id} was attached to event with id={event_id} on server {server}. Response: {response}"
         )
@@ -770,9 +749,8 @@ class MispAPI:
         body: dict = {"Tag": {"relationship_type": relationship_type}}
 
         request: Request = Request("POST", url, json=body)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         return response["saved"] == "True" and response["success"] == "True"
 
@@ -799,9 +777,8 @@ class MispAPI:
         body = {"Tag": {"relationship_type": relationship_type}}
 
         request: Request = Request("POST", url, json=body)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
-        response: dict = await self.__send_request(prepared_request, server)
+        response: dict = await self.__send_request(request, server)
 
         return response["saved"] is True and response["success"] is True
 
@@ -829,10 +806,9 @@ class MispAPI:
 
         url: str = self.__get_url(f"/galaxy_clusters/add/{galaxy_id}", server)
         request: Request = Request("POST", url, json=jsonable_encoder(cluster))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
         try:
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
             _log.debug(
                 f"Galaxy Cluster with id={cluster.id}, uuid={cluster.uuid} was saved on server {server}. "
                 f"Response: {response}"
@@ -856,10 +832,9 @@ class MispAPI:
 
         url: str = self.__get_url(f"/galaxy_clusters/edit/{cluster.uuid}", server)
         request: Request = Request("PUT", url, json=cluster.model_dump(exclude_unset=True, mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
         try:
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
             _log.debug(f"Galaxy Cluster with uuid={cluster.uuid} was updated on server {server}. Response: {response}")
             return True
         except APIException as e:
@@ -879,11 +854,10 @@ class MispAPI:
         """
 
         url: str = self.__get_url("/events/add", server)
-        request: Request = Request("POST", url, data=event.model_dump_json(exclude_unset=True))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
+        request: Request = Request("POST", url, content=event.model_dump_json(exclude_unset=True))
 
         try:
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
             _log.debug(
                 f"Event with id={event.id}, uuid={event.uuid} was saved on server {server}. Response: {response}"
             )
@@ -908,11 +882,10 @@ class MispAPI:
         """
 
         url: str = self.__get_url(f"/events/edit/{event.uuid}", server)
-        request: Request = Request("PUT", url, data=event.model_dump_json(exclude_unset=True))
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
+        request: Request = Request("PUT", url, content=event.model_dump_json(exclude_unset=True))
 
         try:
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
             _log.debug(f"Event with uuid={event.uuid} was updated on server {server}. Response: {response}")
             return True
         except APIException as e:
@@ -936,10 +909,9 @@ class MispAPI:
         request: Request = Request(
             "POST", url, json=[sa.model_dump(exclude_unset=True, mode="json") for sa in event.ShadowAttribute]
         )
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
 
         try:
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
             _log.debug(
                 f"Proposal with id={event.id}, uuid={event.uuid} was saved on server {server}. Response: {response}"
             )
@@ -960,12 +932,10 @@ class MispAPI:
         """
 
         url: str = self.__get_url(f"/sightings/add/{sighting.attribute_uuid}", server)
-        request: Request = Request("POST", url)
-        prepared_request: PreparedRequest = (await self.__get_session(server)).prepare_request(request)
-        prepared_request.body = sighting.model_dump_json(exclude_unset=True)
+        request: Request = Request("POST", url, content=sighting.model_dump_json(exclude_unset=True))
 
         try:
-            response: dict = await self.__send_request(prepared_request, server)
+            response: dict = await self.__send_request(request, server)
             _log.debug(
                 f"Sighting with id={sighting.id}, uuid={sighting.uuid} was saved on server {server}. "
                 f"Response: {response}"
@@ -987,8 +957,7 @@ class MispAPI:
 
         url: str = self.__get_url("/organisations")
         request: Request = Request("POST", url, json=org.model_dump(exclude_unset=True, mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session()).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request)
+        response: dict = await self.__send_request(request)
 
         try:
             saved_org: GetOrganisationElement = GetOrganisationElement.model_validate(response)
@@ -1009,8 +978,8 @@ class MispAPI:
         """
         url: str = self.__get_url(f"/servers/remote/edit/{server_id}")
         request: Request = Request("POST", url, json=server_body.model_dump(exclude_unset=True, mode="json"))
-        prepared_request: PreparedRequest = (await self.__get_session()).prepare_request(request)
-        response: dict = await self.__send_request(prepared_request)
+        response: dict = await self.__send_request(request)
+        server_authkey_cache.invalidate(server_id)
 
         try:
             edited_server: AddServerResponse = AddServerResponse.model_validate(response)
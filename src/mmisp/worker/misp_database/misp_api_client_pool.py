@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Self
+
+import httpx
+from streaq import Worker
+
+from mmisp.worker.misp_database.misp_api_config import MispAPIConfigData, misp_api_config_data
+
+_log = logging.getLogger(__name__)
+
+
+class MispAPIClientPool:
+    """
+    Owns the asynchronous HTTP client shared by all MispAPI instances of a worker process, so the keep-alive
+    connections to the own and the remote MISP APIs are reused by all jobs instead of being opened per request.
+    A client is bound to the event loop it was created in, a new one is created if it is used from another loop and
+    the replaced client is closed in its own loop.
+    """
+
+    def __init__(self: Self, config: MispAPIConfigData) -> None:
+        self.__config: MispAPIConfigData = config
+        self.__client: httpx.AsyncClient | None = None
+        self.__loop: asyncio.AbstractEventLoop | None = None
+
+    def get_client(self: Self) -> httpx.AsyncClient:
+        """
+        Returns the client of the running event loop, it is created on first use.
+
+        :return: the shared client
+        :rtype: httpx.AsyncClient
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if self.__client is None or self.__client.is_closed or self.__loop is not loop:
+            if self.__client is not None and not self.__client.is_closed:
+                self.__close_in_loop(self.__client, self.__loop)
+            self.__client = self.__create_client()
+            self.__loop = loop
+        return self.__client
+
+    async def aclose(self: Self) -> None:
+        """
+        Closes the client and all its connections.
+        """
+        if self.__client is not None:
+            await self.__client.aclose()
+            self.__client = None
+            self.__loop = None
+
+    @staticmethod
+    def __close_in_loop(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop | None) -> None:
+        """
+        Closes a replaced client in the event loop it was created in, its connections can't be closed from another
+        loop. If that loop doesn't run anymore, the connections were dropped with it.
+
+        :param client: the replaced client
+        :type client: httpx.AsyncClient
+        :param loop: the event loop the client was created in
+        :type loop: asyncio.AbstractEventLoop | None
+        """
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    def __create_client(self: Self) -> httpx.AsyncClient:
+        """
+        Creates a client with the connection limits and timeouts of the config. HTTP/2 is only used if it is enabled
+        and the h2 package is installed.
+
+        :return: the new client
+        :rtype: httpx.AsyncClient
+        """
+        limits = httpx.Limits(
+            max_connections=self.__config.max_connections,
+            max_keepalive_connections=self.__config.max_keepalive_connections,
+            keepalive_expiry=self.__config.keepalive_expiry,
+        )
+        timeout = httpx.Timeout(self.__config.read_timeout, connect=self.__config.connect_timeout)
+        http2: bool = self.__config.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                _log.warning("HTTP/2 is enabled for the MISP API, but the h2 package is not installed. Using HTTP/1.1.")
+                http2 = False
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, follow_redirects=True)
+
+
+misp_api_client_pool: MispAPIClientPool = MispAPIClientPool(misp_api_config_data)
+
+
+@asynccontextmanager
+async def misp_api_client_lifespan(worker: Worker) -> AsyncIterator[None]:
+    """
+    Lifespan of the workers whose jobs use the MISP API, the shared client is closed when the worker shuts down.
+
+    :param worker: the worker
+    :type worker: Worker
+    """
+    try:
+        yield
+    finally:
+        await misp_api_client_pool.aclose()
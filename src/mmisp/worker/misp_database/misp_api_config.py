@@ -1,10 +1,15 @@
-from pydantic import Field, NonNegativeFloat
+from pydantic import Field, NonNegativeFloat, PositiveInt
 from pydantic_settings import BaseSettings
 
 ENV_MISP_API_URL: str = "DB_API_URL"
 ENV_MISP_API_KEY: str = "DB_API_KEY"
 ENV_MISP_API_CONNECT_TIMEOUT: str = "MISP_API_CONNECT_TIMEOUT"
 ENV_MISP_API_READ_TIMEOUT: str = "MISP_API_READ_TIMEOUT"
+ENV_MISP_API_MAX_CONNECTIONS: str = "MISP_API_MAX_CONNECTIONS"
+ENV_MISP_API_MAX_KEEPALIVE_CONNECTIONS: str = "MISP_API_MAX_KEEPALIVE_CONNECTIONS"
+ENV_MISP_API_KEEPALIVE_EXPIRY: str = "MISP_API_KEEPALIVE_EXPIRY"
+ENV_MISP_API_HTTP2: str = "MISP_API_HTTP2"
+ENV_MISP_API_AUTHKEY_CACHE_TTL: str = "MISP_API_AUTHKEY_CACHE_TTL"
 
 
 class MispAPIConfigData(BaseSettings):
@@ -12,6 +17,11 @@ class MispAPIConfigData(BaseSettings):
     key: str = Field("", validation_alias=ENV_MISP_API_KEY)
     connect_timeout: NonNegativeFloat = Field(40, validation_alias=ENV_MISP_API_CONNECT_TIMEOUT)
     read_timeout: NonNegativeFloat = Field(40, validation_alias=ENV_MISP_API_READ_TIMEOUT)
+    max_connections: PositiveInt = Field(100, validation_alias=ENV_MISP_API_MAX_CONNECTIONS)
+    max_keepalive_connections: PositiveInt = Field(20, validation_alias=ENV_MISP_API_MAX_KEEPALIVE_CONNECTIONS)
+    keepalive_expiry: NonNegativeFloat = Field(30, validation_alias=ENV_MISP_API_KEEPALIVE_EXPIRY)
+    http2: bool = Field(False, validation_alias=ENV_MISP_API_HTTP2)
+    authkey_cache_ttl: NonNegativeFloat = Field(60, validation_alias=ENV_MISP_API_AUTHKEY_CACHE_TTL)
 
 
 misp_api_config_data: MispAPIConfigData = MispAPIConfigData()
@@ -1,4 +1,6 @@
-from requests import JSONDecodeError, Response
+from json import JSONDecodeError
+
+from httpx import Response
 
 from mmisp.worker.exceptions.misp_api_exceptions import InvalidAPIResponse
 
@@ -1,11 +1,14 @@
 """helper module to interact with misp database"""
 
-from typing import Sequence, cast
+from datetime import datetime
+from typing import AsyncIterator, Collection, Sequence, cast
 from uuid import UUID
 
-from sqlalchemy import and_, delete, exists, select
+from sqlalchemy import LargeBinary, Select, and_, delete, exists, func, insert, inspect, or_, select, union_all
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.expression import false
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql.expression import ColumnElement, false, true
 
 from mmisp.api_schemas.galaxy_clusters import SearchGalaxyClusterGalaxyClustersDetails
 from mmisp.db.models.attribute import Attribute, AttributeTag
@@ -19,12 +22,14 @@ from mmisp.db.models.correlation import (
 from mmisp.db.models.event import Event, EventTag
 from mmisp.db.models.galaxy import Galaxy
 from mmisp.db.models.galaxy_cluster import GalaxyCluster
+from mmisp.db.models.object import Object
 from mmisp.db.models.organisation import Organisation
 from mmisp.db.models.post import Post
 from mmisp.db.models.server import Server
 from mmisp.db.models.sighting import Sighting
 from mmisp.db.models.threat_level import ThreatLevel
 from mmisp.util.uuid import is_uuid
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
 from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
 
 
@@ -98,11 +103,391 @@ async def get_attributes_with_same_value(session: AsyncSession, value: str) -> l
     :return: list of attributes with the same value
     :rtype: list[Attribute]
     """
-    statement = select(Attribute).where(and_(Attribute.value == value, Attribute.disable_correlation == false()))  # type: ignore
+    statement = select(Attribute).where(and_(Attribute.value == value, _is_correlatable()))  # type: ignore
     result: list[Attribute] = list((await session.execute(statement)).scalars().all())
     return result
 
 
+async def get_correlation_attributes_with_same_value(
+    session: AsyncSession, value: str
+) -> list[MispCorrelationAttribute]:
+    """
+    Method to get the correlation relevant columns of all attributes with the same value from database.
+    The attributes are joined with their events and objects in one query, no ORM objects are loaded.
+    :param value: to get attributes with
+    :type value: str
+    :return: list of the correlation rows of the attributes with the same value
+    :rtype: list[MispCorrelationAttribute]
+    """
+    statement = _correlation_attribute_select().where(
+        and_(Attribute.value == value, _is_correlatable())  # type: ignore
+    )
+    return [MispCorrelationAttribute(*row) for row in (await session.execute(statement)).all()]
+
+
+async def get_correlation_attributes(session: AsyncSession, attribute_ids: list[int]) -> list[MispCorrelationAttribute]:
+    """
+    Method to get the correlation relevant columns of the attributes with the given ids from database.
+    :param attribute_ids: the ids of the attributes
+    :type attribute_ids: list[int]
+    :return: list of the correlation rows of the attributes
+    :rtype: list[MispCorrelationAttribute]
+    """
+    if not attribute_ids:
+        return []
+    statement = _correlation_attribute_select().where(Attribute.id.in_(attribute_ids))
+    return [MispCorrelationAttribute(*row) for row in (await session.execute(statement)).all()]
+
+
+async def get_event_correlation_values(session: AsyncSession, event_id: int) -> set[str]:
+    """
+    Method to get the distinct values of the correlatable attributes of an event.
+    :param event_id: the id of the event
+    :type event_id: int
+    :return: the values of the attributes of the event
+    :rtype: set[str]
+    """
+    statement = select(Attribute.value1, Attribute.value2).where(
+        and_(Attribute.event_id == event_id, _is_correlatable())  # type: ignore
+    )
+    return {_join_value(value1, value2) for value1, value2 in (await session.execute(statement)).all()}
+
+
+async def get_event_timestamps(session: AsyncSession, event_ids: Collection[int]) -> dict[UUID, tuple[int, bool]]:
+    """
+    Method to get the uuid, timestamp and locked flag of the events with the given ids with one query, without
+    loading the events themselves.
+    :param event_ids: the ids of the events
+    :type event_ids: Collection[int]
+    :return: the timestamp as unix epoch and the locked flag of the events by their uuid
+    :rtype: dict[UUID, tuple[int, bool]]
+    """
+    if not event_ids:
+        return {}
+    statement = select(Event.uuid, Event.timestamp, Event.locked).where(Event.id.in_(event_ids))
+    return {
+        UUID(str(event_uuid)): (int(timestamp.timestamp()) if timestamp else 0, bool(locked))
+        for event_uuid, timestamp, locked in (await session.execute(statement)).all()
+    }
+
+
+async def get_correlation_attributes_by_value(
+    session: AsyncSession, values: Collection[str]
+) -> dict[str, list[MispCorrelationAttribute]]:
+    """
+    Method to get the correlation relevant columns of all correlatable attributes with one of the given values with
+    one query. Like Attribute.value an attribute has a value if its first value or its combined value matches.
+    :param values: the values to get the attributes of
+    :type values: Collection[str]
+    :return: the correlation rows of the attributes grouped by value, values without attributes are missing
+    :rtype: dict[str, list[MispCorrelationAttribute]]
+    """
+    if not values:
+        return {}
+    combined_value = Attribute.value1 + "|" + Attribute.value2
+    statement = (
+        _correlation_attribute_select()
+        .add_columns(Attribute.value1, Attribute.value2)
+        .where(
+            and_(
+                or_(Attribute.value1.in_(values), combined_value.in_(values)),
+                _is_correlatable(),  # type: ignore
+            )
+        )
+    )
+    result: dict[str, list[MispCorrelationAttribute]] = {}
+    for row in (await session.execute(statement)).all():
+        attribute = MispCorrelationAttribute(*row[:-2])
+        value1, value2 = row[-2], row[-1]
+        if value1 in values:
+            result.setdefault(value1, []).append(attribute)
+        combined: str = f"{value1}|{value2}"
+        if combined != value1 and combined in values:
+            result.setdefault(combined, []).append(attribute)
+    return result
+
+
+async def stream_correlation_attribute_groups(
+    session: AsyncSession, batch_size: int, max_group_size: int
+) -> AsyncIterator[tuple[str, int, list[MispCorrelationAttribute]]]:
+    """
+    Streams the correlation relevant columns of all correlatable attributes grouped by value, through a server-side
+    cursor ordered by value. Like Attribute.value an attribute belongs to the group of its first value and, if it has a
+    second value, to the group of its combined value. The session can't be used for other queries while streaming.
+    Values differing only in case or trailing spaces form one group, like they share one entry in the
+    correlation_values table. The rows are ordered by the collation of the database and then by the bytes of the value,
+    so the values the database considers equal are next to each other.
+    :param batch_size: the number of rows fetched from the cursor at once
+    :type batch_size: int
+    :param max_group_size: the maximum number of attributes kept per group, the others are only counted
+    :type max_group_size: int
+    :return: the value, the number of attributes and at most max_group_size attributes of every value
+    :rtype: AsyncIterator[tuple[str, int, list[MispCorrelationAttribute]]]
+    """
+    first_values = (
+        _correlation_attribute_select().add_columns(Attribute.value1.label("value")).where(_is_correlatable())
+    )
+    combined_values = (
+        _correlation_attribute_select()
+        .add_columns((Attribute.value1 + "|" + Attribute.value2).label("value"))
+        .where(and_(Attribute.value2 != "", _is_correlatable()))
+    )
+    rows = union_all(first_values, combined_values).subquery()
+    statement = (
+        select(rows).order_by(rows.c.value, rows.c.value.cast(LargeBinary)).execution_options(yield_per=batch_size)
+    )
+
+    current: str | None = None
+    current_key: str | None = None
+    count: int = 0
+    attributes: list[MispCorrelationAttribute] = []
+    async for partition in (await session.stream(statement)).partitions():
+        for row in partition:
+            value: str = row[-1]
+            key: str = value_collation_key(value)
+            if key != current_key:
+                if current is not None:
+                    yield current, count, attributes
+                current, current_key, count, attributes = value, key, 0, []
+            count += 1
+            if len(attributes) < max_group_size:
+                attributes.append(MispCorrelationAttribute(*row[:-1]))
+    if current is not None:
+        yield current, count, attributes
+
+
+async def stream_correlation_values(session: AsyncSession, batch_size: int) -> AsyncIterator[tuple[int, str]]:
+    """
+    Streams the ids and values of the correlation_values table through a server-side cursor.
+    :param batch_size: the number of rows fetched from the cursor at once
+    :type batch_size: int
+    :return: the id and value of every correlation value
+    :rtype: AsyncIterator[tuple[int, str]]
+    """
+    statement = select(CorrelationValue.id, CorrelationValue.value).execution_options(yield_per=batch_size)
+    async for partition in (await session.stream(statement)).partitions():
+        for value_id, value in partition:
+            yield value_id, value
+
+
+def _join_value(value1: str, value2: str) -> str:
+    """
+    Joins the two values of an attribute like Attribute.value.
+    """
+    if value2 == "":
+        return value1
+    return f"{value1}|{value2}"
+
+
+async def get_attribute_first_values(
+    session: AsyncSession, types: Collection[str], after_id: int = 0, attribute_ids: Collection[int] | None = None
+) -> list[tuple[int, str]]:
+    """
+    Method to get the ids and first values of the correlatable attributes of the given types, ordered by id.
+    :param types: the attribute types
+    :type types: Collection[str]
+    :param after_id: only attributes with a greater id are returned
+    :type after_id: int
+    :param attribute_ids: if given only the attributes with these ids are returned
+    :type attribute_ids: Collection[int] | None
+    :return: tuples of attribute id and first value
+    :rtype: list[tuple[int, str]]
+    """
+    statement = (
+        select(Attribute.id, Attribute.value1)
+        .where(and_(Attribute.type.in_(list(types)), Attribute.id > after_id, _is_correlatable()))
+        .order_by(Attribute.id)
+    )
+    if attribute_ids is not None:
+        statement = statement.where(Attribute.id.in_(list(attribute_ids)))
+    return [(attribute_id, value) for attribute_id, value in (await session.execute(statement)).all()]
+
+
+async def stream_attribute_first_values(
+    session: AsyncSession, types: Collection[str], after_id: int, changed_since: datetime | None, batch_size: int
+) -> AsyncIterator[tuple[int, str, bool, datetime]]:
+    """
+    Streams the ids and first values of the attributes of the given types created after the given id or changed since
+    the given time through a server-side cursor. Changed attributes are returned even if they don't take part in
+    correlations anymore.
+    :param types: the attribute types
+    :type types: Collection[str]
+    :param after_id: attributes with a greater id are returned
+    :type after_id: int
+    :param changed_since: if given attributes changed at or after this time are returned as well
+    :type changed_since: datetime | None
+    :param batch_size: the number of rows fetched from the cursor at once
+    :type batch_size: int
+    :return: tuples of attribute id, first value, if the attribute takes part in correlations and its timestamp
+    :rtype: AsyncIterator[tuple[int, str, bool, datetime]]
+    """
+    condition: ColumnElement[bool] = and_(Attribute.id > after_id, _is_correlatable())
+    if changed_since is not None:
+        condition = or_(condition, Attribute.timestamp >= changed_since)
+    statement = (
+        select(Attribute.id, Attribute.value1, _is_correlatable(), Attribute.timestamp)
+        .where(and_(Attribute.type.in_(list(types)), condition))
+        .execution_options(yield_per=batch_size)
+    )
+    async for partition in (await session.stream(statement)).partitions():
+        for attribute_id, value, correlatable, timestamp in partition:
+            yield attribute_id, value, bool(correlatable), timestamp
+
+
+async def stream_attribute_typed_values(
+    session: AsyncSession, types: Collection[str], after_id: int, batch_size: int
+) -> AsyncIterator[tuple[int, str, str, str]]:
+    """
+    Streams the ids, types and both values of the correlatable attributes of the given types created after the given
+    id through a server-side cursor.
+    :param types: the attribute types
+    :type types: Collection[str]
+    :param after_id: only attributes with a greater id are returned
+    :type after_id: int
+    :param batch_size: the number of rows fetched from the cursor at once
+    :type batch_size: int
+    :return: tuples of attribute id, type, first and second value
+    :rtype: AsyncIterator[tuple[int, str, str, str]]
+    """
+    statement = (
+        select(Attribute.id, Attribute.type, Attribute.value1, Attribute.value2)
+        .where(and_(Attribute.type.in_(list(types)), Attribute.id > after_id, _is_correlatable()))
+        .execution_options(yield_per=batch_size)
+    )
+    async for partition in (await session.stream(statement)).partitions():
+        for attribute_id, attribute_type, value1, value2 in partition:
+            yield attribute_id, attribute_type, value1, value2
+
+
+async def get_attribute_typed_values(
+    session: AsyncSession, types: Collection[str], after_id: int = 0, attribute_ids: Collection[int] | None = None
+) -> list[tuple[int, str, str, str]]:
+    """
+    Method to get the ids, types and both values of the correlatable attributes of the given types, ordered by id.
+    :param types: the attribute types
+    :type types: Collection[str]
+    :param after_id: only attributes with a greater id are returned
+    :type after_id: int
+    :param attribute_ids: if given only the attributes with these ids are returned
+    :type attribute_ids: Collection[int] | None
+    :return: tuples of attribute id, type, first and second value
+    :rtype: list[tuple[int, str, str, str]]
+    """
+    statement = (
+        select(Attribute.id, Attribute.type, Attribute.value1, Attribute.value2)
+        .where(and_(Attribute.type.in_(list(types)), Attribute.id > after_id, _is_correlatable()))
+        .order_by(Attribute.id)
+    )
+    if attribute_ids is not None:
+        statement = statement.where(Attribute.id.in_(list(attribute_ids)))
+    return [tuple(row) for row in (await session.execute(statement)).all()]  # type: ignore[misc]
+
+
+async def get_distinct_attribute_values(
+    session: AsyncSession, first_value_types: Collection[str], second_value_types: Collection[str]
+) -> set[str]:
+    """
+    Method to get the distinct first values of the correlatable attributes of some types and the distinct second
+    values of the correlatable attributes of other types with one query.
+    :param first_value_types: the attribute types whose first value is returned
+    :type first_value_types: Collection[str]
+    :param second_value_types: the attribute types whose second value is returned
+    :type second_value_types: Collection[str]
+    :return: the values
+    :rtype: set[str]
+    """
+    statement = union_all(
+        select(Attribute.value1).where(and_(Attribute.type.in_(list(first_value_types)), _is_correlatable())),
+        select(Attribute.value2).where(and_(Attribute.type.in_(list(second_value_types)), _is_correlatable())),
+    )
+    return set((await session.execute(statement)).scalars().all())
+
+
+def _is_correlatable() -> ColumnElement[bool]:
+    """
+    Builds the condition for attributes that take part in correlations, neither deleted nor excluded from
+    correlation.
+    :return: the condition
+    :rtype: ColumnElement[bool]
+    """
+    return and_(Attribute.disable_correlation == false(), Attribute.deleted == false())
+
+
+def _correlation_attribute_select() -> Select:
+    """
+    Builds the projection of attributes joined with their events and objects that fills MispCorrelationAttribute.
+    :return: the select statement without a where clause
+    :rtype: Select
+    """
+    return (
+        select(
+            Attribute.id,
+            Attribute.event_id,
+            Attribute.object_id,
+            Attribute.distribution,
+            func.coalesce(Attribute.sharing_group_id, 0),
+            Event.uuid,
+            Event.org_id,
+            Event.distribution,
+            func.coalesce(Event.sharing_group_id, 0),
+            func.coalesce(Object.distribution, 0),
+            func.coalesce(Object.sharing_group_id, 0),
+        )
+        .join(Event, Attribute.event_id == Event.id)
+        .outerjoin(Object, Attribute.object_id == Object.id)
+    )
+
+
+async def get_number_of_attributes_with_same_value(session: AsyncSession, value: str) -> int:
+    """
+    Method to count the attributes with the same value in the database without loading them.
+    :param value: to count the attributes of
+    :type value: str
+    :return: the number of correlatable attributes with the value
+    :rtype: int
+    """
+    statement = select(func.count(Attribute.id)).where(
+        and_(Attribute.value == value, _is_correlatable())  # type: ignore
+    )
+    result: int | None = (await session.execute(statement)).scalar()
+    return result or 0
+
+
+async def get_number_of_attributes_by_value(session: AsyncSession, values: Collection[str]) -> dict[str, int]:
+    """
+    Method to count the correlatable attributes of all given values without loading them. Like Attribute.value an
+    attribute has a value if its first value or its combined value matches.
+    :param values: to count the attributes of
+    :type values: Collection[str]
+    :return: the number of attributes per value, values without attributes are missing
+    :rtype: dict[str, int]
+    """
+    if not values:
+        return {}
+    combined_value = Attribute.value1 + "|" + Attribute.value2
+    first_values = (
+        select(Attribute.value1, func.count(Attribute.id))
+        .where(and_(Attribute.value1.in_(values), _is_correlatable()))  # type: ignore
+        .group_by(Attribute.value1)
+    )
+    combined_values = (
+        select(combined_value, func.count(Attribute.id))
+        .where(
+            and_(
+                Attribute.value2 != "",
+                combined_value.in_(values),
+                _is_correlatable(),  # type: ignore
+            )
+        )
+        .group_by(combined_value)
+    )
+    result: dict[str, int] = {}
+    for statement in (first_values, combined_values):
+        for value, count in (await session.execute(statement)).all():
+            result[value] = result.get(value, 0) + count
+    return result
+
+
 async def get_values_with_correlation(session: AsyncSession) -> list[str]:
     """ "
     Method to get all values from correlation_values table.
@@ -124,6 +509,150 @@ async def get_over_correlating_values(session: AsyncSession) -> list[tuple[str,
     return cast(list[tuple[str, int]], (await session.execute(statement)).all())
 
 
+async def get_correlation_value_statistics(
+    session: AsyncSession, shard: int = 0, shard_count: int = 1
+) -> list[tuple[str, int, int, int | None]]:
+    """
+    Method to get for all values from correlation_values table the number of correlatable attributes with the value,
+    the number of possible correlations between these attributes and the id of one of them. Attributes of the same
+    event don't correlate with each other. Everything is computed with aggregates in one query.
+    :param shard: only values of this shard are considered
+    :type shard: int
+    :param shard_count: the number of shards the values are split into
+    :type shard_count: int
+    :return: tuples of value, number of attributes, number of possible correlations and an attribute id or None
+    :rtype: list[tuple[str, int, int, int | None]]
+    """
+    per_event = (
+        select(
+            CorrelationValue.id.label("value_id"),
+            func.count(Attribute.id).label("attribute_count"),
+            func.min(Attribute.id).label("attribute_id"),
+        )
+        .outerjoin(
+            Attribute,
+            and_(Attribute.value == CorrelationValue.value, _is_correlatable()),  # type: ignore
+        )
+        .where(_in_shard(CorrelationValue.id, shard, shard_count))
+        .group_by(CorrelationValue.id, Attribute.event_id)
+        .subquery()
+    )
+    statement = (
+        select(
+            CorrelationValue.value,
+            func.sum(per_event.c.attribute_count),
+            func.sum(per_event.c.attribute_count * per_event.c.attribute_count),
+            func.min(per_event.c.attribute_id),
+        )
+        .join(per_event, per_event.c.value_id == CorrelationValue.id)
+        .group_by(CorrelationValue.id, CorrelationValue.value)
+    )
+
+    result: list[tuple[str, int, int, int | None]] = []
+    for value, count, sum_of_squares, attribute_id in (await session.execute(statement)).all():
+        count = int(count or 0)
+        # all pairs minus the pairs within the same event: (n^2 - sum(n_event^2)) / 2
+        possible_correlations: int = (count * count - int(sum_of_squares or 0)) // 2
+        result.append((value, count, possible_correlations, attribute_id))
+    return result
+
+
+async def get_number_of_correlations_per_value(
+    session: AsyncSession, shard: int = 0, shard_count: int = 1
+) -> dict[str, int]:
+    """
+    Method to get the number of correlations in the default_correlations table for all values with one aggregate
+    query. Values without correlations are not contained.
+    :param shard: only values of this shard are considered
+    :type shard: int
+    :param shard_count: the number of shards the values are split into
+    :type shard_count: int
+    :return: the number of correlations by value
+    :rtype: dict[str, int]
+    """
+    statement = (
+        select(CorrelationValue.value, func.count(DefaultCorrelation.id))
+        .join(DefaultCorrelation, DefaultCorrelation.value_id == CorrelationValue.id)
+        .where(_in_shard(CorrelationValue.id, shard, shard_count))
+        .group_by(CorrelationValue.id, CorrelationValue.value)
+    )
+    return {value: count for value, count in (await session.execute(statement)).all()}
+
+
+async def get_top_correlations(
+    session: AsyncSession, limit: int | None = None, offset: int = 0
+) -> list[tuple[str, int]]:
+    """
+    Method to get the values with the most correlations and their number of correlations with one aggregate query.
+    The list is sorted decreasing by the number of correlations, values without correlations are not contained.
+    :param limit: the maximum number of values to return, all values if None
+    :type limit: int | None
+    :param offset: the number of values to skip
+    :type offset: int
+    :return: tuples of value and number of correlations
+    :rtype: list[tuple[str, int]]
+    """
+    count = func.count(DefaultCorrelation.id).label("count")
+    statement = (
+        select(CorrelationValue.value, count)
+        .join(DefaultCorrelation, DefaultCorrelation.value_id == CorrelationValue.id)
+        .group_by(CorrelationValue.id, CorrelationValue.value)
+        .order_by(count.desc(), CorrelationValue.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return [(value, count) for value, count in (await session.execute(statement)).all()]
+
+
+async def get_over_correlating_value_statistics(
+    session: AsyncSession, shard: int = 0, shard_count: int = 1
+) -> list[tuple[str, int, int, int | None]]:
+    """
+    Method to get all values from over_correlating_values table with their stored occurrence, the current number of
+    correlatable attributes with the value and the id of one of them, computed with one aggregate query.
+    :param shard: only values of this shard are considered
+    :type shard: int
+    :param shard_count: the number of shards the values are split into
+    :type shard_count: int
+    :return: tuples of value, stored occurrence, current number of attributes and an attribute id or None
+    :rtype: list[tuple[str, int, int, int | None]]
+    """
+    statement = (
+        select(
+            OverCorrelatingValue.value,
+            OverCorrelatingValue.occurrence,
+            func.count(Attribute.id),
+            func.min(Attribute.id),
+        )
+        .outerjoin(
+            Attribute,
+            and_(Attribute.value == OverCorrelatingValue.value, _is_correlatable()),  # type: ignore
+        )
+        .where(_in_shard(OverCorrelatingValue.id, shard, shard_count))
+        .group_by(OverCorrelatingValue.id, OverCorrelatingValue.value, OverCorrelatingValue.occurrence)
+    )
+    return cast(list[tuple[str, int, int, int | None]], (await session.execute(statement)).all())
+
+
+def _in_shard(column: InstrumentedAttribute[int], shard: int, shard_count: int) -> ColumnElement[bool]:
+    """
+    Builds the condition selecting the rows of one shard. Rows are assigned to shards by their id modulo the number
+    of shards.
+    :param column: the id column to shard by
+    :type column: InstrumentedAttribute[int]
+    :param shard: the shard to select
+    :type shard: int
+    :param shard_count: the number of shards
+    :type shard_count: int
+    :return: the condition, always true if there is only one shard
+    :rtype: ColumnElement[bool]
+    """
+    if shard_count <= 1:
+        return true()
+    return column % shard_count == shard
+
+
 async def get_excluded_correlations(session: AsyncSession) -> Sequence[str]:
     """
     Method to get all values from correlation_exclusions table.
@@ -218,62 +747,199 @@ async def get_number_of_correlations(session: AsyncSession, value: str, only_ove
             return 0
 
 
+def value_collation_key(value: str) -> str:
+    """
+    Approximates the equality of the case-insensitive, space-padding collation of the correlation_values table, under
+    which values differing only in case or trailing spaces are the same value. Values the collation treats as equal
+    for other reasons, like accents, have different keys and are matched by the database instead.
+    :param value: the value
+    :type value: str
+    :return: the key of the value
+    :rtype: str
+    """
+    return value.rstrip(" ").casefold()
+
+
 async def add_correlation_value(session: AsyncSession, value: str) -> int:
     """
     Adds a new value to correlation_values table or returns the id of the current entry with the same value.
+    The value is looked up with the equality of the database, so an entry differing only in case is reused, and an
+    entry added by a concurrent writer in the meantime is returned instead of failing.
     :param value: to add or get id of in the correlation_values table
     :type value: str
     :return: the id of the value in the correlation_values table
     :rtype: int
     """
-    statement = select(CorrelationValue).where(CorrelationValue.value == value)
-    result: CorrelationValue | None = (await session.execute(statement)).scalars().first()
-    if not result:
-        new_value: CorrelationValue = CorrelationValue(value=value)
-        session.add(new_value)
+    value_id: int | None = await get_correlation_value_id(session, value)
+    if value_id is not None:
+        return value_id
+    new_value: CorrelationValue = CorrelationValue(value=value)
+    try:
+        async with session.begin_nested():
+            session.add(new_value)
+    except IntegrityError:
+        value_id = await get_correlation_value_id(session, value)
+        if value_id is None:
+            raise
+        return value_id
+    await session.commit()
+    await session.refresh(new_value)
+    return new_value.id
+
+
+async def add_correlation_values(session: AsyncSession, values: Collection[str]) -> dict[str, int]:
+    """
+    Adds the values to correlation_values table that are not in it yet, with one bulk insert.
+    Every given value is mapped to the entry the database considers equal to it, values differing only in case or
+    trailing spaces share one entry. If the bulk insert collides with an equal entry anyway, the remaining values are
+    looked up and added one by one.
+    :param values: to add or get the ids of in the correlation_values table
+    :type values: Collection[str]
+    :return: the ids of the values in the correlation_values table
+    :rtype: dict[str, int]
+    """
+    if not values:
+        return {}
+    value_ids: dict[str, int] = await _get_correlation_value_ids(session, values)
+    missing: dict[str, str] = {}
+    for value in values:
+        if value not in value_ids:
+            missing.setdefault(value_collation_key(value), value)
+    if missing:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(CorrelationValue), [{"value": value} for value in missing.values()])
+        except IntegrityError:
+            pass
         await session.commit()
-        await session.refresh(new_value)
-        return new_value.id
-    else:
-        return result.id
+        value_ids.update(
+            await _get_correlation_value_ids(session, [value for value in values if value not in value_ids])
+        )
+    for value in values:
+        if value not in value_ids:
+            value_ids[value] = await add_correlation_value(session, value)
+    return value_ids
+
+
+async def _get_correlation_value_ids(session: AsyncSession, values: Collection[str]) -> dict[str, int]:
+    """
+    Looks up the entries of the values in the correlation_values table with one query. A value is mapped to the entry
+    with exactly the same value or else to an entry with the same collation key, values without such an entry are
+    missing.
+    """
+    statement = select(CorrelationValue.value, CorrelationValue.id).where(CorrelationValue.value.in_(list(values)))
+    exact: dict[str, int] = {}
+    by_key: dict[str, int] = {}
+    for stored_value, value_id in (await session.execute(statement)).all():
+        exact[stored_value] = value_id
+        by_key.setdefault(value_collation_key(stored_value), value_id)
+    result: dict[str, int] = {}
+    for value in values:
+        value_id: int | None = exact.get(value, by_key.get(value_collation_key(value)))
+        if value_id is not None:
+            result[value] = value_id
+    return result
+
+
+async def get_correlation_value_id(session: AsyncSession, value: str) -> int | None:
+    """
+    Method to get the id of a value in the correlation_values table.
+    :param value: the value to get the id of
+    :type value: str
+    :return: the id of the value or None if the value is not in the table
+    :rtype: int | None
+    """
+    statement = select(CorrelationValue.id).where(CorrelationValue.value == value)
+    return (await session.execute(statement)).scalars().first()
 
 
 async def add_correlations(session: AsyncSession, correlations: list[DefaultCorrelation]) -> bool:
     """
     Adds a list of correlations to the database. Returns True if at least one correlation was added,
     False otherwise.
-    Doesn't add correlations that are already in the database.
+    Doesn't add correlations that are already in the database. Pairs are compared in their canonical orientation,
+    the smaller attribute id first. The existing pairs of all affected values are fetched with one query, because the
+    correlations table has no unique key on the pair, and the new correlations are written with a single executemany
+    insert. Before, the entries of the affected values in the correlation_values table are locked until the
+    transaction ends, so concurrent writers of the same value, from any job or plugin, see each other's pairs instead
+    of adding them twice. Databases without row locks, like SQLite, serialise writing transactions instead.
     :param correlations: list of correlations to add
     :type correlations: list[DefaultCorrelation]
     :return: true if at least one correlation was added, false otherwise
     :rtype: bool
     """
-    changed: bool = False
-    for correlation in correlations:
-        attribute_id1 = correlation.attribute_id
-        attribute_id2 = correlation.attribute_id_1
-        search_statement_1 = select(DefaultCorrelation.id).where(
-            and_(
-                DefaultCorrelation.attribute_id == attribute_id1,
-                DefaultCorrelation.attribute_id_1 == attribute_id2,
-            )
-        )
-        search_statement_2 = select(DefaultCorrelation.id).where(
-            and_(
-                DefaultCorrelation.attribute_id == attribute_id2,
-                DefaultCorrelation.attribute_id_1 == attribute_id1,
-            )
-        )
-        search_result_1: int | None = (await session.execute(search_statement_1)).scalars().first()
-        search_result_2: int | None = (await session.execute(search_statement_2)).scalars().first()
+    if not correlations:
+        return False
+
+    value_ids: list[int] = sorted({correlation.value_id for correlation in correlations})
+    # locked in the order of the ids, so writers of overlapping values can't deadlock
+    await session.execute(
+        select(CorrelationValue.id)
+        .where(CorrelationValue.id.in_(value_ids))
+        .order_by(CorrelationValue.id)
+        .with_for_update()
+    )
+    statement = select(DefaultCorrelation.attribute_id, DefaultCorrelation.attribute_id_1).where(
+        DefaultCorrelation.value_id.in_(value_ids)
+    )
+    known_pairs: set[tuple[int, int]] = {
+        _canonical_pair(attribute_id1, attribute_id2)
+        for attribute_id1, attribute_id2 in (await session.execute(statement)).all()
+    }
 
-        if search_result_1 or search_result_2:
+    new_rows: list[dict] = []
+    for correlation in correlations:
+        pair: tuple[int, int] = _canonical_pair(correlation.attribute_id, correlation.attribute_id_1)
+        if pair in known_pairs:
             continue
-        session.add(correlation)
-        changed = True
-    if changed:
+        known_pairs.add(pair)
+        new_rows.append(_correlation_to_row(correlation))
+
+    if not new_rows:
+        # releases the locks of the values
         await session.commit()
-    return changed
+        return False
+    await session.execute(insert(DefaultCorrelation), new_rows)
+    await session.commit()
+    return True
+
+
+async def _lock_correlation_values(session: AsyncSession, value_ids: Collection[int]) -> None:
+    """
+    Locks the entries of the values in the correlation_values table until the transaction ends. They are locked in the
+    order of their ids, so writers of overlapping values can't deadlock.
+    """
+    statement = (
+        select(CorrelationValue.id)
+        .where(CorrelationValue.id.in_(sorted(value_ids)))
+        .order_by(CorrelationValue.id)
+        .with_for_update()
+    )
+    await session.execute(statement)
+
+
+def _canonical_pair(attribute_id1: int, attribute_id2: int) -> tuple[int, int]:
+    """
+    Orders the attribute ids of a correlation, so both orientations of a pair are equal.
+    """
+    if attribute_id1 <= attribute_id2:
+        return attribute_id1, attribute_id2
+    return attribute_id2, attribute_id1
+
+
+def _correlation_to_row(correlation: DefaultCorrelation) -> dict:
+    """
+    Converts a transient DefaultCorrelation object to a parameter dictionary for a bulk insert.
+    :param correlation: the correlation to convert
+    :type correlation: DefaultCorrelation
+    :return: the column values of the correlation keyed by attribute name, without the primary key
+    :rtype: dict
+    """
+    return {
+        column.key: getattr(correlation, column.key)
+        for column in inspect(DefaultCorrelation).column_attrs
+        if column.key != "id"
+    }
 
 
 async def add_over_correlating_value(session: AsyncSession, value: str, count: int) -> bool:
@@ -325,23 +991,120 @@ async def delete_correlations(session: AsyncSession, value: str) -> bool:
     :return: True if value was in database, False otherwise
     :rtype: bool
     """
-    statement_value_id = select(CorrelationValue).where(CorrelationValue.value == value)
-    correlation_value: CorrelationValue | None = (await session.execute(statement_value_id)).scalars().first()
+    value_id: int | None = await get_correlation_value_id(session, value)
+    if value_id is None:
+        return False
 
-    if correlation_value:
-        delete_statement_value = delete(CorrelationValue).where(CorrelationValue.value == value)
-        await session.execute(delete_statement_value)
+    await session.execute(delete(CorrelationValue).where(CorrelationValue.id == value_id))
+    await session.execute(delete(DefaultCorrelation).where(DefaultCorrelation.value_id == value_id))
+    await session.commit()
+    return True
+
+
+async def delete_attribute_correlations(session: AsyncSession, attribute_id: int) -> set[int]:
+    """
+    Deletes all correlations of an attribute, no matter on which side of the correlation it is.
+    :param attribute_id: the id of the attribute
+    :type attribute_id: int
+    :return: the ids of the values of the deleted correlations
+    :rtype: set[int]
+    """
+    condition = or_(DefaultCorrelation.attribute_id == attribute_id, DefaultCorrelation.attribute_id_1 == attribute_id)
+    statement = select(DefaultCorrelation.value_id).where(condition).distinct()
+    value_ids: set[int] = set((await session.execute(statement)).scalars().all())
+    if value_ids:
+        await session.execute(delete(DefaultCorrelation).where(condition))
         await session.commit()
+    return value_ids
+
 
-        delete_statement_correlations = delete(DefaultCorrelation).where(
-            DefaultCorrelation.value_id == correlation_value.id
+async def delete_unused_correlation_values(session: AsyncSession, value_ids: Collection[int]) -> int:
+    """
+    Deletes the values with the given ids from correlation_values table that have no correlations left.
+    :param value_ids: the ids of the values to check
+    :type value_ids: Collection[int]
+    :return: the number of deleted values
+    :rtype: int
+    """
+    if not value_ids:
+        return 0
+    has_correlations = exists().where(DefaultCorrelation.value_id == CorrelationValue.id)
+    result = await session.execute(
+        delete(CorrelationValue).where(and_(CorrelationValue.id.in_(list(value_ids)), ~has_correlations))
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def delete_correlations_of_values(session: AsyncSession, value_ids: Sequence[int], batch_size: int) -> int:
+    """
+    Deletes the correlations of the given values in batches in one transaction, the values are kept.
+    :param value_ids: the ids of the correlation values
+    :type value_ids: Sequence[int]
+    :param batch_size: the number of correlation values whose correlations are deleted with one statement
+    :type batch_size: int
+    :return: the number of deleted correlations
+    :rtype: int
+    """
+    deleted: int = 0
+    for start in range(0, len(value_ids), batch_size):
+        batch: Sequence[int] = value_ids[start : start + batch_size]
+        result = await session.execute(delete(DefaultCorrelation).where(DefaultCorrelation.value_id.in_(batch)))
+        deleted += result.rowcount
+    await session.commit()
+    return deleted
+
+
+async def replace_correlations(
+    session: AsyncSession, value_ids: Collection[int], correlations: list[DefaultCorrelation]
+) -> int:
+    """
+    Replaces the correlations of the given values with the given correlations in one transaction, so the values keep
+    their old correlations if writing the new ones fails. All affected values are locked before anything is deleted,
+    like add_correlations does.
+    :param value_ids: the ids of the correlation values whose correlations are deleted
+    :type value_ids: Collection[int]
+    :param correlations: the correlations to add
+    :type correlations: list[DefaultCorrelation]
+    :return: the number of deleted correlations
+    :rtype: int
+    """
+    await _lock_correlation_values(session, {*value_ids, *(correlation.value_id for correlation in correlations)})
+    deleted: int = 0
+    if value_ids:
+        result = await session.execute(
+            delete(DefaultCorrelation).where(DefaultCorrelation.value_id.in_(list(value_ids)))
         )
-        await session.execute(delete_statement_correlations)
-        await session.commit()
+        deleted = result.rowcount
+    await add_correlations(session, correlations)
+    await session.commit()
+    return deleted
 
-        return True
-    else:
-        return False
+
+async def delete_correlation_values(
+    session: AsyncSession, value_ids: Sequence[int], batch_size: int
+) -> tuple[int, int]:
+    """
+    Deletes the correlation values with the given ids and their correlations in batches in one transaction.
+    :param value_ids: the ids of the correlation values
+    :type value_ids: Sequence[int]
+    :param batch_size: the number of correlation values deleted with one statement
+    :type batch_size: int
+    :return: the number of deleted correlation values and the number of deleted correlations
+    :rtype: tuple[int, int]
+    """
+    deleted_values: int = 0
+    deleted_correlations: int = 0
+    for start in range(0, len(value_ids), batch_size):
+        batch: Sequence[int] = value_ids[start : start + batch_size]
+        correlations_result = await session.execute(
+            delete(DefaultCorrelation).where(DefaultCorrelation.value_id.in_(batch))
+        )
+        values_result = await session.execute(delete(CorrelationValue).where(CorrelationValue.id.in_(batch)))
+        deleted_correlations += correlations_result.rowcount
+        deleted_values += values_result.rowcount
+    await session.commit()
+    return deleted_values, deleted_correlations
 
 
 async def get_event_tag_id(session: AsyncSession, event_id: int, tag_id: int) -> int:
@@ -0,0 +1,56 @@
+import time
+from typing import Self
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mmisp.worker.misp_database.misp_api_config import MispAPIConfigData, misp_api_config_data
+from mmisp.worker.misp_database.misp_sql import get_api_authkey
+
+
+class ServerAuthkeyCache:
+    """
+    Caches the API authentication keys of the remote servers per server id, so requests to a server don't query its
+    key from the database every time. An entry is loaded again after the configured time to live or when it is
+    invalidated, because the server was edited or rejected the key.
+    """
+
+    def __init__(self: Self, config: MispAPIConfigData) -> None:
+        self.__config: MispAPIConfigData = config
+        self.__keys: dict[int, tuple[str, float]] = {}
+
+    async def get(self: Self, session: AsyncSession, server_id: int) -> str | None:
+        """
+        Returns the API authentication key of the server, it is loaded from the database if it isn't cached.
+
+        :param session: the session used to load the key
+        :type session: AsyncSession
+        :param server_id: the id of the server
+        :type server_id: int
+        :return: the key or None if the server doesn't exist
+        :rtype: str | None
+        """
+        cached: tuple[str, float] | None = self.__keys.get(server_id)
+        if cached is not None and time.monotonic() - cached[1] < self.__config.authkey_cache_ttl:
+            return cached[0]
+
+        key: str | None = await get_api_authkey(session, server_id)
+        if key is None:
+            self.__keys.pop(server_id, None)
+        else:
+            self.__keys[server_id] = (key, time.monotonic())
+        return key
+
+    def invalidate(self: Self, server_id: int | None = None) -> None:
+        """
+        Discards the cached key of the server, or all cached keys if no server is given.
+
+        :param server_id: the id of the server
+        :type server_id: int | None
+        """
+        if server_id is None:
+            self.__keys.clear()
+        else:
+            self.__keys.pop(server_id, None)
+
+
+server_authkey_cache: ServerAuthkeyCache = ServerAuthkeyCache(misp_api_config_data)
@@ -0,0 +1,19 @@
+from typing import NamedTuple
+
+
+class MispCorrelationAttribute(NamedTuple):
+    """
+    Encapsulates the columns of an attribute, its event and its object that are needed to correlate the attribute.
+    """
+
+    id: int
+    event_id: int
+    object_id: int
+    distribution: int
+    sharing_group_id: int
+    event_uuid: str
+    event_org_id: int
+    event_distribution: int
+    event_sharing_group_id: int
+    object_distribution: int
+    object_sharing_group_id: int
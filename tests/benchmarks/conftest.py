@@ -0,0 +1,97 @@
+import random
+import uuid as libuuid
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+
+from mmisp.db.models.attribute import Attribute
+from mmisp.db.models.correlation import (
+    CorrelationExclusions,
+    CorrelationValue,
+    DefaultCorrelation,
+    OverCorrelatingValue,
+)
+from mmisp.db.models.event import Event
+from mmisp.lib.distribution import EventDistributionLevels
+from mmisp.tests.generators.model_generators.attribute_generator import generate_text_attribute
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.exclusion_index import bump_exclusion_version
+from mmisp.worker.jobs.correlation.queue import queue
+
+from .measurement import BenchmarkConfig, zipf_values
+
+
+@pytest.fixture
+def benchmark_config() -> BenchmarkConfig:
+    return BenchmarkConfig()
+
+
+@pytest.fixture(autouse=True)
+def benchmark_settings():
+    """
+    Disables the coalesce window and the result cache of the correlation jobs, so only the work itself is measured.
+    """
+    saved: tuple[float, int] = (
+        correlation_config_data.coalesce_window,
+        correlation_config_data.top_correlations_cache_ttl,
+    )
+    correlation_config_data.coalesce_window = 0
+    correlation_config_data.top_correlations_cache_ttl = 0
+    yield
+    correlation_config_data.coalesce_window, correlation_config_data.top_correlations_cache_ttl = saved
+
+
+@pytest_asyncio.fixture
+async def benchmark_events(db, organisation, site_admin_user, benchmark_config) -> list[Event]:
+    events: list[Event] = [
+        Event(
+            org_id=organisation.id,
+            orgc_id=organisation.id,
+            user_id=site_admin_user.id,
+            uuid=libuuid.uuid4(),
+            sharing_group_id=0,
+            threat_level_id=1,
+            info=f"benchmark event {i}",
+            date=date(year=2024, month=2, day=13),
+            analysis=1,
+            distribution=EventDistributionLevels.ALL_COMMUNITIES,
+        )
+        for i in range(benchmark_config.events)
+    ]
+    db.add_all(events)
+    await db.commit()
+    yield events
+
+    event_ids: list[int] = [event.id for event in events]
+    await db.execute(delete(Event).where(Event.id.in_(event_ids)))
+    await db.commit()
+
+
+@pytest_asyncio.fixture
+async def benchmark_attributes(db, benchmark_events, benchmark_config) -> list[int]:
+    """
+    Generates the attributes of the benchmark with Zipf distributed values and returns their ids. The correlations
+    and correlation values of the benchmark are deleted afterwards.
+    """
+    rng = random.Random(benchmark_config.seed)
+    values: list[str] = zipf_values(
+        benchmark_config.attributes, benchmark_config.distinct_values, benchmark_config.zipf_exponent, rng
+    )
+    attributes: list[Attribute] = [
+        generate_text_attribute(benchmark_events[i % len(benchmark_events)].id, value) for i, value in enumerate(values)
+    ]
+    db.add_all(attributes)
+    await db.commit()
+    attribute_ids: list[int] = [attribute.id for attribute in attributes]
+    yield attribute_ids
+
+    benchmark_values = select(CorrelationValue.id).where(CorrelationValue.value.like("benchmark-value-%"))
+    await db.execute(delete(DefaultCorrelation).where(DefaultCorrelation.value_id.in_(benchmark_values)))
+    await db.execute(delete(CorrelationValue).where(CorrelationValue.value.like("benchmark-value-%")))
+    await db.execute(delete(OverCorrelatingValue).where(OverCorrelatingValue.value.like("benchmark-value-%")))
+    await db.execute(delete(CorrelationExclusions).where(CorrelationExclusions.value.like("benchmark-value-%")))
+    await db.execute(delete(Attribute).where(Attribute.id.in_(attribute_ids)))
+    await db.commit()
+    await bump_exclusion_version(queue.redis)
@@ -0,0 +1,137 @@
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Self
+
+from pydantic import BaseModel, Field, PositiveFloat, PositiveInt
+from pydantic_settings import BaseSettings
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class BenchmarkConfig(BaseSettings):
+    """
+    Size and value distribution of the generated benchmark data, configured with environment variables.
+    """
+
+    events: PositiveInt = Field(50, validation_alias="BENCHMARK_EVENTS")
+    """The number of generated events."""
+    attributes: PositiveInt = Field(5000, validation_alias="BENCHMARK_ATTRIBUTES")
+    """The number of generated attributes, spread evenly over the events."""
+    distinct_values: PositiveInt = Field(1000, validation_alias="BENCHMARK_DISTINCT_VALUES")
+    """The number of distinct values the attribute values are drawn from."""
+    zipf_exponent: PositiveFloat = Field(1.1, validation_alias="BENCHMARK_ZIPF_EXPONENT")
+    """The exponent of the Zipf distribution of the values, higher values make few values more frequent."""
+    correlated_attributes: PositiveInt = Field(200, validation_alias="BENCHMARK_CORRELATED_ATTRIBUTES")
+    """The number of attributes correlated one by one by the correlation job benchmark."""
+    seed: int = Field(42, validation_alias="BENCHMARK_SEED")
+    """The seed of the random generator, the same seed generates the same data."""
+    results_file: str = Field("benchmark-results.jsonl", validation_alias="BENCHMARK_RESULTS_FILE")
+    """The file the results are appended to, one JSON object per line."""
+
+
+class BenchmarkResult(BaseModel):
+    """
+    Measurements of one benchmarked job.
+    """
+
+    job: str
+    commit: str
+    config: dict
+    runs: int = 1
+    queries: int = 0
+    wall_time: float = 0.0
+    peak_memory: int = 0
+    """The peak of the memory allocated by Python during the job in bytes."""
+
+
+def zipf_values(count: int, distinct_values: int, exponent: float, rng: random.Random) -> list[str]:
+    """
+    Draws values from a Zipf distribution, the k-th most frequent value is drawn with a probability proportional to
+    1 / k ** exponent.
+    :param count: the number of values to draw
+    :type count: int
+    :param distinct_values: the number of distinct values
+    :type distinct_values: int
+    :param exponent: the exponent of the distribution
+    :type exponent: float
+    :param rng: the random generator
+    :type rng: random.Random
+    :return: the drawn values
+    :rtype: list[str]
+    """
+    weights: list[float] = [1 / rank**exponent for rank in range(1, distinct_values + 1)]
+    ranks: list[int] = rng.choices(range(distinct_values), weights=weights, k=count)
+    return [f"benchmark-value-{rank}" for rank in ranks]
+
+
+class QueryCounter:
+    """
+    Counts the statements executed by all SQLAlchemy engines while it is active.
+    """
+
+    def __init__(self: Self) -> None:
+        self.count: int = 0
+
+    def _count(self: Self, *args: object) -> None:
+        self.count += 1
+
+    def __enter__(self: Self) -> Self:
+        event.listen(Engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self: Self, *args: object) -> None:
+        event.remove(Engine, "before_cursor_execute", self._count)
+
+
+@asynccontextmanager
+async def measure(job: str, config: BenchmarkConfig) -> AsyncIterator[BenchmarkResult]:
+    """
+    Measures the queries, the wall time and the peak memory of the code in the context and appends the result to the
+    results file of the config.
+    :param job: the name of the benchmarked job
+    :type job: str
+    :param config: the benchmark config
+    :type config: BenchmarkConfig
+    :return: the result, filled when the context is left
+    :rtype: AsyncIterator[BenchmarkResult]
+    """
+    result = BenchmarkResult(
+        job=job, commit=_current_commit(), config=config.model_dump(exclude={"results_file"}), runs=1
+    )
+    tracemalloc_was_tracing: bool = tracemalloc.is_tracing()
+    if not tracemalloc_was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    with QueryCounter() as counter:
+        start: float = time.perf_counter()
+        yield result
+        result.wall_time = time.perf_counter() - start
+    result.queries = counter.count
+    result.peak_memory = tracemalloc.get_traced_memory()[1]
+    if not tracemalloc_was_tracing:
+        tracemalloc.stop()
+
+    with open(config.results_file, "a") as file:
+        file.write(result.model_dump_json() + "\n")
+    print(
+        f"{job}: {result.runs} runs, {result.queries} queries, {result.wall_time:.3f}s, "
+        f"{result.peak_memory / 1024 / 1024:.1f} MiB peak"
+    )
+
+
+def _current_commit() -> str:
+    """
+    Returns the commit the benchmark runs on, so results of different commits can be compared.
+    """
+    if "CI_COMMIT_SHA" in os.environ:
+        return os.environ["CI_COMMIT_SHA"]
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
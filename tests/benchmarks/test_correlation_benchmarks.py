@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from mmisp.db.models.correlation import CorrelationExclusions
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.clean_excluded_correlations_job import clean_excluded_correlations_job
+from mmisp.worker.jobs.correlation.correlation_job import correlation_job
+from mmisp.worker.jobs.correlation.exclusion_index import bump_exclusion_version
+from mmisp.worker.jobs.correlation.job_data import CorrelationJobData
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.jobs.correlation.rebuild_correlations_job import rebuild_correlations_job
+from mmisp.worker.jobs.correlation.regenerate_occurrences_job import regenerate_occurrences_job
+from mmisp.worker.jobs.correlation.top_correlations_job import top_correlations_job
+
+from .measurement import measure, zipf_values
+
+
+@pytest.mark.asyncio
+async def test_benchmark_correlation_job(user, benchmark_attributes, benchmark_config):
+    rng = random.Random(benchmark_config.seed)
+    attribute_ids: list[int] = rng.sample(
+        benchmark_attributes, min(benchmark_config.correlated_attributes, len(benchmark_attributes))
+    )
+    async with queue:
+        async with measure("correlation_job", benchmark_config) as result:
+            for attribute_id in attribute_ids:
+                response = await correlation_job.run(
+                    UserData(user_id=user.id), CorrelationJobData(attribute_id=attribute_id)
+                )
+                assert response.success
+            result.runs = len(attribute_ids)
+
+
+@pytest.mark.asyncio
+async def test_benchmark_regenerate_occurrences_job(user, benchmark_attributes, benchmark_config):
+    async with queue:
+        await rebuild_correlations_job.run(UserData(user_id=user.id))
+        async with measure("regenerate_occurrences_job", benchmark_config):
+            response = await regenerate_occurrences_job.run(UserData(user_id=user.id))
+    assert response.success
+
+
+@pytest.mark.asyncio
+async def test_benchmark_top_correlations_job(user, benchmark_attributes, benchmark_config):
+    async with queue:
+        await rebuild_correlations_job.run(UserData(user_id=user.id))
+        async with measure("top_correlations_job", benchmark_config):
+            response = await top_correlations_job.run(UserData(user_id=user.id))
+    assert response.success
+
+
+@pytest.mark.asyncio
+async def test_benchmark_clean_excluded_correlations_job(db, user, benchmark_attributes, benchmark_config):
+    excluded: list[CorrelationExclusions] = [
+        CorrelationExclusions(value=f"benchmark-value-{rank}")
+        for rank in range(0, benchmark_config.distinct_values, 10)
+    ]
+    async with queue:
+        await rebuild_correlations_job.run(UserData(user_id=user.id))
+        db.add_all(excluded)
+        await db.commit()
+        await bump_exclusion_version(queue.redis)
+        async with measure("clean_excluded_correlations_job", benchmark_config):
+            response = await clean_excluded_correlations_job.run(UserData(user_id=user.id))
+    assert response.success
+
+
+def test_zipf_values_are_reproducible():
+    first = zipf_values(1000, 100, 1.1, random.Random(1))
+    second = zipf_values(1000, 100, 1.1, random.Random(1))
+    assert first == second
+    # the most frequent value is drawn far more often than the least frequent one
+    assert first.count("benchmark-value-0") > 10 * first.count("benchmark-value-99")
+
+
+@pytest.mark.asyncio
+async def test_benchmark_rebuild_correlations_job(user, benchmark_attributes, benchmark_config):
+    async with queue:
+        async with measure("rebuild_correlations_job", benchmark_config):
+            response = await rebuild_correlations_job.run(UserData(user_id=user.id))
+    assert response.success
@@ -1,10 +1,13 @@
 import pytest
 
 from mmisp.db.models.correlation import CorrelationExclusions
+from mmisp.util.uuid import uuid
 from mmisp.worker.api.requests_schemas import UserData
 from mmisp.worker.jobs.correlation.clean_excluded_correlations_job import clean_excluded_correlations_job
+from mmisp.worker.jobs.correlation.exclusion_index import bump_exclusion_version
 from mmisp.worker.jobs.correlation.job_data import DatabaseChangedResponse
 from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.misp_database.misp_sql import add_correlation_value, get_correlation_value_id
 
 
 @pytest.mark.asyncio
@@ -22,3 +25,23 @@ async def test_run(db, correlating_value, user):
 
     await db.delete(exclusion)
     await db.commit()
+    await bump_exclusion_version(queue.redis)
+
+
+@pytest.mark.asyncio
+async def test_run_wildcard_exclusion(db, user):
+    value: str = f"clean-wildcard-{uuid()}"
+    await add_correlation_value(db, value)
+    exclusion: CorrelationExclusions = CorrelationExclusions(value="clean-wildcard-%", comment="Test")
+    db.add(exclusion)
+    await db.commit()
+
+    async with queue:
+        result: DatabaseChangedResponse = await clean_excluded_correlations_job.run(UserData(user_id=user.id))
+    assert result.success
+    assert result.database_changed
+    assert await get_correlation_value_id(db, value) is None
+
+    await db.delete(exclusion)
+    await db.commit()
+    await bump_exclusion_version(queue.redis)
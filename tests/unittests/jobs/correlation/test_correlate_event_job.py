@@ -0,0 +1,27 @@
+from uuid import UUID
+
+import pytest
+
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlate_event_job import correlate_event_job
+from mmisp.worker.jobs.correlation.job_data import CorrelateEventData, CorrelateEventResponse
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.misp_database.misp_sql import delete_correlations, get_number_of_correlations
+
+from .fixtures import CORRELATION_VALUE
+
+
+@pytest.mark.asyncio
+async def test_correlate_event(db, user, correlation_test_event, correlation_test_event_2):
+    async with queue:
+        result: CorrelateEventResponse = await correlate_event_job.run(
+            UserData(user_id=user.id), CorrelateEventData(event_id=correlation_test_event.id)
+        )
+    assert result.success
+    assert result.found_correlations
+    assert result.correlated_values == 1
+    assert result.events == {UUID(correlation_test_event.uuid), UUID(correlation_test_event_2.uuid)}
+    # two attributes in each event, attributes of the same event don't correlate
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+    await delete_correlations(db, CORRELATION_VALUE)
@@ -4,7 +4,25 @@ from mmisp.db.models.attribute import Attribute
 from mmisp.tests.generators.model_generators.attribute_generator import generate_text_attribute
 from mmisp.worker.api.requests_schemas import UserData
 from mmisp.worker.jobs.correlation.correlation_job import correlation_job
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold
+from mmisp.worker.jobs.correlation.exclusion_index import bump_exclusion_version
 from mmisp.worker.jobs.correlation.job_data import CorrelationJobData, CorrelationResponse
+from mmisp.worker.jobs.correlation.occurrence_counters import (
+    COUNTED_KEY,
+    get_occurrences,
+    invalidate_occurrences,
+    mark_dirty,
+    reconcile_over_correlating_values,
+    set_occurrences,
+)
+from mmisp.worker.jobs.correlation.plugins import ip_range, simple_value
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.jobs.correlation.value_lock import claim_value, release_claim
+from mmisp.worker.misp_database.misp_sql import (
+    delete_over_correlating_value,
+    get_number_of_attributes_with_same_value,
+    is_over_correlating_value,
+)
 
 user: UserData = UserData(user_id=66)
 
@@ -14,6 +32,8 @@ async def test_excluded_value(db, attribute, correlation_exclusion):
     value = correlation_exclusion.value
     attribute.value = value
     await db.commit()
+    # the exclusion fixture doesn't increase the version stamp like other writers of exclusions do
+    await bump_exclusion_version(queue.redis)
 
     test_data: CorrelationJobData = CorrelationJobData(attribute_id=attribute.id)
     result: CorrelationResponse = await correlation_job.run(user, test_data)
@@ -31,8 +51,7 @@ async def test_over_correlating_value(db, event, attribute):
     attribute.value = value
     await db.commit()
 
-    # TODO: Adapt when correlation_threshold is readable/changable.
-    correlation_threshold: int = 20
+    correlation_threshold: int = await get_correlation_threshold(queue.redis)
     attributes: list[Attribute] = []
     for i in range(correlation_threshold + 2):
         attribute: Attribute = generate_text_attribute(event.id, value)
@@ -67,3 +86,64 @@ async def test_not_found_correlations(attribute, db):
     assert not result.is_excluded_value
     assert not result.is_over_correlating_value
     assert result.events is None
+
+
+@pytest.mark.asyncio
+async def test_coalesced_value(attribute):
+    assert await claim_value(queue.redis, simple_value.NAME, attribute.value)
+    try:
+        test_data: CorrelationJobData = CorrelationJobData(attribute_id=attribute.id)
+        result: CorrelationResponse = await correlation_job.run(user, test_data)
+    finally:
+        await release_claim(queue.redis, simple_value.NAME, attribute.value)
+
+    assert result.success
+    assert result.coalesced
+    assert not result.found_correlations
+
+
+@pytest.mark.asyncio
+async def test_other_plugin_not_coalesced(attribute):
+    assert await claim_value(queue.redis, simple_value.NAME, attribute.value)
+    try:
+        test_data: CorrelationJobData = CorrelationJobData(
+            attribute_id=attribute.id, correlation_plugin_name=ip_range.NAME
+        )
+        result: CorrelationResponse = await correlation_job.run(user, test_data)
+    finally:
+        await release_claim(queue.redis, simple_value.NAME, attribute.value)
+
+    assert result.success
+    assert not result.coalesced
+
+
+@pytest.mark.asyncio
+async def test_over_correlating_counter(db, attribute):
+    await set_occurrences(queue.redis, {attribute.value: 100})
+    try:
+        test_data: CorrelationJobData = CorrelationJobData(attribute_id=attribute.id, new_attribute=True)
+        result: CorrelationResponse = await correlation_job.run(user, test_data)
+        assert result.success
+        assert result.is_over_correlating_value
+        assert (await get_occurrences(queue.redis, [attribute.value]))[attribute.value] == 101
+
+        await correlation_job.run(user, test_data)
+        await correlation_job.run(user, CorrelationJobData(attribute_id=attribute.id))
+        assert (await get_occurrences(queue.redis, [attribute.value]))[attribute.value] == 101
+    finally:
+        await queue.redis.delete(f"{COUNTED_KEY}:{attribute.id}")
+        await invalidate_occurrences(queue.redis, [attribute.value])
+        await delete_over_correlating_value(db, attribute.value)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_drifted_counter(db, attribute):
+    count: int = await get_number_of_attributes_with_same_value(db, attribute.value)
+    await set_occurrences(queue.redis, {attribute.value: 100})
+    await mark_dirty(queue.redis, [attribute.value])
+    try:
+        assert await reconcile_over_correlating_values(db, queue.redis, count) == 0
+        assert not await is_over_correlating_value(db, attribute.value)
+        assert (await get_occurrences(queue.redis, [attribute.value]))[attribute.value] == count
+    finally:
+        await invalidate_occurrences(queue.redis, [attribute.value])
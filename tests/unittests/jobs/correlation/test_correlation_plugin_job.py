@@ -1,9 +1,18 @@
 import pytest
+from sqlalchemy import select
 
+from mmisp.db.models.attribute import Attribute
+from mmisp.plugins import factory
 from mmisp.plugins.exceptions import PluginNotFound
+from mmisp.plugins.types import PluginType
 from mmisp.worker.api.requests_schemas import UserData
-from mmisp.worker.jobs.correlation.correlation_job import correlation_job
-from mmisp.worker.jobs.correlation.job_data import CorrelationJobData
+from mmisp.worker.jobs.correlation.correlation_job import correlate_attributes, correlation_job
+from mmisp.worker.jobs.correlation.job_data import CorrelationJobData, CorrelationResponse
+from mmisp.worker.jobs.correlation.plugins import simple_value
+from mmisp.worker.jobs.correlation.plugins.protocols import BatchCorrelationPlugin
+from mmisp.worker.misp_database.misp_sql import delete_correlations, get_number_of_correlations
+
+from .fixtures import CORRELATION_VALUE
 
 
 @pytest.mark.asyncio
@@ -12,3 +21,21 @@ async def test_not_registered(attribute):
     data: CorrelationJobData = CorrelationJobData(correlation_plugin_name="NotRegistered", attribute_id=attribute.id)
     with pytest.raises(PluginNotFound):
         await correlation_job.run(user, data)
+
+
+def test_exact_value_plugin_supports_batches():
+    plugin = factory.get_plugin(PluginType.CORRELATION, simple_value.NAME)
+    assert isinstance(plugin, BatchCorrelationPlugin)
+
+
+@pytest.mark.asyncio
+async def test_correlate_attributes_batch(db, correlation_test_event, correlation_test_event_2):
+    statement = select(Attribute).where(Attribute.event_id == correlation_test_event.id)
+    attributes: list[Attribute] = list((await db.execute(statement)).scalars().all())
+
+    responses: list[CorrelationResponse] = await correlate_attributes(db, simple_value.NAME, attributes, 20)
+    assert len(responses) == len(attributes)
+    assert all(response.found_correlations for response in responses)
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+    await delete_correlations(db, CORRELATION_VALUE)
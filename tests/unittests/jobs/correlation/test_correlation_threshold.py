@@ -0,0 +1,14 @@
+import pytest
+
+from mmisp.worker.jobs.correlation.correlation_threshold import get_correlation_threshold, set_correlation_threshold
+from mmisp.worker.jobs.correlation.queue import queue
+
+
+@pytest.mark.asyncio
+async def test_set_correlation_threshold():
+    old_threshold: int = await get_correlation_threshold(queue.redis)
+    try:
+        await set_correlation_threshold(queue.redis, old_threshold + 5)
+        assert await get_correlation_threshold(queue.redis) == old_threshold + 5
+    finally:
+        await set_correlation_threshold(queue.redis, old_threshold)
@@ -0,0 +1,23 @@
+import pytest
+
+from mmisp.worker.jobs.correlation.exclusion_index import ExclusionMatcher
+
+
+@pytest.fixture
+def matcher() -> ExclusionMatcher:
+    return ExclusionMatcher(["exact", "evil%", "%.local", "%middle%", "start%end", "10.0.0.0/8", "2001:db8::/32"])
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["exact", "evilcorp", "host.local", "in the middle of", "start and end", "10.1.2.3", "10.0.0.0/16", "2001:db8::1"],
+)
+def test_is_excluded(matcher: ExclusionMatcher, value: str):
+    assert matcher.is_excluded(value)
+
+
+@pytest.mark.parametrize(
+    "value", ["exac", "not evil", "local", "mid", "start and end!", "11.0.0.1", "10.0.0.0/7", "2001:db9::1", ""]
+)
+def test_is_not_excluded(matcher: ExclusionMatcher, value: str):
+    assert not matcher.is_excluded(value)
@@ -0,0 +1,85 @@
+import pytest
+
+from mmisp.worker.jobs.correlation.plugins.fuzzy_hash import (
+    FuzzyHashIndex,
+    is_similar,
+    parse_fuzzy_hash,
+    parse_ssdeep,
+    parse_tlsh,
+    ssdeep_score,
+    tlsh_distance,
+)
+
+SSDEEP_HASH: str = "96:s4Ud1Lj96tHHlZDrwciQmA+4uy1I0G4HYuL8N3TzS8QsO/wqWXLcMSx:sF1C6GVDs5A+4uy1I0G4HYuL8N3TzS8Qs"
+SIMILAR_SSDEEP_HASH: str = (
+    "96:s4Ud1Lj96tHHlZDrwciQmA+4uy1I0X4HYuL8N3TzS8QsO/wqWXLcMSy:sF1C6GVDs5A+4uy1I0G4HYuL8N3TzS8Qz"
+)
+OTHER_SSDEEP_HASH: str = "3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C"
+TLSH_HASH: str = "T1" + "a5" * 3 + "00" * 32
+SIMILAR_TLSH_HASH: str = "T1" + "a5" * 3 + "00" * 31 + "01"
+OTHER_TLSH_HASH: str = "T1" + "a5" * 3 + "ff" * 32
+# one differing quartile in every fourth byte of the body
+SPREAD_TLSH_HASH: str = "T1" + "a5" * 3 + "01000000" * 8
+# the length value is swapped in the hex representation like the other header bytes, 0x5a becomes 0x5b
+LONGER_TLSH_HASH: str = "T1" + "a5b5a5" + "00" * 31 + "01"
+
+
+def test_ssdeep_score():
+    assert ssdeep_score(parse_ssdeep(SSDEEP_HASH), parse_ssdeep(SSDEEP_HASH)) == 100
+    assert ssdeep_score(parse_ssdeep(SSDEEP_HASH), parse_ssdeep(SIMILAR_SSDEEP_HASH)) > 90
+    assert ssdeep_score(parse_ssdeep(SSDEEP_HASH), parse_ssdeep(OTHER_SSDEEP_HASH)) == 0
+
+
+def test_tlsh_distance():
+    assert tlsh_distance(parse_tlsh(TLSH_HASH), parse_tlsh(TLSH_HASH)) == 0
+    assert tlsh_distance(parse_tlsh(TLSH_HASH), parse_tlsh(SIMILAR_TLSH_HASH)) == 1
+    assert not is_similar(parse_tlsh(TLSH_HASH), parse_tlsh(OTHER_TLSH_HASH))
+
+
+def test_parse_fuzzy_hash():
+    assert parse_fuzzy_hash("filename|ssdeep", "file.exe", SSDEEP_HASH) == parse_ssdeep(SSDEEP_HASH)
+    assert parse_fuzzy_hash("tlsh", TLSH_HASH, "") == parse_tlsh(TLSH_HASH)
+    assert parse_fuzzy_hash("md5", SSDEEP_HASH, "") is None
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (SSDEEP_HASH, True),
+        (OTHER_SSDEEP_HASH, True),
+        ("12:34:56", False),
+        ("8080:tcp:http", False),
+        ("2001:db8:1", False),
+        ("1::", False),
+        ("3::", False),
+        ("03:ab:cd", False),
+    ],
+)
+def test_parse_ssdeep_shape(value: str, expected: bool):
+    assert (parse_ssdeep(value) is not None) == expected
+
+
+def test_index_candidates():
+    index = FuzzyHashIndex()
+    index.add(1, parse_ssdeep(SSDEEP_HASH))
+    index.add(2, parse_ssdeep(OTHER_SSDEEP_HASH))
+    index.add(3, parse_tlsh(TLSH_HASH))
+
+    assert index.candidates(parse_ssdeep(SIMILAR_SSDEEP_HASH)) == {1}
+    assert index.candidates(parse_tlsh(SIMILAR_TLSH_HASH)) == {3}
+
+
+def test_index_candidates_spread_differences():
+    assert tlsh_distance(parse_tlsh(TLSH_HASH), parse_tlsh(SPREAD_TLSH_HASH)) == 8
+    index = FuzzyHashIndex()
+    index.add(1, parse_tlsh(TLSH_HASH))
+
+    assert index.candidates(parse_tlsh(SPREAD_TLSH_HASH)) == {1}
+
+
+def test_index_candidates_length_difference():
+    assert tlsh_distance(parse_tlsh(TLSH_HASH), parse_tlsh(LONGER_TLSH_HASH)) == 2
+    index = FuzzyHashIndex()
+    index.add(1, parse_tlsh(TLSH_HASH))
+
+    assert index.candidates(parse_tlsh(LONGER_TLSH_HASH)) == {1}
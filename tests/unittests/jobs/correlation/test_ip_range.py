@@ -0,0 +1,67 @@
+import ipaddress
+
+import pytest
+
+from mmisp.worker.jobs.correlation.plugins.ip_range import IPRangeIndex, is_range_value, parse_network
+
+
+@pytest.fixture
+def index() -> IPRangeIndex:
+    index = IPRangeIndex()
+    for attribute_id, value in enumerate(
+        ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.3", "10.2.0.1", "192.168.0.1", "2001:db8::/32", "2001:db8::1"], start=1
+    ):
+        network = parse_network(value)
+        assert network is not None
+        index.add(attribute_id, network)
+    return index
+
+
+def test_address_in_ranges(index: IPRangeIndex):
+    result = index.overlapping(ipaddress.ip_network("10.1.2.3"))
+    assert result == {
+        1: ipaddress.ip_network("10.0.0.0/8"),
+        2: ipaddress.ip_network("10.1.0.0/16"),
+        3: ipaddress.ip_network("10.1.2.3/32"),
+    }
+
+
+def test_range_contains_addresses(index: IPRangeIndex):
+    result = index.overlapping(ipaddress.ip_network("10.1.0.0/16"))
+    assert result == {
+        1: ipaddress.ip_network("10.0.0.0/8"),
+        2: ipaddress.ip_network("10.1.0.0/16"),
+        3: ipaddress.ip_network("10.1.0.0/16"),
+    }
+
+
+def test_ipv6(index: IPRangeIndex):
+    assert set(index.overlapping(ipaddress.ip_network("2001:db8::/32"))) == {6, 7}
+    assert index.overlapping(ipaddress.ip_network("10.0.0.0/8")).keys().isdisjoint({6, 7})
+
+
+def test_no_overlap(index: IPRangeIndex):
+    assert index.overlapping(ipaddress.ip_network("172.16.0.0/12")) == {}
+
+
+def test_changed_and_removed_attributes(index: IPRangeIndex):
+    index.set_networks([(3, parse_network("172.16.0.1")), (2, None)])
+
+    assert index.overlapping(ipaddress.ip_network("10.1.0.0/16")) == {1: ipaddress.ip_network("10.0.0.0/8")}
+    assert index.overlapping(ipaddress.ip_network("172.16.0.0/12")) == {3: ipaddress.ip_network("172.16.0.0/12")}
+
+
+def test_compaction_keeps_current_ranges(index: IPRangeIndex):
+    index.set_networks([(attribute_id, None) for attribute_id in range(1, 6)])
+
+    assert index.overlapping(ipaddress.ip_network("10.0.0.0/8")) == {}
+    assert set(index.overlapping(ipaddress.ip_network("2001:db8::/32"))) == {6, 7}
+
+
+@pytest.mark.parametrize("value, expected", [("10.0.0.0/8", True), ("10.0.0.1/32", False), ("10.0.0.1", False)])
+def test_is_range_value(value: str, expected: bool):
+    assert is_range_value(value) == expected
+
+
+def test_parse_invalid():
+    assert parse_network("example.com") is None
@@ -0,0 +1,120 @@
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, insert, select
+
+from mmisp.db.models.attribute import Attribute
+from mmisp.db.models.correlation import CorrelationValue, DefaultCorrelation, OverCorrelatingValue
+from mmisp.tests.generators.model_generators.attribute_generator import generate_text_attribute
+from mmisp.util.uuid import uuid
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.job_data import RebuildCorrelationsResponse
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.jobs.correlation.rebuild_correlations_job import get_rebuild_progress, rebuild_correlations_job
+from mmisp.worker.misp_database import misp_sql
+from mmisp.worker.misp_database.misp_sql import (
+    get_number_of_correlations,
+    stream_correlation_attribute_groups,
+    value_collation_key,
+)
+
+from .fixtures import CORRELATION_VALUE
+
+
+@pytest_asyncio.fixture
+async def correlation_tables(db):
+    """
+    Restores the correlation tables of the shared test database, the rebuild job replaces all correlations.
+    """
+    correlations = (await db.execute(select(DefaultCorrelation.__table__))).mappings().all()
+    over_correlating = (await db.execute(select(OverCorrelatingValue.__table__))).mappings().all()
+    value_ids: list[int] = list((await db.execute(select(CorrelationValue.id))).scalars().all())
+    yield
+
+    await db.execute(delete(DefaultCorrelation))
+    await db.execute(delete(OverCorrelatingValue))
+    await db.execute(delete(CorrelationValue).where(CorrelationValue.id.not_in(value_ids)))
+    if correlations:
+        await db.execute(insert(DefaultCorrelation.__table__), [dict(row) for row in correlations])
+    if over_correlating:
+        await db.execute(insert(OverCorrelatingValue.__table__), [dict(row) for row in over_correlating])
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_rebuild_correlations(db, user, correlation_tables, correlation_test_event, correlation_test_event_2):
+    async with queue:
+        result: RebuildCorrelationsResponse = await rebuild_correlations_job.run(UserData(user_id=user.id))
+        progress = await get_rebuild_progress(queue.redis)
+
+    assert result.success
+    assert result.database_changed
+    assert result.progress.finished
+    assert result.progress.processed_attributes >= 4
+    assert progress == result.progress
+    # two attributes in each event, attributes of the same event don't correlate
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_correlations_on_failure(
+    db, user, correlation_tables, correlation_test_event, correlation_test_event_2
+):
+    async with queue:
+        await rebuild_correlations_job.run(UserData(user_id=user.id))
+        with patch.object(misp_sql, "add_correlations", side_effect=RuntimeError("write failed")):
+            with pytest.raises(RuntimeError):
+                await rebuild_correlations_job.run(UserData(user_id=user.id))
+
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+
+@pytest.mark.asyncio
+async def test_rebuild_case_variants(db, user, correlation_tables, event, event2):
+    value: str = "rebuild-" + uuid()
+    values: list[str] = [value, value.upper(), value + " "]
+    attributes: list[Attribute] = [
+        generate_text_attribute(group_event.id, group_value)
+        for group_value in values
+        for group_event in (event, event2)
+    ]
+    db.add_all(attributes)
+    await db.commit()
+    try:
+        async with queue:
+            result: RebuildCorrelationsResponse = await rebuild_correlations_job.run(UserData(user_id=user.id))
+        assert result.success
+        assert result.progress.finished
+        for group_value in values:
+            assert await get_number_of_correlations(db, group_value, False) > 0
+    finally:
+        for attribute in attributes:
+            await db.delete(attribute)
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_stream_groups_by_collation_key(db, event, event2):
+    value: str = "rebuild-" + uuid()
+    values: list[str] = [value, value.upper(), value + " "]
+    attributes: list[Attribute] = [
+        generate_text_attribute(group_event.id, group_value)
+        for group_value in values
+        for group_event in (event, event2)
+    ]
+    db.add_all(attributes)
+    await db.commit()
+    try:
+        groups: list[tuple[str, int]] = [
+            (group_value, count)
+            async for group_value, count, _ in stream_correlation_attribute_groups(db, 2, 10)
+            if value_collation_key(group_value) == value_collation_key(value)
+        ]
+        # every value belongs to exactly one group
+        assert sum(count for _, count in groups) == len(attributes)
+        assert {group_value for group_value, _ in groups} <= set(values)
+    finally:
+        for attribute in attributes:
+            await db.delete(attribute)
+        await db.commit()
@@ -1,8 +1,14 @@
+from unittest.mock import patch
+
 import pytest
 
 from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
 from mmisp.worker.jobs.correlation.job_data import DatabaseChangedResponse
 from mmisp.worker.jobs.correlation.regenerate_occurrences_job import regenerate_occurrences_job
+from mmisp.worker.misp_database.misp_sql import add_correlation_value, delete_correlations, get_number_of_correlations
+
+from .fixtures import CORRELATION_VALUE
 
 
 @pytest.mark.asyncio
@@ -15,3 +21,30 @@ async def test_regenerate_occurrences_job(user, correlating_value):
 
 
 #    assert result.database_changed
+
+
+@pytest.mark.asyncio
+async def test_regenerate_missing_correlations(db, user, correlation_test_event, correlation_test_event_2):
+    await add_correlation_value(db, CORRELATION_VALUE)
+
+    result: DatabaseChangedResponse = await regenerate_occurrences_job.run(UserData(user_id=user.id))
+    assert result.success
+    assert result.database_changed
+    # two attributes in each event, attributes of the same event don't correlate
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+    await delete_correlations(db, CORRELATION_VALUE)
+
+
+@pytest.mark.asyncio
+async def test_regenerate_shards_without_free_worker(db, user, correlation_test_event, correlation_test_event_2):
+    await add_correlation_value(db, CORRELATION_VALUE)
+
+    # no worker runs the shard jobs, the regeneration job has to run all shards itself
+    with patch.object(correlation_config_data, "regeneration_shards", 3):
+        result: DatabaseChangedResponse = await regenerate_occurrences_job.run(UserData(user_id=user.id))
+    assert result.success
+    assert result.database_changed
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+    await delete_correlations(db, CORRELATION_VALUE)
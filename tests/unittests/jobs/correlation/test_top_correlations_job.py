@@ -1,7 +1,7 @@
 import pytest
 
 from mmisp.worker.api.requests_schemas import UserData
-from mmisp.worker.jobs.correlation.job_data import TopCorrelationsResponse
+from mmisp.worker.jobs.correlation.job_data import TopCorrelationsData, TopCorrelationsResponse
 from mmisp.worker.jobs.correlation.top_correlations_job import top_correlations_job
 
 
@@ -13,3 +13,12 @@ async def test_run():
     correct_sorted: bool = all(top_list[i][1] >= top_list[i + 1][1] for i in range(len(top_list) - 1))
     assert result.success
     assert correct_sorted
+
+
+@pytest.mark.asyncio
+async def test_run_paginated():
+    user: UserData = UserData(user_id=66)
+    full: TopCorrelationsResponse = await top_correlations_job.run(user)
+    page: TopCorrelationsResponse = await top_correlations_job.run(user, TopCorrelationsData(limit=1, offset=1))
+    assert page.success
+    assert page.top_correlations == full.top_correlations[1:2]
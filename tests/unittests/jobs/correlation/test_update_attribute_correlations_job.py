@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import select
+
+from mmisp.db.models.attribute import Attribute
+from mmisp.worker.api.requests_schemas import UserData
+from mmisp.worker.jobs.correlation.correlate_event_job import correlate_event_job
+from mmisp.worker.jobs.correlation.job_data import AttributeChangeData, CorrelateEventData, DatabaseChangedResponse
+from mmisp.worker.jobs.correlation.occurrence_counters import get_occurrences, invalidate_occurrences, set_occurrences
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.jobs.correlation.update_attribute_correlations_job import update_attribute_correlations_job
+from mmisp.worker.misp_database.misp_sql import delete_correlations, get_number_of_correlations
+
+from .fixtures import CORRELATION_VALUE
+
+
+@pytest.mark.asyncio
+async def test_disable_correlation(db, user, correlation_test_event, correlation_test_event_2):
+    user_data: UserData = UserData(user_id=user.id)
+    async with queue:
+        await correlate_event_job.run(user_data, CorrelateEventData(event_id=correlation_test_event.id))
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 4
+
+    statement = select(Attribute).where(Attribute.event_id == correlation_test_event.id)
+    attribute: Attribute = (await db.execute(statement)).scalars().first()
+    attribute.disable_correlation = True
+    await db.commit()
+
+    async with queue:
+        result: DatabaseChangedResponse = await update_attribute_correlations_job.run(
+            user_data, AttributeChangeData(attribute_id=attribute.id)
+        )
+    assert result.success
+    assert result.database_changed
+    # the remaining attribute of the first event correlates with both attributes of the second event
+    assert await get_number_of_correlations(db, CORRELATION_VALUE, False) == 2
+
+    await delete_correlations(db, CORRELATION_VALUE)
+
+
+@pytest.mark.asyncio
+async def test_rerun_does_not_drift_counter(db, user, attribute):
+    user_data: UserData = UserData(user_id=user.id)
+    old_value: str = "old-" + attribute.value
+    await set_occurrences(queue.redis, {old_value: 5, attribute.value: 5})
+    try:
+        change: AttributeChangeData = AttributeChangeData(attribute_id=attribute.id, old_value=old_value)
+        async with queue:
+            await update_attribute_correlations_job.run(user_data, change)
+            await update_attribute_correlations_job.run(user_data, change)
+        # both counters are counted in the database again instead of being decreased once per run
+        assert await get_occurrences(queue.redis, [old_value, attribute.value]) == {}
+    finally:
+        await invalidate_occurrences(queue.redis, [old_value, attribute.value])
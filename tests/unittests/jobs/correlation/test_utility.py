@@ -0,0 +1,14 @@
+from mmisp.db.models.correlation import DefaultCorrelation
+from mmisp.worker.jobs.correlation.utility import create_correlations
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
+
+
+def __get_attribute(attribute_id: int, event_id: int) -> MispCorrelationAttribute:
+    return MispCorrelationAttribute(attribute_id, event_id, 0, 0, 0, f"uuid-{event_id}", 1, 0, 0, 0, 0)
+
+
+def test_create_correlations_canonical_order():
+    attributes: list[MispCorrelationAttribute] = [__get_attribute(9, 1), __get_attribute(3, 2), __get_attribute(5, 1)]
+    correlations: list[DefaultCorrelation] = create_correlations(attributes, 1)
+
+    assert {(correlation.attribute_id, correlation.attribute_id_1) for correlation in correlations} == {(3, 5), (3, 9)}
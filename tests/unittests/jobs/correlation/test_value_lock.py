@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+from mmisp.worker.jobs.correlation.correlation_config_data import correlation_config_data
+from mmisp.worker.jobs.correlation.queue import queue
+from mmisp.worker.jobs.correlation.value_lock import LOCK_KEY, value_digest, value_lock
+
+
+@pytest.mark.asyncio
+async def test_lock_is_extended_while_held(monkeypatch):
+    monkeypatch.setattr(correlation_config_data, "value_lock_timeout", 1)
+    key: str = f"{LOCK_KEY}:test:{value_digest('extended')}"
+    async with value_lock(queue.redis, "test", "extended"):
+        await asyncio.sleep(1.5)
+        assert await queue.redis.exists(key)
+    assert not await queue.redis.exists(key)
+
+
+@pytest.mark.asyncio
+async def test_expired_lock_is_not_raised():
+    key: str = f"{LOCK_KEY}:test:{value_digest('expired')}"
+    async with value_lock(queue.redis, "test", "expired"):
+        await queue.redis.delete(key)
+        # another worker takes the expired lock
+        await queue.redis.set(key, "other")
+    assert await queue.redis.get(key) == b"other"
+    await queue.redis.delete(key)
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from mmisp.worker.jobs.sync.pull import pull_job
+from mmisp.worker.jobs.sync.pull.job_data import PullEventResult
+
+
+class SlowMispAPI:
+    """
+    Fake MISP API whose saves take a while and that records how many of them overlap.
+    """
+
+    def __init__(self) -> None:
+        self.organisation_lookups: int = 0
+        self.saving: int = 0
+        self.max_saving: int = 0
+
+    async def get_event(self, event_id: int, server: SimpleNamespace) -> SimpleNamespace:
+        return SimpleNamespace(id=event_id, uuid=f"event-{event_id}", orgc_id=1)
+
+    async def get_organisation(
+        self, organisation_id: int | str, server: SimpleNamespace | None = None
+    ) -> SimpleNamespace:
+        if server is None:
+            self.organisation_lookups += 1
+            await asyncio.sleep(0.01)
+        return SimpleNamespace(id=1, uuid="creator-org", name="Creator")
+
+    async def save_event(self, event: SimpleNamespace) -> bool:
+        self.saving += 1
+        self.max_saving = max(self.max_saving, self.saving)
+        await asyncio.sleep(0.05)
+        self.saving -= 1
+        return True
+
+
+@pytest.mark.asyncio
+async def test_events_of_same_org_are_saved_concurrently():
+    misp_api = SlowMispAPI()
+    remote_server = SimpleNamespace(id=1, name="remote")
+    local_orgs: dict = {}
+
+    with (
+        patch.object(pull_job, "event_id_exists", AsyncMock(return_value=False)),
+        patch.object(pull_job, "_update_pulled_event_before_insert", AsyncMock(side_effect=lambda event, *_: event)),
+    ):
+        results = await asyncio.gather(
+            *(pull_job.__pull_event(None, misp_api, event_id, remote_server, local_orgs) for event_id in (1, 2))
+        )
+
+    assert results == [PullEventResult.PULLED, PullEventResult.PULLED]
+    assert misp_api.max_saving == 2
+    assert misp_api.organisation_lookups == 1
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from mmisp.worker.jobs.sync.pull.pull_watermark import (
+    PULL_FAILURES_KEY,
+    clear_pull_failures,
+    count_pull_failures,
+    next_pull_watermark,
+)
+from mmisp.worker.jobs.sync.queue import queue
+from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
+
+OLD: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc)
+EVENTS: list[MispMinimalEvent] = [
+    MispMinimalEvent(id=1, timestamp=datetime(2024, 1, 2, tzinfo=timezone.utc)),
+    MispMinimalEvent(id=2, timestamp=datetime(2024, 1, 4, tzinfo=timezone.utc)),
+    MispMinimalEvent(id=3, timestamp=datetime(2024, 1, 3, tzinfo=timezone.utc)),
+]
+
+
+def test_watermark_advances_to_newest_event():
+    assert next_pull_watermark(EVENTS, set(), OLD) == datetime(2024, 1, 4, tzinfo=timezone.utc)
+
+
+def test_watermark_stops_at_oldest_retried_event():
+    assert next_pull_watermark(EVENTS, {2, 3}, OLD) == datetime(2024, 1, 3, tzinfo=timezone.utc)
+
+
+def test_watermark_unchanged_without_events():
+    assert next_pull_watermark([], set(), OLD) == OLD
+    assert next_pull_watermark([], set(), None) is None
+
+
+@pytest.mark.asyncio
+async def test_count_pull_failures():
+    server_id: int = -1
+    try:
+        assert await count_pull_failures(queue.redis, server_id, [1, 2]) == {1: 1, 2: 1}
+        assert await count_pull_failures(queue.redis, server_id, [1]) == {1: 2}
+        await clear_pull_failures(queue.redis, server_id, [1])
+        assert await count_pull_failures(queue.redis, server_id, [1]) == {1: 1}
+        assert await count_pull_failures(queue.redis, server_id, []) == {}
+    finally:
+        await queue.redis.delete(PULL_FAILURES_KEY.format(server_id=server_id))
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timezone
+from uuid import UUID
+
+import pytest
+
+from mmisp.util.uuid import uuid
+from mmisp.worker.jobs.sync.sync_config_data import SyncConfigData
+from mmisp.worker.jobs.sync.sync_helper import ServerConcurrencyLimits, _filter_old_events
+from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
+
+
+@pytest.mark.asyncio
+async def test_server_concurrency_limits():
+    limits = ServerConcurrencyLimits(SyncConfigData(SYNC_PULL_CONCURRENCY=3))
+
+    assert limits.get(1) is limits.get(1)
+    assert limits.get(1) is not limits.get(2)
+    assert limits.get(1)._value == 3
+
+
+def test_server_concurrency_limits_per_loop():
+    limits = ServerConcurrencyLimits(SyncConfigData(SYNC_PULL_CONCURRENCY=3))
+
+    async def get_limit() -> asyncio.Semaphore:
+        return limits.get(1)
+
+    assert asyncio.run(get_limit()) is not asyncio.run(get_limit())
+
+
+def test_filter_old_events():
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    new, newer_locked, newer_unlocked, older = (
+        MispMinimalEvent(id=event_id, timestamp=timestamp, uuid=uuid()) for event_id in range(4)
+    )
+    epoch = int(timestamp.timestamp())
+    local_event_timestamps = {
+        UUID(newer_locked.uuid): (epoch - 1, True),
+        UUID(newer_unlocked.uuid): (epoch - 1, False),
+        UUID(older.uuid): (epoch + 1, True),
+    }
+
+    assert _filter_old_events(local_event_timestamps, [new, newer_locked, newer_unlocked, older]) == [
+        new,
+        newer_locked,
+    ]
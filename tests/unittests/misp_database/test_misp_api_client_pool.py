@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from mmisp.worker.misp_database.misp_api_client_pool import MispAPIClientPool
+from mmisp.worker.misp_database.misp_api_config import MispAPIConfigData
+
+
+@pytest.mark.asyncio
+async def test_client_is_reused():
+    pool = MispAPIClientPool(MispAPIConfigData())
+
+    client = pool.get_client()
+    assert pool.get_client() is client
+
+    await pool.aclose()
+    assert client.is_closed
+    assert pool.get_client() is not client
+    await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http2_client():
+    pool = MispAPIClientPool(MispAPIConfigData(MISP_API_HTTP2=True))
+
+    assert pool.get_client() is not None
+    await pool.aclose()
+
+
+def test_replaced_client_is_closed():
+    pool = MispAPIClientPool(MispAPIConfigData())
+
+    async def get_client() -> httpx.AsyncClient:
+        return pool.get_client()
+
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever)
+    thread.start()
+    try:
+        old_client = asyncio.run_coroutine_threadsafe(get_client(), old_loop).result()
+
+        async def replace_client() -> None:
+            assert pool.get_client() is not old_client
+            await pool.aclose()
+
+        asyncio.run(replace_client())
+        # the old client is closed in its own loop
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.1), old_loop).result()
+        assert old_client.is_closed
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join()
+        old_loop.close()
@@ -1,3 +1,4 @@
+import asyncio
 import random
 import uuid as libuuid
 from typing import Any
@@ -19,6 +20,7 @@ from mmisp.tests.generators.model_generators.post_generator import generate_post
 from mmisp.util.uuid import uuid
 from mmisp.worker.misp_database.misp_sql import (
     add_correlation_value,
+    add_correlation_values,
     add_correlations,
     add_over_correlating_value,
     delete_correlations,
@@ -31,8 +33,14 @@ from mmisp.worker.misp_database.misp_sql import (
     get_api_authkey,
     get_attribute_tag_id,
     get_attributes_with_same_value,
+    get_correlation_attributes,
+    get_correlation_attributes_with_same_value,
+    get_correlation_value_id,
+    get_correlation_value_statistics,
     get_event_tag_id,
+    get_event_timestamps,
     get_excluded_correlations,
+    get_number_of_attributes_with_same_value,
     get_number_of_correlations,
     get_org_by_name,
     get_over_correlating_values,
@@ -42,6 +50,7 @@ from mmisp.worker.misp_database.misp_sql import (
     is_excluded_correlation,
     is_over_correlating_value,
 )
+from mmisp.worker.misp_dataclasses.misp_correlation_attribute import MispCorrelationAttribute
 from mmisp.worker.misp_dataclasses.misp_minimal_event import MispMinimalEvent
 
 
@@ -172,6 +181,35 @@ async def test_get_attributes_with_same_value(db):
         assert "test" == attribute.value1
 
 
+@pytest.mark.asyncio
+async def test_get_number_of_attributes_with_same_value(db):
+    attributes: list[Attribute] = await get_attributes_with_same_value(db, "test")
+    assert await get_number_of_attributes_with_same_value(db, "test") == len(attributes)
+    assert await get_number_of_attributes_with_same_value(db, uuid()) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_correlation_attributes(db, event, attribute):
+    result: list[MispCorrelationAttribute] = await get_correlation_attributes(db, [attribute.id])
+    assert len(result) == 1
+    assert result[0].id == attribute.id
+    assert result[0].event_id == event.id
+    assert result[0].event_uuid == event.uuid
+    assert result[0].event_org_id == event.org_id
+    assert result[0].object_distribution == 0
+
+    same_value: list[MispCorrelationAttribute] = await get_correlation_attributes_with_same_value(db, attribute.value)
+    assert attribute.id in [row.id for row in same_value]
+    assert await get_correlation_attributes(db, []) == []
+
+
+@pytest.mark.asyncio
+async def test_get_event_timestamps(db, event):
+    result: dict[libuuid.UUID, tuple[int, bool]] = await get_event_timestamps(db, [event.id])
+    assert result == {libuuid.UUID(event.uuid): (int(event.timestamp.timestamp()), bool(event.locked))}
+    assert await get_event_timestamps(db, []) == {}
+
+
 @pytest.mark.asyncio
 async def test_get_values_with_correlation(db, correlating_values):
     values: set[str] = {value.value for value in correlating_values}
@@ -181,6 +219,17 @@ async def test_get_values_with_correlation(db, correlating_values):
         assert value in values
 
 
+@pytest.mark.asyncio
+async def test_get_correlation_value_statistics_shards(db, correlating_values):
+    complete: list[tuple[str, int, int, int | None]] = await get_correlation_value_statistics(db)
+    assert {value.value for value in correlating_values} <= {row[0] for row in complete}
+
+    sharded: list[tuple[str, int, int, int | None]] = []
+    for shard in range(3):
+        sharded.extend(await get_correlation_value_statistics(db, shard, 3))
+    assert sorted(complete, key=lambda row: row[0]) == sorted(sharded, key=lambda row: row[0])
+
+
 @pytest.mark.asyncio
 async def test_get_over_correlating_values(db, over_correlating_values):
     result: list[tuple[str, int]] = await get_over_correlating_values(db)
@@ -302,6 +351,46 @@ async def test_add_correlation_value(db):
     await session.commit()
 
 
+@pytest.mark.asyncio
+async def test_get_correlation_value_id(db, correlating_value):
+    assert await get_correlation_value_id(db, correlating_value.value) == correlating_value.id
+    assert await get_correlation_value_id(db, uuid()) is None
+
+
+@pytest.mark.asyncio
+async def test_add_correlation_values_case_variants(db):
+    value: str = f"case-variant-{uuid()}"
+    existing_id: int = await add_correlation_value(db, value)
+    variants: list[str] = [value.upper(), f"{value} ", f"NEW-{value}", f"new-{value}"]
+
+    value_ids: dict[str, int] = await add_correlation_values(db, variants)
+    assert set(value_ids) == set(variants)
+    # every value is mapped to the entry the database considers equal to it
+    for variant in variants:
+        assert await get_correlation_value_id(db, variant) == value_ids[variant]
+    assert await add_correlation_values(db, [value]) == {value: existing_id}
+
+    await db.execute(delete(CorrelationValue).where(CorrelationValue.id.in_({existing_id, *value_ids.values()})))
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_add_correlations_concurrently(db, db_connection, correlating_value):
+    async def add() -> bool:
+        async with db_connection.session() as session:
+            correlation: DefaultCorrelation = __get_test_correlation()
+            correlation.value_id = correlating_value.id
+            return await add_correlations(session, [correlation])
+
+    # the second writer waits for the lock of the value and sees the pair of the first one
+    assert sorted(await asyncio.gather(add(), add())) == [False, True]
+    statement = select(DefaultCorrelation.id).where(DefaultCorrelation.value_id == correlating_value.id)
+    assert len((await db.execute(statement)).scalars().all()) == 1
+
+    await db.execute(delete(DefaultCorrelation).where(DefaultCorrelation.value_id == correlating_value.id))
+    await db.commit()
+
+
 @pytest.mark.asyncio
 async def test_add_correlations(db, correlating_value):
     not_adding: list[DefaultCorrelation] = [__get_test_correlation()]
@@ -316,6 +405,31 @@ async def test_add_correlations(db, correlating_value):
     await db.execute(statement)
 
 
+@pytest.mark.asyncio
+async def test_add_correlations_deduplicates(db, correlating_value):
+    correlation: DefaultCorrelation = __get_test_correlation()
+    correlation.value_id = correlating_value.id
+    duplicate: DefaultCorrelation = __get_test_correlation()
+    duplicate.value_id = correlating_value.id
+    assert await add_correlations(db, [correlation, duplicate])
+
+    reversed_correlation: DefaultCorrelation = __get_test_correlation()
+    reversed_correlation.value_id = correlating_value.id
+    reversed_correlation.attribute_id, reversed_correlation.attribute_id_1 = (
+        correlation.attribute_id_1,
+        correlation.attribute_id,
+    )
+    assert not await add_correlations(db, [reversed_correlation])
+    assert not await add_correlations(db, [])
+
+    statement = select(DefaultCorrelation.id).where(DefaultCorrelation.value_id == correlating_value.id)
+    assert len((await db.execute(statement)).scalars().all()) == 1
+
+    statement = delete(DefaultCorrelation).where(DefaultCorrelation.value_id == correlating_value.id)
+    await db.execute(statement)
+    await db.commit()
+
+
 @pytest.mark.asyncio
 async def test_add_over_correlating_value(db, over_correlating_value):
     occurrence: int = over_correlating_value.occurrence + 1
@@ -0,0 +1,26 @@
+import pytest
+
+from mmisp.worker.misp_database.server_authkey_cache import server_authkey_cache
+
+
+@pytest.mark.asyncio
+async def test_authkey_is_cached_until_invalidated(server, db):
+    original_key: str = server.authkey
+    server_authkey_cache.invalidate(server.id)
+    assert await server_authkey_cache.get(db, server.id) == original_key
+
+    server.authkey = "changedkey00000000000000000000000000000"
+    await db.commit()
+    assert await server_authkey_cache.get(db, server.id) == original_key
+
+    server_authkey_cache.invalidate(server.id)
+    assert await server_authkey_cache.get(db, server.id) == "changedkey00000000000000000000000000000"
+
+    server.authkey = original_key
+    await db.commit()
+    server_authkey_cache.invalidate(server.id)
+
+
+@pytest.mark.asyncio
+async def test_unknown_server_is_not_cached(db):
+    assert await server_authkey_cache.get(db, -1) is None